@@ -1,10 +1,11 @@
-from collections.abc import Iterable
+from collections.abc import Callable, Iterable
+from functools import wraps
 from itertools import chain, pairwise
-from typing import Tuple, Optional
+from typing import Any, Dict, Tuple, Optional
 
 from solid2 import cube, hull, sphere, union
 from solid2.core.object_base import OpenSCADObject
-from solid2.extensions.bosl2 import screws
+from solid2.extensions.bosl2 import screws, tag
 
 from spkb.switch_plate import (
     mx_plate_with_backplate,
@@ -15,11 +16,76 @@ from spkb.keyswitch import Keyswitch, MX
 from spkb.single_key_pcb import single_key_board
 from spkb.utils import cylinder_outer, fudge_radius, nothing
 
+from .hardware_meshes import HardwareMeshLibrary
 from .layouts.layout import ShapeForLocationCallback
 from .layouts.finger_well import FingerWellLayout
 from .layouts.thumb_well import ThumbWellLayout
+from .mesh import (
+    TriangleMesh,
+    UnsupportedShapeError,
+    box_mesh,
+    concatenate_meshes,
+    switch_plate_mesh,
+    transform_mesh,
+)
 from .mini_din_connector_mount import MiniDINConnectorMount
 from .trackpoint_mount import TrackPointMount
+from .transforms import mirroring
+
+
+omitted_thread_tag = 'omitted-thread'
+"""The BOSL2 tag of holes which should be threaded, but were built as plain bores (see `KeyboardAssembly.threads`), so
+they can be found (and substituted) in the OpenSCAD code, and told apart from holes which are meant to be unthreaded"""
+
+
+def side_independent(method: Callable[..., OpenSCADObject]) -> Callable[..., OpenSCADObject]:
+    """Mark a `KeyboardAssembly` method as building a shape which doesn't depend on `left_side`.
+
+    The shape is only built once for each combination of arguments, and the same shape is then shared by both sides.
+    (The left side is mirrored as a whole, so anything which doesn't depend on `left_side` is identical for both.)
+    """
+    @wraps(method)
+    def _side_independent(self, *args, **kwargs):
+        key = (method.__name__, args, tuple(sorted(kwargs.items())))
+        shape = self._shapes.get(key)
+        if shape is None:
+            shape = method(self, *args, **kwargs)
+            self._shapes[key] = shape
+        return shape
+    return _side_independent
+
+
+def side_dependent(method: Callable[..., OpenSCADObject]) -> Callable[..., OpenSCADObject]:
+    """Mark a `KeyboardAssembly` method as building a shape which depends on `left_side`, but which is worth keeping
+    (e.g. because it's part of more than one part).
+
+    The shape is only built once for each side and combination of arguments.
+    """
+    @wraps(method)
+    def _side_dependent(self, *args, **kwargs):
+        key = (method.__name__, self.left_side, args, tuple(sorted(kwargs.items())))
+        shape = self._shapes.get(key)
+        if shape is None:
+            shape = method(self, *args, **kwargs)
+            self._shapes[key] = shape
+        return shape
+    return _side_dependent
+
+
+def hardware_feature(method: Callable[..., OpenSCADObject]) -> Callable[..., OpenSCADObject]:
+    """Mark a `KeyboardAssembly` method as building a hardware feature (a nut, a magnet hole, etc.) which is repeated
+    throughout the parts.
+
+    If the assembly has a `hardware` library, the feature is rendered once to a mesh, which the parts import instead of
+    the feature's CSG.
+    """
+    @wraps(method)
+    def _hardware_feature(self, *args, **kwargs):
+        shape = method(self, *args, **kwargs)
+        if self.hardware is None:
+            return shape
+        return self.hardware.mesh(method.__name__.strip('_').replace('_', '-'), shape)
+    return _hardware_feature
 
 
 class KeyboardAssembly:
@@ -31,7 +97,24 @@ class KeyboardAssembly:
         use_color: bool = False,
         socket_shape: Optional[ShapeForLocationCallback] = None,
         keyswitch: Keyswitch = MX(),
+        preview: bool = False,
+        threads: bool = True,
+        hardware: Optional[HardwareMeshLibrary] = None,
     ):
+        self._shapes: Dict[Tuple[Any, ...], OpenSCADObject] = {}
+        "The shapes built so far by `side_independent` and `side_dependent` methods, keyed by method and arguments"
+
+        self.preview = preview
+        """Whether to substitute simplified, low-polygon shapes for expensive details (threads and magnet holes), for
+        quick visual checks; these parts are not meant to be printed."""
+        self.threads = threads
+        """Whether threaded holes get real threads, as needed for release builds. Threads are very expensive to render,
+        so while iterating on a design, this can be turned off to get plain bores instead; these are tagged with
+        `omitted_thread_tag` (and kept as CSG, even with a `hardware` library), so they can be found and substituted in
+        the OpenSCAD code, and a release build only changes (and re-renders) the parts that contain them."""
+        self.hardware = hardware
+        """The library to render hardware features (nuts, magnet holes, etc.) to, so parts import their meshes instead
+        of repeating their CSG; if None, the CSG is used directly"""
         self.use_color = use_color
         self.socket_shape = socket_shape
 
@@ -43,25 +126,12 @@ class KeyboardAssembly:
         )
         self.thumb_layout = ThumbWellLayout(keyswitch=keyswitch)
 
-        if socket_shape is None:
-            self.socket_shape = lambda _column, _row: self.finger_layout.keyswitch.plate()
-
         self.connector_mount = MiniDINConnectorMount()
         self.trackpoint_mount = TrackPointMount()
 
         self.screen_size = (27.75, 39.25)
         self.screen_hole_centers = (22.5, 34.05)
 
-        self.tenting_nut = (
-            cube((10, 10, 10), center=True)
-            - screws.screw_hole("M6x1", length=10.01, thread=True, bevel=True, blunt_start=True, _fn=32)
-        )
-
-        self.tenting_nut_unthreaded = (
-            cube((10, 10, 10), center=True)
-            - screws.screw_hole("M6x1", length=10.01, thread=False, bevel=True, blunt_start=True, _fn=32)
-        )
-
         self.left_side = False
 
         self.enable_trackpoint = True
@@ -78,6 +148,59 @@ class KeyboardAssembly:
         self.bottom_cover_magnet_thickness = 3
         self.bottom_cover_magnet_offset = 13.7
 
+    def __setattr__(self, name, value):
+        super().__setattr__(name, value)
+
+        # Switching sides doesn't change any shapes (those which depend on it are kept for each side), but any other
+        # change might.
+        if not name.startswith('_') and name != 'left_side':
+            self.clear_shape_cache()
+
+    def clear_shape_cache(self):
+        """Forget all shapes built so far by `side_independent` and `side_dependent` methods.
+
+        This happens automatically whenever an attribute of the assembly (other than `left_side`) is assigned; call it
+        explicitly after mutating an attribute in place. (e.g. modifying `finger_layout`)
+        """
+        self.__dict__.get('_shapes', {}).clear()
+
+    @property
+    def tenting_nut(self) -> OpenSCADObject:
+        "A block with a threaded M6 hole, for attaching a tenting screw"
+        if self.preview or not self.threads:
+            return self._tenting_nut_without_threads()
+        return self._tenting_nut(thread=True)
+
+    @property
+    def tenting_nut_unthreaded(self) -> OpenSCADObject:
+        "A block with an unthreaded M6 hole, for a tenting screw to pass through"
+        return self._tenting_nut(thread=False)
+
+    @side_independent
+    @hardware_feature
+    def _tenting_nut(self, thread):
+        return cube((10, 10, 10), center=True) - self._tenting_nut_hole(thread)
+
+    @side_independent
+    def _tenting_nut_without_threads(self):
+        # The plain bore standing in for the threads is cheap, so this isn't a hardware feature: rendering it to a mesh
+        # would lose its tag, leaving nothing in the OpenSCAD code to find or substitute.
+        return cube((10, 10, 10), center=True) - tag(omitted_thread_tag)(self._tenting_nut_hole(thread=False))
+
+    def _tenting_nut_hole(self, thread):
+        if self.preview:
+            # Threads are among the most expensive shapes in the model, so previews just use a plain, coarse hole.
+            return cylinder_outer(3, 10.01, segments=8, center=True)
+
+        return screws.screw_hole(
+            "M6x1",
+            length=10.01,
+            thread=thread,
+            bevel=True,
+            blunt_start=True,
+            _fn=32,
+        )
+
     @property
     def wall_thickness(self):
         return self.finger_layout.keyswitch.wall_thickness
@@ -254,6 +377,59 @@ class KeyboardAssembly:
             return shape.mirror((1, 0, 0))
         return shape
 
+    def switch_socket_mesh(self, column, row) -> TriangleMesh:
+        """Generate the mesh equivalent of `switch_socket` for the given keyswitch.
+
+        Raises `UnsupportedShapeError` if `socket_shape` is set, or if the keyswitch's plate can't be built as a mesh.
+
+        :param column: the column of the keyswitch
+        :type column: number
+
+        :param row: the row of the keyswitch
+        :type row: number
+        """
+        if self.socket_shape is not None:
+            raise UnsupportedShapeError("Custom socket shapes can't be built as meshes")
+
+        keyswitch = self.finger_layout.keyswitch
+        meshes = [switch_plate_mesh(keyswitch)]
+
+        if isinstance(row, float) and not row.is_integer():
+            plate_height = (sa_double_length - keyswitch.keyswitch_length + 0.4) / 2
+            stabilizer_mount = box_mesh(
+                (
+                    -keyswitch.keyswitch_width / 2 - self.wall_thickness,
+                    keyswitch.keyswitch_length / 2 + self.wall_thickness,
+                    -self.thumb_layout.web_thickness,
+                ),
+                (
+                    keyswitch.keyswitch_width / 2 + self.wall_thickness,
+                    keyswitch.keyswitch_length / 2 + self.wall_thickness + plate_height,
+                    0,
+                ),
+            )
+            meshes += [stabilizer_mount, transform_mesh(stabilizer_mount, mirroring((0, 1, 0)))]
+        elif isinstance(column, float) and not column.is_integer():
+            plate_width = (sa_double_length - keyswitch.keyswitch_width + 0.4) / 2
+            stabilizer_mount = box_mesh(
+                (
+                    keyswitch.keyswitch_width / 2 + self.wall_thickness,
+                    -keyswitch.keyswitch_length / 2 - self.wall_thickness,
+                    -self.thumb_layout.web_thickness,
+                ),
+                (
+                    keyswitch.keyswitch_width / 2 + self.wall_thickness + plate_width,
+                    keyswitch.keyswitch_length / 2 + self.wall_thickness,
+                    0,
+                ),
+            )
+            meshes += [stabilizer_mount, transform_mesh(stabilizer_mount, mirroring((0, 1, 0)))]
+
+        mesh = concatenate_meshes(meshes)
+        if self.left_side:
+            return transform_mesh(mesh, mirroring((1, 0, 0)))
+        return mesh
+
     def bottom_cover_size_adjust(self, column: float, row: float) -> Tuple[float, float]:
         """Adjust the size of the bottom cover element at the given column and row.
         """
@@ -315,6 +491,29 @@ class KeyboardAssembly:
             center=True
         ).translate(x_shift, y_shift, -self.bottom_cover_offset - self.bottom_cover_thickness / 2)
 
+    def finger_well_mesh(self) -> TriangleMesh:
+        """Generate the finger well (the switch sockets and the webs between them) directly as a mesh.
+
+        This is the part of `finger_part` which is a union of convex pieces, so it can be written to an STL file
+        without rendering it in OpenSCAD. (e.g. for quickly test-fitting a layout)
+        """
+        return concatenate_meshes([
+            self.finger_layout.place_all_mesh(self.switch_socket_mesh),
+            self.finger_layout.web_all_mesh(),
+        ])
+
+    def thumb_well_mesh(self) -> TriangleMesh:
+        """Generate the thumb well (the switch sockets and the webs between them) directly as a mesh.
+
+        This is the part of `thumb_part` which is a union of convex pieces, so it can be written to an STL file
+        without rendering it in OpenSCAD.
+        """
+        return concatenate_meshes([
+            self.thumb_layout.place_all_mesh(self.switch_socket_mesh),
+            self.thumb_layout.web_all_mesh(),
+        ])
+
+    @side_dependent
     def finger_part(self):
         """Generate the finger part of the assembly.
 
@@ -376,7 +575,7 @@ class KeyboardAssembly:
 
         if self.enable_trackpoint and not self.left_side:
             shape += self.transform_trackpoint_mount(self.trackpoint_mount.trackpoint_mount())
-            shape -= self.transform_trackpoint_mount(self.trackpoint_mount.trackpoint_holes())
+            shape -= self.transform_trackpoint_mount(self.trackpoint_holes())
 
         shape -= self.finger_layout.place_all(single_key_board(simple=True, extra_spacing=0.02))
 
@@ -385,6 +584,8 @@ class KeyboardAssembly:
 
         return shape
 
+    @side_independent
+    @hardware_feature
     def cover_magnet_mount(self, top_shell):
         """Create the mounting shape for a magnet to attach the bottom cover.
 
@@ -392,6 +593,7 @@ class KeyboardAssembly:
         :type top_shell: bool
         """
         radius = self.bottom_cover_magnet_radius + self.bottom_cover_magnet_mount_thickness
+        segments = 8 if self.preview else 16
 
         # Fudge the sphere radius as if it had 12 segments instead of 16, in order to make it line up a bit better with
         # the cylinder. It's still not perfect.
@@ -403,16 +605,20 @@ class KeyboardAssembly:
             sphere_radii['r1'], sphere_radii['r2'] = sphere_radius
 
         shape = (
-            cylinder_outer(radius, self.bottom_cover_magnet_thickness, center=True)
+            cylinder_outer(radius, self.bottom_cover_magnet_thickness, segments=segments, center=True)
             .up(self.bottom_cover_magnet_thickness / 2)
-            + (sphere(_fn=16, **sphere_radii) - cube(radius * 2, radius * 2, radius * 2, center=True).down(radius))
-            .up(self.bottom_cover_magnet_thickness)
+            + (
+                sphere(_fn=segments, **sphere_radii)
+                - cube(radius * 2, radius * 2, radius * 2, center=True).down(radius)
+            ).up(self.bottom_cover_magnet_thickness)
         )
 
         if not top_shell:
             return shape.mirror((0, 0, 1))
         return shape
 
+    @side_independent
+    @hardware_feature
     def cover_magnet_hole(self, top_shell):
         """Create the hole for a magnet to attach the bottom cover.
 
@@ -425,6 +631,10 @@ class KeyboardAssembly:
         end_groove_radius = hex_radius + end_groove_depth
         end_groove_height = 0.5
 
+        if self.preview:
+            # Skip the grooves and chamfers which hold the magnet in place.
+            return cylinder_outer(hex_radius, self.bottom_cover_magnet_thickness * 2, segments=6, center=True)
+
         return (
             cylinder_outer(  # Top end groove
                 end_groove_radius,
@@ -470,6 +680,13 @@ class KeyboardAssembly:
             ).down(self.bottom_cover_magnet_thickness - end_groove_height / 2)
         )
 
+    @side_independent
+    @hardware_feature
+    def trackpoint_holes(self):
+        """Create the holes for the TrackPoint's stem and screws (see `TrackPointMount.trackpoint_holes`).
+        """
+        return self.trackpoint_mount.trackpoint_holes()
+
     def place_cover_magnets(self, shape):
         """Place the given shape at the location of each cover attachment magnet.
 
@@ -717,6 +934,7 @@ class KeyboardAssembly:
             ),
         )
 
+    @side_independent
     def finger_cover_edge(self, top_shell):
         """Create the edge pieces of the top shell or bottom cover.
 
@@ -737,6 +955,7 @@ class KeyboardAssembly:
             + self.place_cover_magnets(self.cover_magnet_mount(top_shell=top_shell))
         )
 
+    @side_independent
     def finger_bottom_cover(self):
         """Generate the bottom cover.
         """
@@ -782,6 +1001,7 @@ class KeyboardAssembly:
             )
         )
 
+    @side_independent
     def finger_bottom_cover_nuts(self):
         """Generate tenting nuts for M6 bolts to union with the bottom cover.
         """
@@ -808,6 +1028,7 @@ class KeyboardAssembly:
             )
         )
 
+    @side_independent
     def finger_bottom_cover_feet(self):
         """Generate fixed feet to union with the bottom cover.
         """
@@ -839,6 +1060,7 @@ class KeyboardAssembly:
             )
         )
 
+    @side_independent
     def finger_bottom_cover_with_tripod_mount(self):
         """Generate bottom cover with 40mm 1/4"-20 tripod mount.
 
@@ -904,6 +1126,7 @@ class KeyboardAssembly:
             ))
         )
 
+    @side_independent
     def finger_bottom_cover_with_t_nut(self):
         """Generate bottom cover with 1/4"-20 carpentry T nut for tripod mounting.
         (e.g., https://www.amazon.de/-/en/gp/product/B0DK1HGGKM/ref=sw_img_1?smid=A301WKE65PGVT5&psc=1)
@@ -961,6 +1184,7 @@ class KeyboardAssembly:
             - self.finger_layout.key_place(2, 3, tripod_mount_holes)
         )
 
+    @side_dependent
     def thumb_part(self):
         """Generate the thumb part of the assembly.
 
@@ -1010,6 +1234,7 @@ class KeyboardAssembly:
 
         return shape
 
+    @side_independent
     def connector(self):
         """Generate the separate connector piece between the finger and thumb wells.
         """
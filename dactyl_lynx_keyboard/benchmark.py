@@ -0,0 +1,303 @@
+#!/usr/bin/env python3
+"""Benchmarks for building the parts of the keyboard assembly.
+
+Each assembly method is built from a fresh `KeyboardAssembly` (so no caches are shared between measurements) for each
+of several finger well sizes, recording wall time, peak Python memory usage, the number of CSG nodes in the resulting
+tree, and the size of the emitted OpenSCAD code.
+
+Run with `python -m dactyl_lynx_keyboard.benchmark --help` for options.
+"""
+import argparse
+import json
+import platform
+import sys
+import time
+import tracemalloc
+from collections.abc import Sequence
+from importlib.metadata import version
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+from solid2.core.object_base import OpenSCADObject
+
+from .assembly import KeyboardAssembly
+from .scad import scad_render_with_modules
+
+
+default_layout_sizes: Sequence[Tuple[int, int]] = ((5, 4), (6, 5), (7, 6))
+"The finger well sizes (columns, rows) to benchmark by default"
+
+default_methods: Sequence[str] = (
+    'finger_part',
+    'thumb_part',
+    'connector',
+    'single_piece',
+    'finger_bottom_cover',
+    'finger_bottom_cover_feet',
+    'finger_bottom_cover_nuts',
+    'finger_bottom_cover_with_tripod_mount',
+    'finger_bottom_cover_with_t_nut',
+)
+"The `KeyboardAssembly` methods to benchmark by default"
+
+metrics: Sequence[str] = ('seconds', 'peak_memory_bytes', 'nodes', 'scad_bytes')
+"The metrics recorded for each benchmark"
+
+
+class BenchmarkResult(NamedTuple):
+    """The measurements for building one part at one layout size.
+    """
+    layout: str
+    "The size of the finger well, as `COLUMNSxROWS`"
+    method: str
+    "The name of the `KeyboardAssembly` method which was run"
+    seconds: float
+    "The fastest wall time taken to build the part, in seconds"
+    peak_memory_bytes: int
+    "The peak memory allocated by Python while building the part, in bytes"
+    nodes: int
+    "The number of nodes in the part's CSG tree (counting shared subtrees once per use)"
+    scad_bytes: int
+    "The size of the part's OpenSCAD code, as written by the exporter, in bytes"
+
+
+def count_nodes(shape: OpenSCADObject) -> int:
+    """Return the number of nodes in the given tree, counting shared subtrees once per use.
+
+    :param shape: the root of the tree
+    """
+    counts: Dict[int, int] = {}
+
+    def count(node) -> int:
+        node_count = counts.get(id(node))
+        if node_count is None:
+            node_count = 1 + sum(count(child) for child in getattr(node, '_children', ()))
+            counts[id(node)] = node_count
+        return node_count
+
+    return count(shape)
+
+
+def benchmark_method(columns: int, rows: int, method: str, repeat: int = 3) -> BenchmarkResult:
+    """Measure building a single part.
+
+    :param columns: the number of columns in the finger well
+    :param rows: the number of rows in the finger well
+    :param method: the name of the `KeyboardAssembly` method which builds the part
+    :param repeat: the number of times to time the build (the fastest time is reported)
+    """
+    def build() -> OpenSCADObject:
+        return getattr(KeyboardAssembly(columns=columns, rows=rows), method)()
+
+    seconds = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        build()
+        seconds.append(time.perf_counter() - start)
+
+    # Memory is measured separately, since tracing allocations slows the build down considerably.
+    tracemalloc.start()
+    try:
+        shape = build()
+        _, peak_memory_bytes = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return BenchmarkResult(
+        layout=f"{columns}x{rows}",
+        method=method,
+        seconds=min(seconds),
+        peak_memory_bytes=peak_memory_bytes,
+        nodes=count_nodes(shape),
+        scad_bytes=len(scad_render_with_modules(shape).encode('utf-8')),
+    )
+
+
+def run_benchmarks(
+    layout_sizes: Sequence[Tuple[int, int]] = default_layout_sizes,
+    methods: Sequence[str] = default_methods,
+    repeat: int = 3,
+) -> List[BenchmarkResult]:
+    """Run the benchmark for each method at each layout size, printing each result as it's measured.
+
+    :param layout_sizes: the finger well sizes (columns, rows) to benchmark
+    :param methods: the names of the `KeyboardAssembly` methods to benchmark
+    :param repeat: the number of times to time each build (the fastest time is reported)
+    """
+    results = []
+    for (columns, rows) in layout_sizes:
+        for method in methods:
+            result = benchmark_method(columns, rows, method, repeat=repeat)
+            print(
+                f"{result.layout:>5} {result.method:40} {result.seconds:8.3f}s "
+                f"{result.peak_memory_bytes / 2**20:8.1f} MiB {result.nodes:8} nodes {result.scad_bytes:10} bytes",
+                flush=True,
+            )
+            results.append(result)
+    return results
+
+
+def results_to_json(results: Sequence[BenchmarkResult]) -> Dict[str, Any]:
+    """Return a JSON-serializable report of the given results, along with details of the environment they came from.
+
+    :param results: the results to report
+    """
+    return {
+        'environment': {
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'solidpython2': version('solidpython2'),
+            'numpy': version('numpy'),
+        },
+        'results': [result._asdict() for result in results],
+    }
+
+
+def compare_to_baseline(
+    results: Sequence[BenchmarkResult],
+    baseline: Dict[str, Any],
+    time_tolerance: float = 0.2,
+    size_tolerance: float = 0.0,
+) -> List[str]:
+    """Compare the given results against a baseline report, printing the change in each metric.
+
+    Returns a description of each regression: a metric which increased by more than its tolerance (as a fraction of
+    the baseline value). Wall time and memory use `time_tolerance`, since they vary from run to run; node counts and
+    code size are deterministic, and use `size_tolerance`.
+
+    :param results: the results to compare
+    :param baseline: a report previously produced by `results_to_json`
+    :param time_tolerance: the allowed fractional increase in wall time and peak memory
+    :param size_tolerance: the allowed fractional increase in node count and code size
+    """
+    baseline_results = {(result['layout'], result['method']): result for result in baseline.get('results', [])}
+    tolerances = {
+        'seconds': time_tolerance,
+        'peak_memory_bytes': time_tolerance,
+        'nodes': size_tolerance,
+        'scad_bytes': size_tolerance,
+    }
+
+    regressions = []
+    for result in results:
+        baseline_result = baseline_results.get((result.layout, result.method))
+        if baseline_result is None:
+            print(f"{result.layout:>5} {result.method:40} (not in baseline)")
+            continue
+
+        changes = []
+        for metric in metrics:
+            before = baseline_result[metric]
+            after = getattr(result, metric)
+            change = (after - before) / before if before else 0.0
+            changes.append(f"{metric} {change:+7.1%}")
+
+            if change > tolerances[metric]:
+                regressions.append(
+                    f"{result.layout} {result.method}: {metric} increased from {before} to {after} ({change:+.1%})"
+                )
+
+        print(f"{result.layout:>5} {result.method:40} {'  '.join(changes)}")
+
+    return regressions
+
+
+def parse_layout_size(value: str) -> Tuple[int, int]:
+    columns, _, rows = value.partition('x')
+    try:
+        return (int(columns), int(rows))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected a layout size like 6x5, not {value!r}")
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark building the parts of a Dactyl Lynx keyboard.")
+    parser.add_argument(
+        "-l",
+        "--layout",
+        metavar="COLSxROWS",
+        dest="layout_sizes",
+        type=parse_layout_size,
+        action="append",
+        help="a finger well size to benchmark; may be given multiple times (default: 5x4, 6x5, and 7x6)",
+    )
+    # (No `-m` short option: `spkb.keyswitch` skips defining its classes if `-m` appears anywhere in `sys.argv`.)
+    parser.add_argument(
+        "--method",
+        metavar="METHOD",
+        dest="methods",
+        choices=default_methods,
+        action="append",
+        help="a KeyboardAssembly method to benchmark; may be given multiple times (default: all)",
+    )
+    parser.add_argument(
+        "-r",
+        "--repeat",
+        metavar="N",
+        type=int,
+        default=3,
+        help="the number of times to time each build; the fastest time is reported (default: 3)",
+    )
+    parser.add_argument(
+        "-o",
+        "--output",
+        metavar="FILE",
+        help="write the results to the given JSON file",
+    )
+    parser.add_argument(
+        "-b",
+        "--baseline",
+        metavar="FILE",
+        help="compare the results against the given JSON file (as written by --output), exiting with an error if "
+        "any metric regressed",
+    )
+    parser.add_argument(
+        "--time-tolerance",
+        metavar="FRACTION",
+        type=float,
+        default=0.2,
+        help="the allowed increase in wall time and peak memory relative to the baseline (default: 0.2)",
+    )
+    parser.add_argument(
+        "--size-tolerance",
+        metavar="FRACTION",
+        type=float,
+        default=0.0,
+        help="the allowed increase in node count and code size relative to the baseline (default: 0)",
+    )
+
+    args = parser.parse_args(argv)
+
+    results = run_benchmarks(
+        layout_sizes=args.layout_sizes or default_layout_sizes,
+        methods=args.methods or default_methods,
+        repeat=args.repeat,
+    )
+
+    if args.output:
+        with open(args.output, 'w') as output_file:
+            json.dump(results_to_json(results), output_file, indent=2)
+            output_file.write('\n')
+        print(f"Wrote results to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as baseline_file:
+            baseline = json.load(baseline_file)
+
+        print(f"\nCompared to {args.baseline}:")
+        regressions = compare_to_baseline(
+            results,
+            baseline,
+            time_tolerance=args.time_tolerance,
+            size_tolerance=args.size_tolerance,
+        )
+        if regressions:
+            print(f"\n{len(regressions)} regressions:")
+            for regression in regressions:
+                print(f"  {regression}")
+            return 1
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,321 @@
+"""Numeric axis-aligned bounding boxes of shapes, computed from their CSG trees without running OpenSCAD.
+
+Bounds are conservative: the true extent of a shape is always inside its bounds, but may be smaller (e.g. a rotated
+box is bounded by the box around its rotated corners, and a difference by the bounds of the shape it subtracts from).
+"""
+import math
+import weakref
+from collections.abc import Callable, Iterable, Sequence
+from typing import Dict, NamedTuple, Optional, Union
+
+import numpy as np
+from solid2.core.object_base import OpenSCADObject
+
+from .transforms import mirroring, rotation, scaling, translation
+
+
+class UnknownBoundsError(Exception):
+    """Raised when the bounds of a shape can't be computed (e.g. text, or an imported mesh).
+    """
+
+
+class Bounds(NamedTuple):
+    """An axis-aligned bounding box.
+    """
+    minimum: np.ndarray
+    "The minimum X, Y, and Z coordinates"
+    maximum: np.ndarray
+    "The maximum X, Y, and Z coordinates"
+
+    @property
+    def center(self) -> np.ndarray:
+        "The center of the box"
+        return (self.minimum + self.maximum) / 2
+
+    @property
+    def size(self) -> np.ndarray:
+        "The X, Y, and Z dimensions of the box"
+        return self.maximum - self.minimum
+
+    @property
+    def corners(self) -> np.ndarray:
+        "The eight corners of the box, as an 8x3 array"
+        return np.array([
+            (x, y, z)
+            for x in (self.minimum[0], self.maximum[0])
+            for y in (self.minimum[1], self.maximum[1])
+            for z in (self.minimum[2], self.maximum[2])
+        ])
+
+    def union(self, other: 'Bounds') -> 'Bounds':
+        """Return the bounds of both this box and the given box.
+        """
+        return Bounds(np.minimum(self.minimum, other.minimum), np.maximum(self.maximum, other.maximum))
+
+    def intersection(self, other: 'Bounds') -> Optional['Bounds']:
+        """Return the overlap of this box and the given box, or None if they don't overlap.
+        """
+        minimum = np.maximum(self.minimum, other.minimum)
+        maximum = np.minimum(self.maximum, other.maximum)
+        return Bounds(minimum, maximum) if np.all(minimum <= maximum) else None
+
+    def contains(self, other: 'Bounds') -> bool:
+        """Check whether the given box is entirely inside this box.
+        """
+        return bool(np.all(self.minimum <= other.minimum) and np.all(other.maximum <= self.maximum))
+
+    def overlaps(self, other: 'Bounds', clearance: float = 0) -> bool:
+        """Check whether this box comes within the given clearance of the given box.
+
+        :param other: the other box
+        :param clearance: the minimum gap between boxes which don't overlap
+        """
+        return bool(
+            np.all(self.minimum - clearance < other.maximum)
+            and np.all(other.minimum - clearance < self.maximum)
+        )
+
+    def transformed(self, matrix: np.ndarray) -> 'Bounds':
+        """Return the bounds of this box after applying the given 4x4 matrix.
+
+        :param matrix: the matrix to apply
+        """
+        return points_bounds(self.corners @ matrix[:3, :3].T + matrix[:3, 3])
+
+
+def points_bounds(points: Union[np.ndarray, Sequence[Sequence[float]]]) -> Bounds:
+    """Return the bounds of the given points (each with X, Y, and optionally Z coordinates; Z defaults to 0).
+
+    :param points: the points
+    """
+    points = np.asarray(points, dtype=float)
+    if points.shape[1] == 2:
+        points = np.column_stack((points, np.zeros(len(points))))
+    return Bounds(points.min(axis=0), points.max(axis=0))
+
+
+def _vector(value: Union[float, Sequence[float]], length: int = 3) -> np.ndarray:
+    """Return the given OpenSCAD size (a number or a vector) as a vector.
+    """
+    if isinstance(value, (int, float)):
+        return np.full(length, float(value))
+    return np.asarray(value, dtype=float)
+
+
+def _radius(params: Dict, radius: str = 'r', diameter: str = 'd') -> Optional[float]:
+    """Return the given radius (or half the given diameter) from an OpenSCAD primitive's parameters, if either is set.
+    """
+    if params.get(radius) is not None:
+        return params[radius]
+    if params.get(diameter) is not None:
+        return params[diameter] / 2
+    return None
+
+
+def _cube_bounds(params: Dict) -> Bounds:
+    size = _vector(params.get('size', 1))
+    return Bounds(-size / 2, size / 2) if params.get('center') else Bounds(np.zeros(3), size)
+
+
+def _square_bounds(params: Dict) -> Bounds:
+    size = np.append(_vector(params.get('size', 1), length=2), 0)
+    return Bounds(-size / 2, size / 2) if params.get('center') else Bounds(np.zeros(3), size)
+
+
+def _cylinder_bounds(params: Dict) -> Bounds:
+    default_radius = _radius(params)
+    radius = max(
+        radius if radius is not None else (default_radius if default_radius is not None else 1)
+        for radius in (_radius(params, 'r1', 'd1'), _radius(params, 'r2', 'd2'))
+    )
+    height = params.get('h') if params.get('h') is not None else 1
+    (bottom, top) = (-height / 2, height / 2) if params.get('center') else (0, height)
+    return Bounds(np.array((-radius, -radius, bottom)), np.array((radius, radius, top)))
+
+
+def _sphere_bounds(params: Dict) -> Bounds:
+    radius = _radius(params)
+    radius = _vector(radius if radius is not None else 1)
+    return Bounds(-radius, radius)
+
+
+def _circle_bounds(params: Dict) -> Bounds:
+    radius = _radius(params)
+    radius = np.array((1, 1, 0)) * (radius if radius is not None else 1)
+    return Bounds(-radius, radius)
+
+
+primitive_bounds: Dict[str, Callable[[Dict], Bounds]] = {
+    'cube': _cube_bounds,
+    'cylinder': _cylinder_bounds,
+    'sphere': _sphere_bounds,
+    'polyhedron': lambda params: points_bounds(params['points']),
+    'square': _square_bounds,
+    'circle': _circle_bounds,
+    'polygon': lambda params: points_bounds(params['points']),
+}
+"The function computing the bounds of each supported OpenSCAD primitive from its parameters"
+
+transform_matrices: Dict[str, Callable[[Dict], np.ndarray]] = {
+    'translate': lambda params: translation(params['v']),
+    'rotate': lambda params: rotation(params['a'], params.get('v')),
+    'mirror': lambda params: mirroring(params['v']),
+    'scale': lambda params: scaling(_vector(params['v'])),
+    'multmatrix': lambda params: np.asarray(params['m'], dtype=float),
+}
+"The function returning the matrix of each supported OpenSCAD transformation from its parameters"
+
+pass_through_operations: Sequence[str] = ('union', 'hull', 'color', 'render', '')
+"""The OpenSCAD operations whose bounds are the bounds of all of their children (the empty name is solid2's root
+object)"""
+
+
+_cache: weakref.WeakKeyDictionary = weakref.WeakKeyDictionary()
+"The bounds of each node bounded so far (or the error raised for it, if its bounds are unknown)"
+
+
+def _children_bounds(children: Iterable[OpenSCADObject]) -> Optional[Bounds]:
+    """Return the bounds of all of the given shapes, or None if they're all empty.
+    """
+    bounds = None
+    for child in children:
+        child_bounds = shape_bounds(child)
+        if child_bounds is not None:
+            bounds = child_bounds if bounds is None else bounds.union(child_bounds)
+    return bounds
+
+
+def _linear_extrude_bounds(params: Dict, children: Sequence[OpenSCADObject]) -> Optional[Bounds]:
+    bounds = _children_bounds(children)
+    if bounds is None:
+        return None
+
+    if params.get('twist'):
+        # The shape turns as it's extruded; anything within its furthest corner's distance from the Z axis is reachable.
+        radius = max(math.hypot(x, y) for (x, y, _) in bounds.corners)
+        bounds = Bounds(np.array((-radius, -radius, 0)), np.array((radius, radius, 0)))
+    if params.get('scale') is not None:
+        # The shape is scaled (towards or away from the origin) as it's extruded.
+        bounds = bounds.union(bounds.transformed(scaling(np.append(_vector(params['scale'], length=2), 1))))
+
+    height = params.get('height') if params.get('height') is not None else 100
+    (bottom, top) = (-height / 2, height / 2) if params.get('center') else (0, height)
+    return Bounds(
+        np.array((bounds.minimum[0], bounds.minimum[1], bottom)),
+        np.array((bounds.maximum[0], bounds.maximum[1], top)),
+    )
+
+
+def _intersection_bounds(children: Sequence[OpenSCADObject]) -> Optional[Bounds]:
+    bounds = None
+    known = False
+    for child in children:
+        try:
+            child_bounds = shape_bounds(child)
+        except UnknownBoundsError:
+            # The intersection is inside the bounds of every other child, so this one can be skipped.
+            continue
+        if child_bounds is None:
+            return None
+        bounds = child_bounds if not known else bounds.intersection(child_bounds)
+        known = True
+        if bounds is None:
+            return None
+
+    if not known:
+        raise UnknownBoundsError("None of the shapes in an intersection have known bounds")
+    return bounds
+
+
+def _difference_bounds(children: Sequence[OpenSCADObject]) -> Optional[Bounds]:
+    # Subtracting can only shrink the first shape, so the others only matter if they remove it entirely. (That's only
+    # checked for cubes, which fill their bounds; e.g. `spkb.utils.nothing` subtracts a cube from a smaller cube.)
+    bounds = shape_bounds(children[0]) if children else None
+    if bounds is not None and any(
+        getattr(child, '_name', None) == 'cube' and shape_bounds(child).contains(bounds)
+        for child in children[1:]
+    ):
+        return None
+    return bounds
+
+
+def _compute_bounds(shape: OpenSCADObject) -> Optional[Bounds]:
+    name = getattr(shape, '_name', None)
+    params = getattr(shape, '_params', {})
+    children = getattr(shape, '_children', [])
+
+    if name in primitive_bounds:
+        return primitive_bounds[name](params)
+    if name in transform_matrices:
+        bounds = _children_bounds(children)
+        return bounds.transformed(transform_matrices[name](params)) if bounds is not None else None
+    if name in pass_through_operations:
+        return _children_bounds(children)
+    if name == 'difference':
+        return _difference_bounds(children)
+    if name == 'intersection':
+        return _intersection_bounds(children)
+    if name == 'linear_extrude':
+        return _linear_extrude_bounds(params, children)
+
+    raise UnknownBoundsError(f"Can't compute the bounds of {name or type(shape).__name__}()")
+
+
+def shape_bounds(shape: OpenSCADObject) -> Optional[Bounds]:
+    """Return the bounds of the given shape, or None if it's empty.
+
+    The bounds of each node are cached (for as long as the node exists), so shapes built from shared subtrees are
+    cheap to bound; shapes must not be changed once their bounds have been computed.
+
+    Raises `UnknownBoundsError` if the shape contains anything whose bounds can't be computed (other than in parts of
+    the shape which can't affect its bounds, such as the shapes subtracted by a `difference()`).
+
+    :param shape: the shape to bound
+    """
+    try:
+        bounds = _cache[shape]
+    except KeyError:
+        try:
+            bounds = _compute_bounds(shape)
+        except UnknownBoundsError as error:
+            bounds = error
+        _cache[shape] = bounds
+
+    if isinstance(bounds, UnknownBoundsError):
+        raise UnknownBoundsError(*bounds.args)
+    return bounds
+
+
+def openscad_camera(
+    bounds: Bounds,
+    rotation_angles: Sequence[float] = (69.7, 0, 30),
+    aspect_ratio: float = 1,
+    field_of_view: float = 22.5,
+    margin: float = 1.05,
+) -> str:
+    """Return OpenSCAD's `--camera` argument (`X,Y,Z,RX,RY,RZ,DISTANCE`) framing the given bounds: looking at their
+    center from the given angles, from just far enough away that all of their corners are in view.
+
+    :param bounds: the bounds to frame
+    :param rotation_angles: the X, Y, and Z rotation of the camera, in degrees (as in OpenSCAD's `--camera` and `$vpr`;
+    (0, 0, 0) looks straight down, and (90, 0, 0) looks at the front)
+    :param aspect_ratio: the width of the image divided by its height
+    :param field_of_view: OpenSCAD's (vertical) field of view, in degrees
+    :param margin: the factor to move the camera further away by, to leave a margin around the bounds
+    """
+    # OpenSCAD's camera looks along +Y (from -Y) with +Z up, at the model rotated by (90 - RX, -RY, -RZ) around the X,
+    # Y, and Z axes. (see `Camera::setVpr`; the rotations are applied to the view in that order, so the model is
+    # rotated around Z first)
+    (x_angle, y_angle, z_angle) = rotation_angles
+    view = rotation(90 - x_angle, (1, 0, 0)) @ rotation(-y_angle, (0, 1, 0)) @ rotation(-z_angle, (0, 0, 1))
+    corners = (bounds.corners - bounds.center) @ view[:3, :3].T
+
+    vertical_tangent = math.tan(math.radians(field_of_view) / 2)
+    horizontal_tangent = vertical_tangent * aspect_ratio
+    distance = max(
+        max(abs(x) / horizontal_tangent, abs(z) / vertical_tangent) - y
+        for (x, y, z) in corners
+    )
+
+    values = (*bounds.center, *rotation_angles, distance * margin)
+    return f"--camera={','.join(f'{value:.6g}' for value in values)}"
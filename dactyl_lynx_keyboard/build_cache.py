@@ -0,0 +1,140 @@
+"""Content hashes and a manifest recording what has been rendered, so unchanged parts aren't rebuilt.
+"""
+import hashlib
+import importlib.util
+import json
+import re
+import subprocess
+from functools import lru_cache
+from os.path import join
+from typing import Any, Dict, Optional, Union
+
+
+manifest_filename = '.build-manifest.json'
+"The name of the manifest file in the output directory"
+
+
+class OpenSCADNotFoundError(Exception):
+    """Raised when the OpenSCAD executable can't be found.
+    """
+    def __init__(self, openscad: str):
+        # Only the executable is passed on, so the error can be pickled (e.g. when raised in a worker process).
+        super().__init__(openscad)
+        self.openscad = openscad
+        "The OpenSCAD executable which couldn't be found"
+
+    def __str__(self) -> str:
+        return (
+            f"Unable to find OpenSCAD (`{self.openscad}`); install it, or pass its path with --openscad (or $OPENSCAD)"
+        )
+
+
+def content_hash(*contents: Union[str, bytes]) -> str:
+    """Return a hex digest identifying the given contents.
+
+    :param contents: the strings or bytes to hash, in order
+    """
+    digest = hashlib.sha256()
+    for content in contents:
+        digest.update(content.encode('utf-8') if isinstance(content, str) else content)
+        digest.update(b'\0')
+    return digest.hexdigest()
+
+
+def file_hash(filepath: str) -> Optional[str]:
+    """Return a hex digest identifying the contents of the given file, or None if it doesn't exist.
+
+    :param filepath: the path of the file to hash
+    """
+    try:
+        with open(filepath, 'rb') as file:
+            return content_hash(file.read())
+    except FileNotFoundError:
+        return None
+
+
+@lru_cache
+def openscad_version(openscad: str = 'openscad') -> str:
+    """Return the version string reported by the given OpenSCAD executable.
+
+    Raises `OpenSCADNotFoundError` if the executable can't be found.
+
+    :param openscad: the OpenSCAD executable to run
+    """
+    try:
+        process = subprocess.run([openscad, '--version'], stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True)
+    except FileNotFoundError as error:
+        raise OpenSCADNotFoundError(openscad) from error
+    return process.stdout.strip()
+
+
+@lru_cache
+def bosl2_version() -> str:
+    """Return the version of the BOSL2 library bundled with SolidPython (as set in its `version.scad`), or an empty
+    string if it can't be found.
+    """
+    spec = importlib.util.find_spec('solid2.extensions.bosl2')
+    if spec is None or not spec.submodule_search_locations:
+        return ''
+
+    try:
+        with open(join(spec.submodule_search_locations[0], 'BOSL2', 'version.scad'), encoding='utf-8') as version_file:
+            match = re.search(r'^BOSL_VERSION\s*=\s*(.*?);', version_file.read(), re.MULTILINE)
+    except FileNotFoundError:
+        return ''
+    return match[1] if match else ''
+
+
+class BuildManifest:
+    """The manifest of an output directory, recording for each rendered file (by file name) the hash of the inputs it
+    was last rendered from, and how long that took.
+    """
+    def __init__(self, directory: str):
+        """Load the manifest of the given directory, or start an empty one if it has no manifest yet.
+
+        :param directory: the output directory
+        """
+        self.directory = directory
+
+        self.entries: Dict[str, Dict[str, Any]] = {}
+        "The manifest entry for each rendered file, keyed by file name"
+
+        try:
+            with open(self.filepath) as manifest_file:
+                self.entries = json.load(manifest_file)
+        except (FileNotFoundError, json.JSONDecodeError):
+            pass
+
+    @property
+    def filepath(self) -> str:
+        return join(self.directory, manifest_filename)
+
+    def save(self):
+        """Write the manifest to its output directory.
+        """
+        with open(self.filepath, 'w') as manifest_file:
+            json.dump(dict(sorted(self.entries.items())), manifest_file, indent=2, sort_keys=True)
+            manifest_file.write('\n')
+
+    def output_hash(self, filename: str) -> Optional[str]:
+        """Return the hash of the inputs the given file was last rendered from.
+
+        :param filename: the file name of the rendered (STL or 3MF) file
+        """
+        return self.entries.get(filename, {}).get('input_hash')
+
+    def render_seconds(self, filename: str) -> Optional[float]:
+        """Return how long the given file took to render last time, in seconds.
+
+        :param filename: the file name of the rendered (STL or 3MF) file
+        """
+        return self.entries.get(filename, {}).get('render_seconds')
+
+    def record_render(self, filename: str, input_hash: str, seconds: float):
+        """Record that the given file was rendered.
+
+        :param filename: the file name of the rendered (STL or 3MF) file
+        :param input_hash: the hash of the inputs the file was rendered from
+        :param seconds: how long the render took, in seconds
+        """
+        self.entries[filename] = {'input_hash': input_hash, 'render_seconds': seconds}
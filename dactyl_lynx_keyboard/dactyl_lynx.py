@@ -1,19 +1,39 @@
 #!/usr/bin/env python3
 import argparse
-from os.path import abspath, dirname, join
-from typing import List, Optional, Tuple
+import os
+import sys
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache, partial
+from os.path import abspath, basename, dirname, exists, join, relpath
+from typing import (
+    Dict, List, NamedTuple, Optional, Protocol, Sequence, Type, Union, get_args, get_origin, get_type_hints,
+)
 
 from solid2 import cube, sphere, text
+from solid2.core.object_base import OpenSCADObject
 
 from spkb.keyswitch import Keyswitch, MX, Choc
-from spkb.keycaps import sa_cap
+from spkb.keycaps import sa_cap, sa_double_length, sa_length
 from spkb.single_key_pcb import single_key_board
 from spkb.types import HoleDef, Offset2D
-from spkb.utils import nothing
 
-from .layouts.layout import Layout
+from .layouts.layout import ShapeForLocationCallback
 from .lcd_mount import LCDMount
 from .assembly import KeyboardAssembly
+from .bounds import UnknownBoundsError, openscad_camera, shape_bounds
+from .build_cache import OpenSCADNotFoundError, openscad_version
+from .export import ExportResult, Part, PartRegistry, export_part, export_parts
+from .hardware_meshes import HardwareMeshError, HardwareMeshLibrary, hardware_directory_name
+from .key_poses import layout_poses, pose_writers
+from .mesh import TriangleMesh, UnsupportedShapeError, transform_mesh
+from .mesh_files import mesh_writers, write_mesh
+from .render import export_formats, render_files
+from .render_profile import profile_results, write_report
+from .sweep import SweepVariant, VariantResult, build_variants, expand_sweep, read_sweep_file, write_index
+from .transforms import mirroring
+from .watch import SourceWatcher, reload_changed_modules
 
 
 # matrix_coords[left_side][thumb][column][row]
@@ -94,188 +114,458 @@ lynx_layout = {
 }
 
 
-if __name__ == "__main__":
-    # Dimensions of single-key PCB
-    board_dimensions = Offset2D(19.15, 19.15)
-
-    # Screw positions for single-key PCB
-    board_screw_positions: List[HoleDef] = [
-        HoleDef(8, 8, 0.5),
-        HoleDef(-8, 8, 0.5),
-        HoleDef(8, -8, 0.5),
-        HoleDef(-8, -8, 0.5),
-    ]
+# Dimensions of single-key PCB
+board_dimensions = Offset2D(19.15, 19.15)
 
-    #keyswitch_type: Keyswitch = MX()
-    keyswitch_type: Keyswitch = MX.with_board(board_dimensions, *board_screw_positions)
-    #keyswitch_type: Keyswitch = Choc()
-    #keyswitch_type: Keyswitch = Choc.with_board(board_dimensions, *board_screw_positions)
+# Screw positions for single-key PCB
+board_screw_positions: List[HoleDef] = [
+    HoleDef(8, 8, 0.5),
+    HoleDef(-8, 8, 0.5),
+    HoleDef(8, -8, 0.5),
+    HoleDef(-8, -8, 0.5),
+]
 
-    # The wall_thickness of the board mount socket (2.625)
-    wall_thickness: float = 2.625
+keyswitch_types: Dict[str, Type[Keyswitch]] = {
+    'mx': MX,
+    'choc': Choc,
+}
+"The keyswitch types which can be selected by name (see `BuildOptions.keyswitch`)"
+
+
+def make_keyswitch(name: str = 'mx', with_board: bool = True) -> Keyswitch:
+    """Return the named keyswitch type, optionally mounted on a single-key PCB.
+
+    :param name: the name of the keyswitch type (one of `keyswitch_types`)
+    :param with_board: whether the keyswitch is mounted on a single-key PCB (see `board_dimensions` and
+    `board_screw_positions`)
+    """
+    keyswitch_class = keyswitch_types[name]
+    if with_board:
+        return keyswitch_class.with_board(board_dimensions, *board_screw_positions)
+    return keyswitch_class()
+
+
+# The wall_thickness of the board mount socket (2.625)
+wall_thickness: float = 2.625
+
+combined_colors = {
+    'combined': (0.03, 0.03, 0.03),
+    #'combined': (0.33, 0.33, 0.33),
+    'finger_part': (0.1, 0.1, 0.9),
+    'thumb_part': (0.1, 0.1, 0.1),
+    'connector': (0.4, 0.1, 0.1),
+    'keycaps': (1.0, 0.98, 0.95),
+    'keycap_text': (0, 0, 0),
+    'keyswitches': (0.02, 0.02, 0.02),
+    'pcbs': (0.02, 0.02, 0.02),
+    #'pcbs': (0.02, 0.5, 0.02),
+    'bottom': (0.027, 0.027, 0.027),
+    'lcd_mount': (0.1, 0.3, 0.1),
+}
+combined_parts = ('trackpoint', 'keycaps', 'keyswitches', 'pcbs', 'bottom_with_feet_and_tripod_mount')
 
-    def tagged_switch_plate(column, row):
-        return (
-            keyswitch_type.plate()
-            + text(f'{column},{row}', size=keyswitch_type.keyswitch_length / 3, halign='center', valign='center')
-        )
 
-    assembly = KeyboardAssembly(
-        columns=6,
-        rows=5,
-        use_1_5u_keys=False,
-        use_color=False,
-        keyswitch=keyswitch_type,
+class KeycapTextCallback(Protocol):
+    """A callback for generating the legend of the keycap at a given position.
+    """
+    def __call__(self, *, left_side: bool, thumb: bool, column: float, row: float) -> Optional[str]:
+        """Return the legend of the keycap at the given position, or None (or an empty string) for no legend.
+        """
+        return None
 
-        # The default, if `socket_shape` is omitted: Basic sockets without a backplate; also use this if using
-        # single-key PCBs.
-        #socket_shape=lambda column, row: keyswitch_type.plate(),
-
-        # Sockets with a backplate supporting a hotswap socket, 5-pin switches, and a 2-pin or 4-pin LED.
-        #socket_shape=lambda column, row: keyswitch_type.plate_with_backplate(),
-
-        # To use a switch plate with engraved layout positions (for troubleshooting):
-        #socket_shape=tagged_switch_plate,
-    )
-
-    combined_colors = {
-        'combined': (0.03, 0.03, 0.03),
-        #'combined': (0.33, 0.33, 0.33),
-        'finger_part': (0.1, 0.1, 0.9),
-        'thumb_part': (0.1, 0.1, 0.1),
-        'connector': (0.4, 0.1, 0.1),
-        'keycaps': (1.0, 0.98, 0.95),
-        'keycap_text': (0, 0, 0),
-        'keyswitches': (0.02, 0.02, 0.02),
-        'pcbs': (0.02, 0.02, 0.02),
-        #'pcbs': (0.02, 0.5, 0.02),
-        'bottom': (0.027, 0.027, 0.027),
-        'lcd_mount': (0.1, 0.3, 0.1),
-    }
-    combined_parts = ('trackpoint', 'keycaps', 'keyswitches', 'pcbs', 'bottom_with_feet_and_tripod_mount')
 
-    # Choose your keycap legends!
+def legend_table(table) -> KeycapTextCallback:
+    """Return a keycap legend callback which looks up each key's legend in the given table (indexed by
+    `[left_side][thumb][column][row]`, like `lynx_layout`).
+
+    Keys which aren't in the table (e.g. in a larger layout than the table was written for) have no legend.
+    """
+    def _legend_table_inner(left_side, thumb, column, row, **kwargs):
+        try:
+            return table[left_side][thumb][column][row]
+        except (IndexError, KeyError):
+            return None
+    return _legend_table_inner
+
+
+# Choose your keycap legends!
+keycap_legends: Dict[str, Optional[KeycapTextCallback]] = {
     # No keycap legends
-    #keycap_text = None
+    'none': None,
     # The coordinates of each key in the layout math
-    #keycap_text = lambda column, row, **kwargs: f'{column},{row}'
+    'coordinates': lambda column, row, **kwargs: f'{column},{row}',
     # The wiring matrix coordinates for each key
-    #keycap_text = lambda left_side, thumb, column, row, **kwargs: matrix_coords[left_side][thumb][column][row]
+    'matrix': legend_table(matrix_coords),
     # The key mapping at each position in my `lynx` layout
-    keycap_text = lambda left_side, thumb, column, row, **kwargs: lynx_layout[left_side][thumb][column][row]
+    'lynx': legend_table(lynx_layout),
+}
+"The keycap legends which can be selected by name (see `BuildOptions.legends`)"
+
+
+def tagged_switch_plate(column, row):
+    return (
+        keyswitch_type.plate()
+        + text(f'{column},{row}', size=keyswitch_type.keyswitch_length / 3, halign='center', valign='center')
+    )
+
+
+socket_shapes: Dict[str, Optional[ShapeForLocationCallback]] = {
+    # Basic sockets without a backplate (the assembly's default); also use this if using single-key PCBs.
+    'plate': None,
+    # Sockets with a backplate supporting a hotswap socket, 5-pin switches, and a 2-pin or 4-pin LED.
+    'backplate': lambda column, row: keyswitch_type.plate_with_backplate(),
+    # A switch plate with engraved layout positions (for troubleshooting).
+    'tagged': tagged_switch_plate,
+}
+"The keyswitch socket shapes which can be selected by name (see `BuildOptions.socket`)"
+
+
+class BuildOptions(NamedTuple):
+    """The settings which can be chosen for each build (e.g. on the command line) without editing this file.
+    """
+    columns: int = 6
+    "The number of columns in the finger well"
+    rows: int = 5
+    "The number of rows in the finger well"
+    use_1_5u_keys: bool = False
+    "Whether the outer columns of the finger well use 1.5u keys"
+    rad_per_row: Optional[float] = None
+    "The finger well's cupping, in radians per row; if None, use the layout's default"
+    rad_per_col: Optional[float] = None
+    "The finger well's cupping, in radians per column; if None, use the layout's default"
+    keyswitch: str = 'mx'
+    "The keyswitch type (one of `keyswitch_types`)"
+    with_board: bool = True
+    "Whether each keyswitch is mounted on a single-key PCB"
+    socket: str = 'plate'
+    "The shape of the keyswitch sockets (one of `socket_shapes`)"
+    legends: str = 'lynx'
+    "The legends on the keycaps (one of `keycap_legends`)"
+    preview: bool = False
+    """Whether to substitute simplified, low-polygon shapes for expensive details (keycaps, keyswitches, PCBs, threads,
+    and magnet holes) for quick visual checks; output files are named `dactyl-lynx-COLSxROWS-preview*`, so they're
+    never mistaken for printable parts"""
+    threads: bool = True
+    """Whether threaded holes get real threads (for release builds); if False, they're plain bores, which are much
+    faster to render while iterating on a design"""
+    hardware_meshes: bool = False
+    """Whether to render repeated hardware features (nuts, magnet holes, etc.) once to STL files (in a `hardware/`
+    directory next to the output files, using `$OPENSCAD`), which parts import instead of repeating their CSG"""
+    output_dir: Optional[str] = None
+    "The directory to write output files to; if None, use the `things/` directory"
+
+
+build_options = BuildOptions()
+"The options of the current build (see `configure`)"
+
+keyswitch_type: Keyswitch = make_keyswitch(build_options.keyswitch, build_options.with_board)
+keycap_text: Optional[KeycapTextCallback] = keycap_legends[build_options.legends]
+
+
+def check_build_options(options: BuildOptions):
+    """Raise `ValueError` if any of the given options has the wrong type (e.g. a string where a number is expected), or
+    if any of the named choices (e.g. the keyswitch type) doesn't exist.
+
+    :param options: the options to check
+    """
+    for (field, annotation) in get_type_hints(BuildOptions).items():
+        value = getattr(options, field)
+        types = get_args(annotation) if get_origin(annotation) is Union else (annotation,)
+        # `bool` is a subclass of `int`, but isn't a number here; whole numbers are fine wherever a float is expected.
+        if isinstance(value, bool):
+            valid = bool in types
+        else:
+            valid = isinstance(value, types) or (float in types and isinstance(value, int))
+        if not valid:
+            expected = ' or '.join(
+                'None' if option_type is type(None) else option_type.__name__ for option_type in types
+            )
+            raise ValueError(f"Invalid {field} {value!r} (expected {expected})")
+
+    for (field, choices) in (('keyswitch', keyswitch_types), ('socket', socket_shapes), ('legends', keycap_legends)):
+        value = getattr(options, field)
+        if value not in choices:
+            raise ValueError(f"Unknown {field} {value!r} (choices: {', '.join(choices)})")
 
-    lcdMount = LCDMount()
 
-    pcb_board = single_key_board()
+def configure(options: BuildOptions):
+    """Switch this process to the given build options.
 
-    keyswitch = lambda column, row: keyswitch_type.switch()
+    Any shapes built with the previous options are discarded, so they're rebuilt with the new options when they're
+    next needed.
 
-    def switch_cap(thumb):
-        def _switch_cap_inner(column, row):
-            shape = sa_cap(1)
-            if (column == 1 and row == 0) if thumb else (row == 2 and 1 <= column <= 4):
-                shape -= sphere(_fn=50, r=30).up(48)
-            elif isinstance(row, float) and not row.is_integer():
-                shape = sa_cap(2)
+    :param options: the options to build with
+    """
+    global build_options, keyswitch_type, keycap_text
+
+    if options == build_options:
+        return
+
+    build_options = options
+    keyswitch_type = make_keyswitch(options.keyswitch, options.with_board)
+    keycap_text = keycap_legends[options.legends]
+
+    _shared_assembly.cache_clear()
+    keycap.cache_clear()
+    _placed_keyswitches.cache_clear()
+    _placed_pcbs.cache_clear()
+    part_registry.clear()
+
+
+@lru_cache
+def _shared_assembly() -> KeyboardAssembly:
+    assembly = KeyboardAssembly(
+        columns=build_options.columns,
+        rows=build_options.rows,
+        use_1_5u_keys=build_options.use_1_5u_keys,
+        use_color=False,
+        keyswitch=keyswitch_type,
+        socket_shape=socket_shapes[build_options.socket],
+        preview=build_options.preview,
+        threads=build_options.threads,
+        hardware=hardware_library() if build_options.hardware_meshes else None,
+    )
+    if build_options.rad_per_row is not None:
+        assembly.finger_layout.rad_per_row = build_options.rad_per_row
+    if build_options.rad_per_col is not None:
+        assembly.finger_layout.rad_per_col = build_options.rad_per_col
+    return assembly
+
+
+def hardware_library() -> HardwareMeshLibrary:
+    """Return the library of hardware meshes for the current output directory.
+    """
+    output_dir = dirname(output_filepath())
+    return HardwareMeshLibrary(
+        join(output_dir, hardware_directory_name),
+        relative_to=output_dir,
+        openscad=os.environ.get("OPENSCAD", "openscad"),
+    )
+
+
+def get_assembly(left_side: bool = False) -> KeyboardAssembly:
+    """Return the keyboard assembly, switched to the given side.
+
+    Each process keeps a single assembly for both sides, so its side-independent shapes (and the placement and web
+    caches of its layouts) are built once and shared between all parts built by that process.
+
+    :param left_side: whether to switch to the left side (True) or the right side (False)
+    """
+    assembly = _shared_assembly()
+    assembly.left_side = left_side
+    return assembly
+
+
+def for_side(shape: OpenSCADObject, left_side: bool) -> OpenSCADObject:
+    """Mirror the given shape if it's for the left side.
+
+    TODO: We probably shouldn't need to explicitly call .mirror((1, 0, 0)) here...
+    Maybe wrap the assembly methods to automatically do this?
+    """
+    return shape.mirror((1, 0, 0)) if left_side else shape
+
+
+@lru_cache(maxsize=None)
+def keycap(
+    units: int = 1,
+    turned: bool = False,
+    dished: bool = False,
+    legend: Optional[str] = None,
+    mirrored: bool = False,
+    thumb: bool = False,
+) -> OpenSCADObject:
+    """Return the keycap with the given properties, built only once per distinct set of properties.
+
+    Every key with the same keycap shares the same shape, so it's built once, and written once (as an OpenSCAD module;
+    see `scad_render_with_modules`) no matter how many keys use it.
+
+    :param units: the size of the keycap, in key units
+    :param turned: whether the keycap is turned 90° (for keys spanning two columns)
+    :param dished: whether the top of the keycap has a spherical dish (used for the home row)
+    :param legend: the legend engraved into the top of the keycap, if any
+    :param mirrored: whether the legend is mirrored (to read correctly once the left side is mirrored)
+    :param thumb: whether the legend is rotated for the thumb well
+    """
+    if build_options.preview:
+        # Just the keycap's bounding box, without its dish or legend (which is among the slowest shapes to render).
+        (width, length) = (sa_length, sa_double_length if units == 2 else sa_length)
+        if turned:
+            (width, length) = (length, width)
+        return cube((width, length, 12.05), center=True).up(5 + 12.05 / 2).color(combined_colors['keycaps'])
+
+    shape = sa_cap(units)
+    if dished:
+        shape -= sphere(_fn=50, r=30).up(48)
+    if turned:
+        shape = shape.rotate((0, 0, 90))
+
+    shape = shape.color(combined_colors['keycaps'])
+
+    if legend:
+        key_text = (
+            text(
+                legend,
+                size=(
+                    keyswitch_type.keyswitch_length / 6
+                    if len(legend) > 1
+                    else keyswitch_type.keyswitch_length / 3
+                ),
+                halign='center',
+                valign='center',
+                font='FiraCode Nerd Font Propo',
+                #font='Segoe UI Symbol',
+            )
+            .linear_extrude(30)
+            .up(10)
+            .color(combined_colors['keycap_text'])
+        )
+        if mirrored:
+            key_text = key_text.mirror((1, 0, 0))
+        if thumb:
+            key_text = key_text.rotate((0, 0, -90))
+        shape -= key_text
+    return shape
+
+
+def switch_cap(assembly: KeyboardAssembly, thumb: bool) -> ShapeForLocationCallback:
+    def _switch_cap_inner(column, row):
+        units = 1
+        turned = False
+        dished = (column == 1 and row == 0) if thumb else (row == 2 and 1 <= column <= 4)
+        if not dished:
+            if isinstance(row, float) and not row.is_integer():
+                units = 2
             elif isinstance(column, float) and not column.is_integer():
-                shape = sa_cap(2).rotate((0, 0, 90))
-
-            shape = shape.color(combined_colors['keycaps'])
-
-            if keycap_text is not None:
-                rendered_keycap_text = keycap_text(column=column, row=row, thumb=thumb, left_side=assembly.left_side)
-                if rendered_keycap_text:
-                    key_text = (
-                        text(
-                            rendered_keycap_text,
-                            size=(
-                                keyswitch_type.keyswitch_length / 6
-                                if len(rendered_keycap_text) > 1
-                                else keyswitch_type.keyswitch_length / 3
-                            ),
-                            halign='center',
-                            valign='center',
-                            font='FiraCode Nerd Font Propo',
-                            #font='Segoe UI Symbol',
-                        )
-                        .linear_extrude(30)
-                        .up(10)
-                        .color(combined_colors['keycap_text'])
-                    )
-                    if assembly.left_side:
-                        key_text = key_text.mirror((1, 0, 0))
-                    if thumb:
-                        key_text = key_text.rotate((0, 0, -90))
-                    shape -= key_text
-            return shape
-        return _switch_cap_inner
-
-    right_finger_part = assembly.finger_part()
-    right_bottom = assembly.finger_bottom_cover()
-    right_bottom_with_feet = (
-        right_bottom
-        + assembly.finger_bottom_cover_feet()
-    )
-    right_bottom_with_nuts = (
-        right_bottom
-        + assembly.finger_bottom_cover_nuts()
-    )
-    right_bottom_with_tripod_mount = assembly.finger_bottom_cover_with_tripod_mount()
-    right_bottom_with_feet_and_tripod_mount = (
-        right_bottom_with_tripod_mount
-        + assembly.finger_bottom_cover_feet()
-    )
-    right_thumb_part = assembly.thumb_part()
-    right_connector = assembly.connector()
-    right_keycaps = (
-        assembly.finger_layout.place_all(switch_cap(thumb=False))
-        + assembly.thumb_layout.place_all(switch_cap(thumb=True))
-    )
-    right_keyswitches = (
-        assembly.finger_layout.place_all(keyswitch)
-        + assembly.thumb_layout.place_all(keyswitch)
+                units = 2
+                turned = True
+
+        legend = None
+        if keycap_text is not None:
+            legend = keycap_text(column=column, row=row, thumb=thumb, left_side=assembly.left_side) or None
+
+        if legend is None:
+            # Mirroring and rotating only affect the legend, so keycaps without one are shared across sides and wells.
+            return keycap(units, turned, dished)
+        return keycap(units, turned, dished, legend, mirrored=assembly.left_side, thumb=thumb)
+    return _switch_cap_inner
+
+
+def keyswitch(column, row):
+    if build_options.preview:
+        return cube(
+            (
+                keyswitch_type.switch_midline_width,
+                keyswitch_type.switch_midline_length,
+                keyswitch_type.switch_height_above_plate,
+            ),
+            center=True,
+        ).up(keyswitch_type.switch_height_above_plate / 2)
+    return keyswitch_type.switch()
+
+
+def finger_part(left_side: bool = False) -> OpenSCADObject:
+    return for_side(get_assembly(left_side).finger_part(), left_side)
+
+
+def thumb_part(left_side: bool = False) -> OpenSCADObject:
+    return for_side(get_assembly(left_side).thumb_part(), left_side)
+
+
+def connector(left_side: bool = False) -> OpenSCADObject:
+    return for_side(get_assembly(left_side).connector(), left_side)
+
+
+def single_piece(left_side: bool = False) -> OpenSCADObject:
+    return for_side(get_assembly(left_side).single_piece(), left_side)
+
+
+def bottom(left_side: bool = False) -> OpenSCADObject:
+    return for_side(get_assembly(left_side).finger_bottom_cover(), left_side)
+
+
+def bottom_with_feet(left_side: bool = False) -> OpenSCADObject:
+    assembly = get_assembly(left_side)
+    return for_side(
+        assembly.finger_bottom_cover()
+        + assembly.finger_bottom_cover_feet(),
+        left_side,
     )
-    right_pcbs = (
-        assembly.finger_layout.place_all(pcb_board)
-        + assembly.thumb_layout.place_all(pcb_board)
+
+
+def bottom_with_nuts(left_side: bool = False) -> OpenSCADObject:
+    assembly = get_assembly(left_side)
+    return for_side(
+        assembly.finger_bottom_cover()
+        + assembly.finger_bottom_cover_nuts(),
+        left_side,
+    )
+
+
+def bottom_with_tripod_mount(left_side: bool = False) -> OpenSCADObject:
+    return for_side(get_assembly(left_side).finger_bottom_cover_with_tripod_mount(), left_side)
+
+
+def bottom_with_feet_and_tripod_mount(left_side: bool = False) -> OpenSCADObject:
+    assembly = get_assembly(left_side)
+    return for_side(
+        assembly.finger_bottom_cover_with_tripod_mount()
+        + assembly.finger_bottom_cover_feet(),
+        left_side,
+    )
+
+
+def keycaps(left_side: bool = False) -> OpenSCADObject:
+    assembly = get_assembly(left_side)
+    return for_side(
+        assembly.finger_layout.place_all(switch_cap(assembly, thumb=False))
+        + assembly.thumb_layout.place_all(switch_cap(assembly, thumb=True)),
+        left_side,
     )
-    right_single_piece = assembly.single_piece()
-
-    # TODO: We probably shouldn't need to explicitly call .mirror((1, 0, 0)) here...
-    # Maybe wrap the assembly methods to automatically do this?
-    assembly.left_side = True
-    left_finger_part = assembly.finger_part().mirror((1, 0, 0))
-    left_bottom = assembly.finger_bottom_cover().mirror((1, 0, 0))
-    left_bottom_with_feet = (
-        left_bottom
-        + assembly.finger_bottom_cover_feet().mirror((1, 0, 0))
-    )
-    left_bottom_with_nuts = (
-        left_bottom
-        + assembly.finger_bottom_cover_nuts().mirror((1, 0, 0))
-    )
-    left_bottom_with_tripod_mount = assembly.finger_bottom_cover_with_tripod_mount().mirror((1, 0, 0))
-    left_bottom_with_feet_and_tripod_mount = (
-        left_bottom_with_tripod_mount
-        + assembly.finger_bottom_cover_feet().mirror((1, 0, 0))
-    )
-    left_thumb_part = assembly.thumb_part().mirror((1, 0, 0))
-    left_connector = assembly.connector().mirror((1, 0, 0))
-    left_keycaps = (
-        assembly.finger_layout.place_all(switch_cap(thumb=False))
-        + assembly.thumb_layout.place_all(switch_cap(thumb=True))
-    ).mirror((1, 0, 0))
-    left_keyswitches = (
+
+
+@lru_cache
+def _placed_keyswitches() -> OpenSCADObject:
+    assembly = get_assembly()
+    return (
         assembly.finger_layout.place_all(keyswitch)
         + assembly.thumb_layout.place_all(keyswitch)
-    ).mirror((1, 0, 0))
-    left_pcbs = (
+    )
+
+
+def keyswitches(left_side: bool = False) -> OpenSCADObject:
+    # Keyswitches are the same on both sides, so the left side is just a mirror image of the right.
+    return for_side(_placed_keyswitches(), left_side)
+
+
+@lru_cache
+def _placed_pcbs() -> OpenSCADObject:
+    assembly = get_assembly()
+    pcb_board = single_key_board(simple=build_options.preview)
+    return (
         assembly.finger_layout.place_all(pcb_board)
         + assembly.thumb_layout.place_all(pcb_board)
-    ).mirror((1, 0, 0))
-    left_single_piece = assembly.single_piece().mirror((1, 0, 0))
+    )
+
+
+def pcbs(left_side: bool = False) -> OpenSCADObject:
+    # PCBs are the same on both sides, so the left side is just a mirror image of the right.
+    return for_side(_placed_pcbs(), left_side)
+
 
-    assembled_lcd_mount = (
+def finger_well_mesh(left_side: bool = False) -> TriangleMesh:
+    mesh = get_assembly(left_side).finger_well_mesh()
+    return transform_mesh(mesh, mirroring((1, 0, 0))) if left_side else mesh
+
+
+def thumb_well_mesh(left_side: bool = False) -> TriangleMesh:
+    mesh = get_assembly(left_side).thumb_well_mesh()
+    return transform_mesh(mesh, mirroring((1, 0, 0))) if left_side else mesh
+
+
+def assembled_lcd_mount() -> OpenSCADObject:
+    assembly = get_assembly()
+    lcdMount = LCDMount(hardware=assembly.hardware)
+    return (
         lcdMount.frame()
         + lcdMount.mount(
             assembly.transform_finger_nut3(
@@ -292,260 +582,803 @@ if __name__ == "__main__":
         .translate((-100, 0, 0))
     )
 
-    def build_combined_output(separate_pieces=False, parts=()):
-        """Build a combined "assembly" view of the keyboard, with the given parts.
 
-        :param separate_pieces: whether the main body should consist of separate finger and thumb pieces with a connector
-        :type columns: bool
+bottom_variants = {
+    'bottom': 'bottom',
+    'bottom_with_feet': 'bottom-with-feet',
+    'bottom_with_nuts': 'bottom-with-nuts',
+    'bottom_with_tripod_mount': 'bottom-with-tripod-mount',
+    'bottom_with_feet_and_tripod_mount': 'bottom-with-feet-tripod',
+}
+"The name (after the side) of the part for each bottom cover variant which can be included in the combined output"
+
 
-        :param parts: the parts to include in the assembly (choices: 'trackpoint', 'keycaps', 'keyswitches', 'pcbs',
-        'bottom', 'bottom_with_feet', 'bottom_with_nuts', 'bottom_with_tripod_mount',
-        'bottom_with_feet_and_tripod_mount', 'lcd_mount')
-        :type parts: list[str]
-        """
-        right_combined = right_single_piece.color(combined_colors['combined'])
+def combined_dependencies(separate_pieces=False, parts=()) -> List[str]:
+    """Return the names of the parts used by `build_combined_output` with the given arguments, in the order it uses
+    them.
+    """
+    names = []
+    for side in ('right', 'left'):
         if separate_pieces:
-            right_combined = (
-                right_finger_part.color(combined_colors['finger_part'])
-                + right_thumb_part.color(combined_colors['thumb_part'])
-                + right_connector.color(combined_colors['connector'])
-            )
-        if 'trackpoint' in parts:
-            right_combined += assembly.transform_trackpoint_mount(assembly.trackpoint_mount.trackpoint_shape())
-        if 'keycaps' in parts:
-            right_combined += right_keycaps
-        if 'keyswitches' in parts:
-            right_combined += right_keyswitches.color(combined_colors['keyswitches'])
-        if 'pcbs' in parts:
-            right_combined += right_pcbs.color(combined_colors['pcbs'])
-
-        if 'bottom' in parts:
-            right_combined += right_bottom.color(combined_colors['bottom']).down(0.01)
-        elif 'bottom_with_feet' in parts:
-            right_combined += right_bottom_with_feet.color(combined_colors['bottom']).down(0.01)
-        elif 'bottom_with_nuts' in parts:
-            right_combined += right_bottom_with_nuts.color(combined_colors['bottom']).down(0.01)
-        elif 'bottom_with_tripod_mount' in parts:
-            right_combined += right_bottom_with_tripod_mount.color(combined_colors['bottom']).down(0.01)
-        elif 'bottom_with_feet_and_tripod_mount' in parts:
-            right_combined += right_bottom_with_feet_and_tripod_mount.color(combined_colors['bottom']).down(0.01)
-
-        combined = right_combined.right(100)
-
-        left_combined = left_single_piece.color(combined_colors['combined'])
+            names += [f"{side}-finger", f"{side}-thumb", f"{side}-connector"]
+        else:
+            names.append(f"{side}-single-piece")
+
+        names += [f"{side}-{name}" for name in ('keycaps', 'keyswitches', 'pcbs') if name in parts]
+
+        for (bottom_name, bottom_part_name) in bottom_variants.items():
+            if bottom_name in parts:
+                names.append(f"{side}-{bottom_part_name}")
+                break
+
+    if 'lcd_mount' in parts:
+        names.append('left-lcd-mount')
+
+    return names
+
+
+def build_combined_output(*shapes, separate_pieces=False, parts=()):
+    """Build a combined "assembly" view of the keyboard, with the given parts.
+
+    :param shapes: the shapes of the parts named by `combined_dependencies(separate_pieces, parts)`, in the same
+    order; if omitted, they're built using `part_registry`
+
+    :param separate_pieces: whether the main body should consist of separate finger and thumb pieces with a connector
+    :type columns: bool
+
+    :param parts: the parts to include in the assembly (choices: 'trackpoint', 'keycaps', 'keyswitches', 'pcbs',
+    'bottom', 'bottom_with_feet', 'bottom_with_nuts', 'bottom_with_tripod_mount',
+    'bottom_with_feet_and_tripod_mount', 'lcd_mount')
+    :type parts: list[str]
+    """
+    names = combined_dependencies(separate_pieces, parts)
+    if shapes:
+        shapes_by_name = dict(zip(names, shapes))
+    else:
+        shapes_by_name = {name: part_registry.build(name) for name in names}
+
+    def build_side(left_side):
+        assembly = get_assembly(left_side)
+        side = 'left' if left_side else 'right'
+
         if separate_pieces:
-            left_combined = (
-                left_finger_part.color(combined_colors['finger_part'])
-                + left_thumb_part.color(combined_colors['thumb_part'])
-                + left_connector.color(combined_colors['connector'])
+            side_combined = (
+                shapes_by_name[f"{side}-finger"].color(combined_colors['finger_part'])
+                + shapes_by_name[f"{side}-thumb"].color(combined_colors['thumb_part'])
+                + shapes_by_name[f"{side}-connector"].color(combined_colors['connector'])
             )
+        else:
+            side_combined = shapes_by_name[f"{side}-single-piece"].color(combined_colors['combined'])
+        if 'trackpoint' in parts and not left_side:
+            side_combined += assembly.transform_trackpoint_mount(assembly.trackpoint_mount.trackpoint_shape())
         if 'keycaps' in parts:
-            left_combined += left_keycaps
+            side_combined += shapes_by_name[f"{side}-keycaps"]
         if 'keyswitches' in parts:
-            left_combined += left_keyswitches.color(combined_colors['keyswitches'])
+            side_combined += shapes_by_name[f"{side}-keyswitches"].color(combined_colors['keyswitches'])
         if 'pcbs' in parts:
-            left_combined += left_pcbs.color(combined_colors['pcbs'])
-
-        if 'bottom' in parts:
-            left_combined += left_bottom.color(combined_colors['bottom']).down(0.01)
-        elif 'bottom_with_feet' in parts:
-            left_combined += left_bottom_with_feet.color(combined_colors['bottom']).down(0.01)
-        elif 'bottom_with_nuts' in parts:
-            left_combined += left_bottom_with_nuts.color(combined_colors['bottom']).down(0.01)
-        elif 'bottom_with_tripod_mount' in parts:
-            left_combined += left_bottom_with_tripod_mount.color(combined_colors['bottom']).down(0.01)
-        elif 'bottom_with_feet_and_tripod_mount' in parts:
-            left_combined += left_bottom_with_feet_and_tripod_mount.color(combined_colors['bottom']).down(0.01)
+            side_combined += shapes_by_name[f"{side}-pcbs"].color(combined_colors['pcbs'])
+
+        for (bottom_name, bottom_part_name) in bottom_variants.items():
+            if bottom_name in parts:
+                bottom = shapes_by_name[f"{side}-{bottom_part_name}"]
+                side_combined += bottom.color(combined_colors['bottom']).down(0.01)
+                break
+
+        return side_combined
+
+    combined = build_side(left_side=False).right(100)
+    combined += build_side(left_side=True).left(100)
+
+    if 'lcd_mount' in parts:
+        combined += shapes_by_name['left-lcd-mount'].color(combined_colors['lcd_mount'])
+
+    return combined
+
+
+part_registry = PartRegistry([
+    *(
+        Part(f"{side}-{name}", f"{side} {description}", partial(build, left_side=left_side), default=default)
+        for (side, left_side) in (('right', False), ('left', True))
+        for (name, description, build, default) in (
+            ('finger', 'finger', finger_part, True),
+            ('thumb', 'thumb', thumb_part, True),
+            ('connector', 'connector', connector, True),
+            ('single-piece', 'single_piece', single_piece, True),
+            ('bottom', 'bottom', bottom, True),
+            ('bottom-with-feet', 'bottom_with_feet', bottom_with_feet, True),
+            ('bottom-with-nuts', 'bottom_with_nuts', bottom_with_nuts, True),
+            ('bottom-with-tripod-mount', 'bottom_with_tripod_mount', bottom_with_tripod_mount, True),
+            ('bottom-with-feet-tripod', 'bottom_with_feet_and_tripod_mount', bottom_with_feet_and_tripod_mount, True),
+            ('keycaps', 'keycaps', keycaps, False),
+            ('keyswitches', 'keyswitches', keyswitches, False),
+            ('pcbs', 'PCBs', pcbs, False),
+        )
+    ),
+    Part('left-lcd-mount', 'LCD mount', assembled_lcd_mount),
+    Part(
+        'combined',
+        'combined',
+        partial(build_combined_output, separate_pieces=False, parts=combined_parts),
+        dependencies=combined_dependencies(separate_pieces=False, parts=combined_parts),
+    ),
+])
+"""All parts of the keyboard, in the order they're exported. (Keycaps, keyswitches, and PCBs are only built for the
+combined output, unless requested explicitly.)"""
+
+
+def build_part(name: str, options: Optional[BuildOptions] = None) -> OpenSCADObject:
+    """Build the named part (see `part_registry`) in this process.
+
+    :param name: the name of the part
+    :param options: the options to build with (see `configure`); if None, use the current options
+    """
+    if options is not None:
+        configure(options)
+    return part_registry.build(name)
+
+
+mesh_parts: List[Part] = [
+    Part(f"{side}-{name}", f"{side} {description}", partial(build, left_side=left_side))
+    for (side, left_side) in (('right', False), ('left', True))
+    for (name, description, build) in (
+        ('finger-well', 'finger well', finger_well_mesh),
+        ('thumb-well', 'thumb well', thumb_well_mesh),
+    )
+]
+"""The parts of the keyboard which can be written directly as meshes (see `mesh`); these build `TriangleMesh`es rather
+than OpenSCAD shapes."""
 
-        combined += left_combined.left(100)
 
-        if 'lcd_mount' in parts:
-            combined += assembled_lcd_mount.color(combined_colors['lcd_mount'])
+def output_filepath(suffix: Optional[str] = None, extension: str = 'scad'):
+    """Return an absolute path to an output file in the output directory (see `BuildOptions.output_dir`).
 
-        return combined
+    :param suffix: an optional suffix to append to the filename
+    :param extension: the extension of the filename
+    """
+    prefix = f"dactyl-lynx-{build_options.columns}x{build_options.rows}"
+    if build_options.preview:
+        prefix += "-preview"
 
-    def output_filepath(suffix: Optional[str] = None):
-        """Return an absolute path to an output file in the `things/` directory.
+    filename = f"{prefix}.{extension}"
+    if suffix:
+        filename = f"{prefix}-{suffix}.{extension}"
 
-        :param suffix: an optional suffix to append to the filename
-        """
-        prefix = f"dactyl-lynx-{assembly.finger_layout.columns}x{assembly.finger_layout.rows}"
+    return abspath(join(build_options.output_dir or join(dirname(dirname(__file__)), "things"), filename))
 
-        filename = f"{prefix}.scad"
-        if suffix:
-            filename = f"{prefix}-{suffix}.scad"
 
-        return abspath(join(dirname(dirname(__file__)), "things", filename))
+def part_filepath(part: Part) -> str:
+    """Return the path of the OpenSCAD file for the given part.
 
-    right_finger_filepath = output_filepath("right-finger")
-    print(f"Writing right finger output to {right_finger_filepath} . . .")
-    right_finger_part.save_as_scad(right_finger_filepath)
+    :param part: the part
+    """
+    return output_filepath(None if part.name == 'combined' else part.name)
 
-    right_thumb_filepath = output_filepath("right-thumb")
-    print(f"Writing right thumb output to {right_thumb_filepath} . . .")
-    right_thumb_part.save_as_scad(right_thumb_filepath)
 
-    right_connector_filepath = output_filepath("right-connector")
-    print(f"Writing right connector output to {right_connector_filepath} . . .")
-    right_connector.save_as_scad(right_connector_filepath)
+def export_registered_parts(parts: Sequence[Part], jobs: Optional[int] = None) -> List[ExportResult]:
+    """Build and write each of the given parts of `part_registry` (see `export_parts`).
 
-    right_single_piece_filepath = output_filepath("right-single-piece")
-    print(f"Writing right single_piece output to {right_single_piece_filepath} . . .")
-    right_single_piece.save_as_scad(right_single_piece_filepath)
+    :param parts: the parts to export
+    :param jobs: the maximum number of worker processes; if None, use the number of CPUs
+    """
+    return export_parts(
+        # Each part is built by name (with this build's options, which worker processes don't otherwise know about),
+        # so any parts it depends on are built (once) in the same process.
+        [part._replace(build=partial(build_part, part.name, build_options), dependencies=()) for part in parts],
+        [part_filepath(part) for part in parts],
+        jobs=jobs,
+    )
 
-    right_bottom_filepath = output_filepath("right-bottom")
-    print(f"Writing right bottom output to {right_bottom_filepath} . . .")
-    right_bottom.save_as_scad(right_bottom_filepath)
 
-    right_bottom_with_feet_filepath = output_filepath("right-bottom-with-feet")
-    print(f"Writing right bottom_with_feet output to {right_bottom_with_feet_filepath} . . .")
-    right_bottom_with_feet.save_as_scad(right_bottom_with_feet_filepath)
+def generate(args: argparse.Namespace) -> int:
+    """Write the OpenSCAD files for the requested parts (or all default parts).
+    """
+    if args.list:
+        for part in part_registry.parts.values():
+            dependencies = f" (uses {', '.join(part.dependencies)})" if part.dependencies else ''
+            default = '' if part.default else ' [only on request]'
+            print(f"{part.name:32} {part.description}{default}{dependencies}")
+        return 0
+
+    try:
+        parts = part_registry.select(args.parts) if args.parts else part_registry.default_parts()
+    except KeyError as error:
+        print(f"{error.args[0]}; use --list to see all parts")
+        return 2
+
+    start = time.perf_counter()
+    try:
+        results = export_registered_parts(parts, jobs=args.jobs)
+    except HardwareMeshError as error:
+        print(error, file=sys.stderr)
+        return 1
+    changed = sum(1 for result in results if result.changed)
+    print(f"Built {len(results)} parts in {time.perf_counter() - start:.2f}s; {changed} changed")
+    return 0
+
+
+def render(args: argparse.Namespace) -> int:
+    """Render STL (or 3MF) files from the OpenSCAD files written by `generate`.
+    """
+    scad_filepaths = args.files or [
+        filepath
+        for filepath in (part_filepath(part) for part in part_registry.default_parts() if part.name != 'combined')
+        if exists(filepath)
+    ]
 
-    right_bottom_with_nuts_filepath = output_filepath("right-bottom-with-nuts")
-    print(f"Writing right bottom_with_nuts output to {right_bottom_with_nuts_filepath} . . .")
-    right_bottom_with_nuts.save_as_scad(right_bottom_with_nuts_filepath)
+    start = time.perf_counter()
+    try:
+        results = render_files(
+            scad_filepaths,
+            jobs=args.jobs,
+            force=args.force or args.profile,
+            openscad=args.openscad,
+            output_format=args.format,
+        )
+    except OpenSCADNotFoundError as error:
+        print(error, file=sys.stderr)
+        return 1
+    failures = sum(1 for result in results if result.returncode != 0)
+    print(f"Rendered {len(results) - failures} of {len(results)} files in {time.perf_counter() - start:.2f}s")
+
+    if args.profile:
+        profiles = profile_results(results)
+        print()
+        for profile in profiles:
+            peak_rss = (
+                f"{profile.peak_rss_bytes / 2**20:8.1f} MiB" if profile.peak_rss_bytes is not None else "       ? MiB"
+            )
+            print(
+                f"{profile.seconds:8.2f}s {peak_rss} {profile.triangles or 0:9} triangles "
+                f"{profile.output_bytes or 0:11} bytes  {basename(profile.file)}"
+            )
+        for report_filepath in write_report(profiles, dirname(output_filepath())):
+            print(f"Wrote render profile to {report_filepath}")
+
+    return 1 if failures else 0
+
+
+def mesh(args: argparse.Namespace) -> int:
+    """Write the key wells directly to STL (or 3MF) files, without OpenSCAD.
+    """
+    start = time.perf_counter()
+    for part in mesh_parts:
+        part_start = time.perf_counter()
+        filepath = output_filepath(part.name, extension=args.format)
+        try:
+            part_mesh = part.build()
+        except UnsupportedShapeError as error:
+            print(f"Unable to build {part.description} as a mesh: {error}")
+            return 1
+
+        write_mesh(part_mesh, filepath, name=part.name, output_format=args.format)
+        print(
+            f"Wrote {part.description} mesh to {filepath} "
+            f"({len(part_mesh.triangles)} triangles, {time.perf_counter() - part_start:.2f}s)"
+        )
 
-    right_bottom_with_tripod_mount_filepath = output_filepath("right-bottom-with-tripod-mount")
-    print(f"Writing right bottom_with_tripod_mount output to {right_bottom_with_tripod_mount_filepath} . . .")
-    right_bottom_with_tripod_mount.save_as_scad(right_bottom_with_tripod_mount_filepath)
+    print(f"Built {len(mesh_parts)} meshes in {time.perf_counter() - start:.2f}s")
+    return 0
 
-    right_bottom_with_feet_and_tripod_mount_filepath = output_filepath("right-bottom-with-feet-tripod")
-    print(f"Writing right bottom_with_feet_and_tripod_mount output to {right_bottom_with_feet_and_tripod_mount_filepath} . . .")
-    right_bottom_with_feet_and_tripod_mount.save_as_scad(right_bottom_with_feet_and_tripod_mount_filepath)
 
-    left_finger_filepath = output_filepath("left-finger")
-    print(f"Writing left finger output to {left_finger_filepath} . . .")
-    left_finger_part.save_as_scad(left_finger_filepath)
+def build_options_from_args(args: argparse.Namespace) -> BuildOptions:
+    """Return the build options given on the command line, using the defaults for any options which weren't given.
+    """
+    return BuildOptions(**{field: getattr(args, field) for field in BuildOptions._fields if hasattr(args, field)})
 
-    left_thumb_filepath = output_filepath("left-thumb")
-    print(f"Writing left thumb output to {left_thumb_filepath} . . .")
-    left_thumb_part.save_as_scad(left_thumb_filepath)
 
-    left_connector_filepath = output_filepath("left-connector")
-    print(f"Writing left connector output to {left_connector_filepath} . . .")
-    left_connector.save_as_scad(left_connector_filepath)
+def poses(args: argparse.Namespace) -> int:
+    """Write the pose of every key (and its wiring matrix coordinates and legend) to a JSON or NumPy file.
+    """
+    key_poses = [
+        pose
+        for left_side in (False, True)
+        for (layout, thumb) in (
+            (get_assembly(left_side).finger_layout, False),
+            (get_assembly(left_side).thumb_layout, True),
+        )
+        for pose in layout_poses(
+            layout,
+            left_side=left_side,
+            thumb=thumb,
+            matrix_coords=legend_table(matrix_coords),
+            legend=keycap_text,
+        )
+    ]
 
-    left_single_piece_filepath = output_filepath("left-single-piece")
-    print(f"Writing left single_piece output to {left_single_piece_filepath} . . .")
-    left_single_piece.save_as_scad(left_single_piece_filepath)
+    filepath = output_filepath('key-poses', extension=args.format)
+    metadata = {
+        'options': {field: value for (field, value) in build_options._asdict().items() if field != 'output_dir'},
+        # The offset of each side's part in the combined output (see `build_combined_output`)
+        'combined_offsets': {'right': [100, 0, 0], 'left': [-100, 0, 0]},
+    }
+    pose_writers[args.format](key_poses, filepath, metadata)
+
+    print(f"Wrote {len(key_poses)} key poses to {filepath}")
+    return 0
+
+
+def camera(args: argparse.Namespace) -> int:
+    """Print OpenSCAD's `--camera` argument framing the given part (by default, the combined output), computed from the
+    part's bounds without running OpenSCAD.
+    """
+    try:
+        [part] = part_registry.select([args.part])
+    except (KeyError, ValueError):
+        print(f"{args.part} doesn't match exactly one part; use `generate --list` to see all parts", file=sys.stderr)
+        return 2
+
+    try:
+        bounds = shape_bounds(part_registry.build(part.name))
+    except UnknownBoundsError as error:
+        print(f"Can't frame {part.name}: {error}", file=sys.stderr)
+        return 1
+    if bounds is None:
+        print(f"Can't frame {part.name}: it's empty", file=sys.stderr)
+        return 1
+
+    (width, height) = args.image_size
+    print(openscad_camera(bounds, args.rotation, aspect_ratio=width / height))
+    return 0
+
+
+def watch(args: argparse.Namespace) -> int:
+    """Rebuild the requested parts (or all default parts) whenever the package's sources change, rendering any whose
+    OpenSCAD code changed in the background.
+    """
+    package_dir = dirname(abspath(__file__))
+    package_name = __package__ or basename(package_dir)
+    root = f"{package_name}.dactyl_lynx"
+    options = build_options_from_args(args)
+
+    if args.render:
+        try:
+            openscad_version(args.openscad)
+        except OpenSCADNotFoundError as error:
+            print(error, file=sys.stderr)
+            return 1
+
+    watcher = SourceWatcher(package_dir)
+    # A single render thread, so each batch of renders (and its updates to the manifest) finishes before the next
+    # starts; OpenSCAD files rewritten in the meantime are re-rendered by the next batch.
+    renderer = ThreadPoolExecutor(max_workers=1)
+
+    def report_renders(future):
+        try:
+            results = future.result()
+        except Exception as error:
+            print(f"Rendering failed: {error}")
+        else:
+            if results:
+                failures = sum(1 for result in results if result.returncode != 0)
+                print(f"Rendered {len(results) - failures} of {len(results)} files; waiting for changes . . .")
+
+    changed_paths: List[str] = []
+    try:
+        while True:
+            start = time.perf_counter()
+            try:
+                # Only the changed modules (and the modules which import them) are loaded again.
+                builder = reload_changed_modules(package_dir, package_name, changed_paths, root)
+                builder.configure(options)
+                registry = builder.part_registry
+                parts = registry.select(args.parts) if args.parts else registry.default_parts()
+                results = builder.export_registered_parts(parts, jobs=args.jobs)
+            except Exception:
+                traceback.print_exc()
+                print("Build failed; waiting for changes . . .")
+            else:
+                changed = [result for result in results if result.changed]
+                print(f"Built {len(results)} parts in {time.perf_counter() - start:.2f}s; {len(changed)} changed")
+
+                if args.render:
+                    # Files which are already up to date (e.g. unchanged since their last render) are skipped.
+                    renderer.submit(
+                        render_files,
+                        [result.filepath for result in results if result.part.name != 'combined'],
+                        jobs=args.jobs,
+                        openscad=args.openscad,
+                        output_format=args.format,
+                    ).add_done_callback(report_renders)
+                else:
+                    print("Waiting for changes . . .")
+
+            changed_paths = watcher.wait(args.interval)
+            print(f"Changed: {', '.join(relpath(path, package_dir) for path in changed_paths)}")
+    except KeyboardInterrupt:
+        print("Stopping; waiting for renders to finish . . .")
+        renderer.shutdown(cancel_futures=True)
+        return 0
+
+
+def variant_options(variant: SweepVariant, base_options: BuildOptions, output_dir: str) -> BuildOptions:
+    """Return the build options for the given sweep variant.
+
+    :param variant: the variant
+    :param base_options: the options for any settings the variant doesn't specify
+    :param output_dir: the sweep's output directory (each variant is written to a subdirectory named after it)
+    """
+    return base_options._replace(**variant.settings, output_dir=join(output_dir, variant.name))
+
+
+def generate_variant(
+    variant: SweepVariant,
+    base_options: BuildOptions,
+    output_dir: str,
+    patterns: Sequence[str] = (),
+) -> VariantResult:
+    """Write the OpenSCAD files for the given sweep variant (see `sweep`) in this process.
+
+    :param variant: the variant to build
+    :param base_options: the options for any settings the variant doesn't specify
+    :param output_dir: the sweep's output directory (the variant is written to a subdirectory named after it)
+    :param patterns: the names or glob patterns of the parts to build (default: all default parts)
+    """
+    start = time.perf_counter()
+    options = variant_options(variant, base_options, output_dir)
+    assert options.output_dir is not None
+    settings = {field: value for (field, value) in options._asdict().items() if field != 'output_dir'}
+    files: List[str] = []
+
+    def result(error: Optional[str] = None) -> VariantResult:
+        assert options.output_dir is not None
+        return VariantResult(variant, settings, options.output_dir, files, time.perf_counter() - start, error)
+
+    try:
+        os.makedirs(options.output_dir, exist_ok=True)
+        configure(options)
+
+        for part in part_registry.select(patterns) if patterns else part_registry.default_parts():
+            part = part._replace(build=partial(build_part, part.name), dependencies=())
+            files.append(export_part(part, part_filepath(part)).filepath)
+    except Exception as error:
+        # Report the failure in the sweep's index, rather than abandoning the rest of the sweep.
+        return result(f"{type(error).__name__}: {error}")
+
+    return result()
+
+
+def sweep(args: argparse.Namespace) -> int:
+    """Write the OpenSCAD files for each variant described in a sweep file, and a summary index of all variants.
+    """
+    base_options = build_options_from_args(args)
+    output_dir = abspath(base_options.output_dir or os.path.splitext(args.sweep_file)[0])
+    fields = [field for field in BuildOptions._fields if field != 'output_dir']
+
+    try:
+        variants = expand_sweep(read_sweep_file(args.sweep_file), fields)
+        for variant in variants:
+            check_build_options(variant_options(variant, base_options, output_dir))
+        if args.parts:
+            part_registry.select(args.parts)
+    except (ValueError, KeyError) as error:
+        print(f"Invalid sweep {args.sweep_file}: {error.args[0]}")
+        return 2
+
+    os.makedirs(output_dir, exist_ok=True)
+
+    start = time.perf_counter()
+    results = build_variants(
+        variants,
+        partial(generate_variant, base_options=base_options, output_dir=output_dir, patterns=args.parts),
+        jobs=args.jobs,
+    )
+    failures = sum(1 for result in results if result.error is not None)
+    print(f"Built {len(results) - failures} of {len(results)} variants in {time.perf_counter() - start:.2f}s")
 
-    left_bottom_filepath = output_filepath("left-bottom")
-    print(f"Writing left bottom output to {left_bottom_filepath} . . .")
-    left_bottom.save_as_scad(left_bottom_filepath)
+    for index_filepath in write_index(results, output_dir, fields):
+        print(f"Wrote sweep index to {index_filepath}")
 
-    left_bottom_with_feet_filepath = output_filepath("left-bottom-with-feet")
-    print(f"Writing left bottom_with_feet output to {left_bottom_with_feet_filepath} . . .")
-    left_bottom_with_feet.save_as_scad(left_bottom_with_feet_filepath)
+    return 1 if failures else 0
 
-    left_bottom_with_nuts_filepath = output_filepath("left-bottom-with-nuts")
-    print(f"Writing left bottom_with_nuts output to {left_bottom_with_nuts_filepath} . . .")
-    left_bottom_with_nuts.save_as_scad(left_bottom_with_nuts_filepath)
 
-    left_bottom_with_tripod_mount_filepath = output_filepath("left-bottom-with-tripod-mount")
-    print(f"Writing left bottom_with_tripod_mount output to {left_bottom_with_tripod_mount_filepath} . . .")
-    left_bottom_with_tripod_mount.save_as_scad(left_bottom_with_tripod_mount_filepath)
+def main() -> int:
+    defaults = BuildOptions()
 
-    left_bottom_with_feet_and_tripod_mount_filepath = output_filepath("left-bottom-with-feet-tripod")
-    print(f"Writing left bottom_with_feet_and_tripod_mount output to {left_bottom_with_feet_and_tripod_mount_filepath} . . .")
-    left_bottom_with_feet_and_tripod_mount.save_as_scad(left_bottom_with_feet_and_tripod_mount_filepath)
+    # Build options are accepted both before and after the command, so they default to SUPPRESS (rather than their
+    # real defaults) to avoid each parser overwriting the other's values; `build_options_from_args` fills them in.
+    # (Note: there's no `-m` short option, since `spkb.keyswitch` refuses to load if `-m` is on the command line.)
+    options_parser = argparse.ArgumentParser(add_help=False)
+    options_group = options_parser.add_argument_group("build options")
+    options_group.add_argument(
+        "--columns",
+        metavar="N",
+        type=int,
+        default=argparse.SUPPRESS,
+        help=f"the number of columns in the finger well (default: {defaults.columns})",
+    )
+    options_group.add_argument(
+        "--rows",
+        metavar="N",
+        type=int,
+        default=argparse.SUPPRESS,
+        help=f"the number of rows in the finger well (default: {defaults.rows})",
+    )
+    options_group.add_argument(
+        "--use-1-5u-keys",
+        action=argparse.BooleanOptionalAction,
+        default=argparse.SUPPRESS,
+        help="use 1.5u keys for the outer columns of the finger well "
+        f"(default: {'--use-1-5u-keys' if defaults.use_1_5u_keys else '--no-use-1-5u-keys'})",
+    )
+    options_group.add_argument(
+        "--rad-per-row",
+        metavar="RADIANS",
+        type=float,
+        default=argparse.SUPPRESS,
+        help="the finger well's cupping per row, in radians (default: the layout's default)",
+    )
+    options_group.add_argument(
+        "--rad-per-col",
+        metavar="RADIANS",
+        type=float,
+        default=argparse.SUPPRESS,
+        help="the finger well's cupping per column, in radians (default: the layout's default)",
+    )
+    options_group.add_argument(
+        "--keyswitch",
+        choices=list(keyswitch_types),
+        default=argparse.SUPPRESS,
+        help=f"the keyswitch type (default: {defaults.keyswitch})",
+    )
+    options_group.add_argument(
+        "--with-board",
+        action=argparse.BooleanOptionalAction,
+        default=argparse.SUPPRESS,
+        help="mount each keyswitch on a single-key PCB "
+        f"(default: {'--with-board' if defaults.with_board else '--no-with-board'})",
+    )
+    options_group.add_argument(
+        "--socket",
+        choices=list(socket_shapes),
+        default=argparse.SUPPRESS,
+        help="the shape of the keyswitch sockets: a plain plate, a plate with a backplate for hotswap sockets and "
+        f"LEDs, or a plate engraved with each key's position (default: {defaults.socket})",
+    )
+    options_group.add_argument(
+        "--legends",
+        choices=list(keycap_legends),
+        default=argparse.SUPPRESS,
+        help="the keycap legends: none, each key's layout coordinates, its wiring matrix coordinates, or the `lynx` "
+        f"key mapping (default: {defaults.legends})",
+    )
+    options_group.add_argument(
+        "--preview",
+        action=argparse.BooleanOptionalAction,
+        default=argparse.SUPPRESS,
+        help="substitute simplified, low-polygon shapes for keycaps, keyswitches, PCBs, threads, and magnet holes, for "
+        "quick visual checks; files are named dactyl-lynx-COLSxROWS-preview* (default: --no-preview)",
+    )
+    options_group.add_argument(
+        "--threads",
+        action=argparse.BooleanOptionalAction,
+        default=argparse.SUPPRESS,
+        help="give threaded holes (e.g. the tenting nuts) real threads; use --no-threads for much faster iteration "
+        "builds with plain bores instead, and the default for the final release build, which only changes the parts "
+        "that contain threads (default: --threads)",
+    )
+    options_group.add_argument(
+        "--hardware-meshes",
+        action=argparse.BooleanOptionalAction,
+        default=argparse.SUPPRESS,
+        help="render repeated hardware features (nuts, magnet holes, screw holes) once to STL files in a hardware/ "
+        "directory next to the output files (running $OPENSCAD, or `openscad`), and import them into the parts "
+        "instead of repeating their CSG (default: --no-hardware-meshes)",
+    )
+    options_group.add_argument(
+        "-o",
+        "--output-dir",
+        metavar="DIR",
+        default=argparse.SUPPRESS,
+        help="the directory to write output files to (default: things/)",
+    )
 
-    lcd_mount_filepath = output_filepath("left-lcd-mount")
-    print(f"Writing LCD mount output to {lcd_mount_filepath} . . .")
-    assembled_lcd_mount.save_as_scad(lcd_mount_filepath)
+    jobs_parser = argparse.ArgumentParser(add_help=False)
+    jobs_parser.add_argument(
+        "-j",
+        "--jobs",
+        metavar="N",
+        type=int,
+        default=argparse.SUPPRESS,
+        help="the number of parts to build or render in parallel (default: the number of CPUs)",
+    )
 
-    combined_filepath = output_filepath()
-    print(f"Writing combined output to {combined_filepath} . . .")
-    build_combined_output(
-        separate_pieces=False,
-        parts=combined_parts,
-    ).save_as_scad(combined_filepath)
+    parser = argparse.ArgumentParser(
+        description="Build a Dactyl Lynx keyboard model.",
+        parents=[jobs_parser, options_parser],
+    )
+    parser.set_defaults(command=generate, jobs=None, parts=[], list=False)
+    subparsers = parser.add_subparsers(title="commands")
 
-    import sys
-    sys.exit(0)
-#######
+    generate_parser = subparsers.add_parser(
+        "generate",
+        parents=[jobs_parser, options_parser],
+        help="write the OpenSCAD files for the given parts, or all parts (the default)",
+    )
+    generate_parser.set_defaults(command=generate)
+    generate_parser.add_argument(
+        "parts",
+        metavar="PART",
+        nargs="*",
+        help="the parts to build, by name or glob pattern (e.g. right-bottom-with-feet or 'left-*'); only these parts "
+        "(and any parts they use) are built (default: all parts except those only built on request)",
+    )
+    generate_parser.add_argument(
+        "--list",
+        action="store_true",
+        help="list the available parts, and exit",
+    )
 
-    parser = argparse.ArgumentParser(description="Build a Dactyl Lynx keyboard model.")
-    parser.add_argument(
-        "finger_columns",
-        metavar="COLS",
-        type=int,
-        default=6,
-        nargs="?",
-        help="the number of columns in the finger well",
+    render_parser = subparsers.add_parser(
+        "render",
+        parents=[jobs_parser, options_parser],
+        help="render STL (or 3MF) files from the generated OpenSCAD files",
     )
-    parser.add_argument(
-        "finger_rows",
-        metavar="ROWS",
-        type=int,
-        default=5,
-        nargs="?",
-        help="the number of rows in the finger well",
+    render_parser.set_defaults(command=render)
+    render_parser.add_argument(
+        "files",
+        metavar="FILE",
+        nargs="*",
+        help="the OpenSCAD files to render (default: all generated parts)",
     )
-    parser.add_argument(
-        "--with-keycaps",
+    render_parser.add_argument(
+        "-f",
+        "--force",
         action="store_true",
         default=False,
-        dest="show_keycaps",
-        help="render keycaps (default: don't render keycaps)",
+        help="render files even if their output file is up to date",
     )
-    parser.add_argument(
-        "--without-keycaps",
-        action="store_false",
-        dest="show_keycaps",
-        help="don't render keycaps",
+    render_parser.add_argument(
+        "--format",
+        choices=sorted(export_formats),
+        default="stl",
+        help="the format of the files to render: binary STL or 3MF (default: stl)",
     )
-    parser.add_argument(
-        "--with-sockets",
+    render_parser.add_argument(
+        "--profile",
         action="store_true",
+        default=False,
+        help="render all files (implies --force), and write a report of each file's render time, peak memory, "
+        "triangle count, and output file size to render-profile.{csv,json} in the output directory; use --jobs 1 for "
+        "the most accurate timings",
+    )
+    render_parser.add_argument(
+        "--openscad",
+        metavar="PATH",
+        default=os.environ.get("OPENSCAD", "openscad"),
+        help="the OpenSCAD executable to run (default: $OPENSCAD, or `openscad`)",
+    )
+
+    mesh_parser = subparsers.add_parser(
+        "mesh",
+        parents=[options_parser],
+        help="write the key wells (switch sockets and webs only) directly to STL (or 3MF) files, without OpenSCAD",
+    )
+    mesh_parser.set_defaults(command=mesh)
+    mesh_parser.add_argument(
+        "--format",
+        choices=sorted(mesh_writers),
+        default="stl",
+        help="the format of the files to write: binary STL or 3MF (default: stl)",
+    )
+
+    poses_parser = subparsers.add_parser(
+        "poses",
+        parents=[options_parser],
+        help="write the pose (placement matrix, center, and normal) of every key, along with its wiring matrix "
+        "coordinates and legend, to a JSON or NumPy file for use by other tools",
+    )
+    poses_parser.set_defaults(command=poses)
+    poses_parser.add_argument(
+        "--format",
+        choices=sorted(pose_writers),
+        default="json",
+        help="the format of the file to write: JSON, or a compressed NumPy .npz file with one array per field "
+        "(default: json)",
+    )
+
+    camera_parser = subparsers.add_parser(
+        "camera",
+        parents=[options_parser],
+        help="print OpenSCAD's --camera argument framing the given part (computed from its bounds), for rendering "
+        "images",
+    )
+    camera_parser.set_defaults(command=camera)
+    camera_parser.add_argument(
+        "part",
+        metavar="PART",
+        nargs="?",
+        default="combined",
+        help="the part to frame (default: combined)",
+    )
+    camera_parser.add_argument(
+        "--rotation",
+        metavar=("RX", "RY", "RZ"),
+        nargs=3,
+        type=float,
+        default=(69.7, 0, 30),
+        help="the rotation of the camera around the X, Y, and Z axes, in degrees (default: 69.7 0 30)",
+    )
+    camera_parser.add_argument(
+        "--image-size",
+        metavar=("WIDTH", "HEIGHT"),
+        nargs=2,
+        type=int,
+        default=(3840, 1800),
+        help="the size of the image to frame the part in, as passed to OpenSCAD's --imgsize (default: 3840 1800)",
+    )
+
+    watch_parser = subparsers.add_parser(
+        "watch",
+        parents=[jobs_parser, options_parser],
+        help="rebuild the given parts (or all parts) whenever the package's sources change, reloading only the "
+        "changed modules, and render the parts whose OpenSCAD code changed in the background",
+    )
+    watch_parser.set_defaults(command=watch)
+    watch_parser.add_argument(
+        "parts",
+        metavar="PART",
+        nargs="*",
+        help="the parts to build, by name or glob pattern (default: all parts except those only built on request)",
+    )
+    watch_parser.add_argument(
+        "--render",
+        action=argparse.BooleanOptionalAction,
         default=True,
-        dest="show_sockets",
-        help="render keyswitch sockets",
+        help="render changed parts to STL (or 3MF) files (default: --render)",
     )
-    parser.add_argument(
-        "--without-sockets",
-        action="store_false",
-        dest="show_sockets",
-        help="don't render keyswitch sockets (default: render sockets)",
+    watch_parser.add_argument(
+        "--format",
+        choices=sorted(export_formats),
+        default="stl",
+        help="the format of the files to render: binary STL or 3MF (default: stl)",
     )
-    parser.add_argument(
-        "-o",
-        "--output",
-        metavar="FILE",
-        type=str,
-        default=None,
-        help="the name of the file to write to",
+    watch_parser.add_argument(
+        "--openscad",
+        metavar="PATH",
+        default=os.environ.get("OPENSCAD", "openscad"),
+        help="the OpenSCAD executable to run (default: $OPENSCAD, or `openscad`)",
+    )
+    watch_parser.add_argument(
+        "--interval",
+        metavar="SECONDS",
+        type=float,
+        default=0.5,
+        help="how often to check the sources for changes (default: 0.5)",
     )
 
-    args = parser.parse_args()
+    sweep_parser = subparsers.add_parser(
+        "sweep",
+        parents=[jobs_parser, options_parser],
+        help="write the OpenSCAD files for each variant described in a TOML or JSON sweep file (see README), each in "
+        "its own directory, with a summary index; build options given on the command line apply to all variants",
+    )
+    sweep_parser.set_defaults(command=sweep)
+    sweep_parser.add_argument(
+        "sweep_file",
+        metavar="SWEEP_FILE",
+        help="the sweep file; variants are written to subdirectories of --output-dir (default: a directory next to the "
+        "sweep file, named after it)",
+    )
+    sweep_parser.add_argument(
+        "parts",
+        metavar="PART",
+        nargs="*",
+        help="the parts to build for each variant, by name or glob pattern (default: all parts except those only built "
+        "on request)",
+    )
 
-    def build_filepath():
-        return join(
-            dirname(dirname(dirname(abspath(__file__)))),
-            "things",
-            args.output
-            or f"dactyl-lynx-{args.finger_columns}x{args.finger_rows}.scad",
-        )
+    args = parser.parse_args()
+    if args.command is sweep:
+        # Each variant has its own options and output directory, so the sweep itself applies them.
+        return sweep(args)
 
-    filepath = build_filepath()
+    options = build_options_from_args(args)
+    if options.output_dir:
+        os.makedirs(options.output_dir, exist_ok=True)
+    configure(options)
 
-    print(f"Building board with {args.finger_columns}x{args.finger_rows} "
-          "finger wells . . .")
+    return args.command(args)
 
-    layout = Layout(
-        finger_columns=args.finger_columns,
-        finger_rows=args.finger_rows,
-    )
 
-    print(f"Writing output to {filepath} . . .")
-    (
-        (
-            layout.finger_caps()
-            + layout.thumb_caps()
-            if args.show_keycaps else nothing
-        )
-        + (
-            layout.finger_place_all(keyswitch_type.plate_with_backplate())
-            + layout.thumb_place_all(keyswitch_type.plate_with_backplate())
-            if args.show_sockets else nothing
-        )
-    ).save_as_scad(filepath)
+if __name__ == "__main__":
+    sys.exit(main())
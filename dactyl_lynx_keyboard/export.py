@@ -0,0 +1,184 @@
+"""Exporting parts of the keyboard to OpenSCAD files, optionally across several processes.
+"""
+import filecmp
+import fnmatch
+import os
+import time
+from collections.abc import Callable, Iterable, Sequence
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Dict, List, NamedTuple, Optional
+
+from solid2.core.object_base import OpenSCADObject
+
+from .scad import scad_write_with_modules
+
+
+class Part(NamedTuple):
+    """A part which can be built and exported independently of all other parts.
+    """
+    name: str
+    "The name of this part (e.g. `right-finger`)"
+    description: str
+    "A human-readable description of this part"
+    build: Callable[..., OpenSCADObject]
+    """A function which builds this part, given the shapes of its `dependencies` (in order); this must be picklable
+    (e.g. a module-level function, or a `functools.partial` of one) so the part can be built in a worker process."""
+    dependencies: Sequence[str] = ()
+    "The names of the other parts whose shapes are passed to `build`"
+    default: bool = True
+    "Whether this part is built when no specific parts are requested (otherwise, it's only built on request)"
+
+
+class PartRegistry:
+    """A set of parts which are only built on demand.
+
+    Building a part first builds the parts it depends on, and each part is built at most once (per registry), so
+    building a single part doesn't pay for the rest of the keyboard, and building several parts doesn't repeat any
+    shared work.
+    """
+    def __init__(self, parts: Iterable[Part] = ()):
+        """Create a registry containing the given parts.
+
+        :param parts: the parts to register, in order (see `add`)
+        """
+        self.parts: Dict[str, Part] = {}
+        "The registered parts, keyed by name, in the order they were registered"
+        self._shapes: Dict[str, OpenSCADObject] = {}
+
+        for part in parts:
+            self.add(part)
+
+    def add(self, part: Part) -> Part:
+        """Register the given part.
+
+        A part's dependencies must be registered before it (which also rules out dependency cycles).
+
+        :param part: the part to register
+        """
+        if part.name in self.parts:
+            raise ValueError(f"A part named {part.name!r} is already registered")
+
+        missing = [name for name in part.dependencies if name not in self.parts]
+        if missing:
+            raise ValueError(f"Part {part.name!r} depends on unregistered parts: {', '.join(missing)}")
+
+        self.parts[part.name] = part
+        return part
+
+    def default_parts(self) -> List[Part]:
+        """Return the parts built when no specific parts are requested, in the order they were registered.
+        """
+        return [part for part in self.parts.values() if part.default]
+
+    def select(self, patterns: Sequence[str]) -> List[Part]:
+        """Return the parts matching any of the given names or glob patterns (e.g. `right-*`), in the order they were
+        registered.
+
+        Raises `KeyError` if any pattern doesn't match a registered part.
+
+        :param patterns: the names or glob patterns to match
+        """
+        unmatched = [pattern for pattern in patterns if not fnmatch.filter(self.parts, pattern)]
+        if unmatched:
+            raise KeyError(f"No parts match {', '.join(unmatched)}")
+
+        return [
+            part
+            for part in self.parts.values()
+            if any(fnmatch.fnmatchcase(part.name, pattern) for pattern in patterns)
+        ]
+
+    def clear(self):
+        """Discard all parts built so far, so they're rebuilt when they're next needed.
+        """
+        self._shapes.clear()
+
+    def build(self, name: str) -> OpenSCADObject:
+        """Build the named part (and any parts it depends on), or return it if it's already been built.
+
+        :param name: the name of the part to build
+        """
+        shape = self._shapes.get(name)
+        if shape is None:
+            part = self.parts[name]
+            shape = part.build(*(self.build(dependency) for dependency in part.dependencies))
+            self._shapes[name] = shape
+        return shape
+
+
+class ExportResult(NamedTuple):
+    """The result of exporting a single part.
+    """
+    part: Part
+    "The part which was exported"
+    filepath: str
+    "The path of the file the part was written to"
+    seconds: float
+    "The time taken to build and write the part, in seconds"
+    changed: bool
+    "Whether the part's OpenSCAD code changed (if not, the existing file was left untouched)"
+
+
+def export_part(part: Part, filepath: str) -> ExportResult:
+    """Build the given part and write it to an OpenSCAD file, unless the file already contains the same code.
+
+    Repeated shapes within the part are written as OpenSCAD modules (see `scad_write_with_modules`). Leaving unchanged
+    files untouched means their STL files won't be rendered again.
+
+    The code is streamed to a temporary file next to the output file (which replaces the output file if they differ),
+    so the part's code is never held in memory as a whole.
+
+    :param part: the part to export
+    :param filepath: the path of the file to write
+    """
+    start = time.perf_counter()
+
+    temporary_filepath = f"{filepath}.{os.getpid()}.tmp"
+    try:
+        with open(temporary_filepath, 'w', encoding='utf-8') as scad_file:
+            scad_write_with_modules(part.build(), scad_file)
+
+        changed = not (os.path.exists(filepath) and filecmp.cmp(temporary_filepath, filepath, shallow=False))
+        if changed:
+            os.replace(temporary_filepath, filepath)
+    finally:
+        if os.path.exists(temporary_filepath):
+            os.remove(temporary_filepath)
+
+    return ExportResult(part, filepath, time.perf_counter() - start, changed)
+
+
+def export_parts(parts: Sequence[Part], filepaths: Sequence[str], jobs: Optional[int] = None) -> List[ExportResult]:
+    """Build and write each of the given parts, printing the time taken by each as it finishes.
+
+    Parts are built in a pool of `jobs` worker processes, so the total time is bounded by the slowest part rather than
+    the sum of all parts. If `jobs` is 1 (or there's only one part), all parts are built serially in the current process
+    instead.
+
+    Returns the results in the order the parts finished.
+
+    :param parts: the parts to export
+    :param filepaths: the path of the file to write for each part
+    :param jobs: the maximum number of worker processes; if None, use the number of CPUs
+    """
+    results: List[ExportResult] = []
+
+    def report(result: ExportResult):
+        if result.changed:
+            print(f"Wrote {result.part.description} output to {result.filepath} ({result.seconds:.2f}s)")
+        else:
+            print(f"{result.part.description} output in {result.filepath} is unchanged ({result.seconds:.2f}s)")
+        results.append(result)
+
+    if jobs == 1 or len(parts) == 1:
+        for (part, filepath) in zip(parts, filepaths):
+            print(f"Writing {part.description} output to {filepath} . . .")
+            report(export_part(part, filepath))
+        return results
+
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        futures = [executor.submit(export_part, part, filepath) for (part, filepath) in zip(parts, filepaths)]
+        for future in as_completed(futures):
+            report(future.result())
+
+    return results
@@ -0,0 +1,144 @@
+"""Numeric geometry helpers.
+"""
+from functools import lru_cache
+from itertools import combinations
+from typing import List, Tuple
+
+import numpy as np
+
+
+def _convex_polygon_2d(points: np.ndarray, tolerance: float) -> List[int]:
+    """Return the indices of the convex hull of the given 2D points, in counter-clockwise order.
+
+    Points within `tolerance` of the hull's edges are dropped. (Andrew's monotone chain algorithm)
+    """
+    # Sort on coordinates snapped to the tolerance, so rounding noise can't reorder points that are (nearly) aligned.
+    snapped = np.round(points / tolerance)
+    order = np.lexsort((snapped[:, 1], snapped[:, 0]))
+
+    def turns_left(o, a, b):
+        edge = points[a] - points[o]
+        cross = edge[0] * (points[b, 1] - points[o, 1]) - edge[1] * (points[b, 0] - points[o, 0])
+        return cross > tolerance * np.linalg.norm(edge)
+
+    def half_hull(indices):
+        chain: List[int] = []
+        for index in indices:
+            while len(chain) >= 2 and not turns_left(chain[-2], chain[-1], index):
+                chain.pop()
+            chain.append(index)
+        return chain
+
+    lower = half_hull(order)
+    upper = half_hull(order[::-1])
+    return lower[:-1] + upper[:-1]
+
+
+def _insert_edge_points(polygon: List[int], candidates: np.ndarray, points: np.ndarray, tolerance: float) -> List[int]:
+    """Insert any of the candidate points that lie on an edge of the given polygon into that edge.
+
+    This keeps neighboring faces consistent: a point lying on an edge shared by two faces is a vertex of both.
+    """
+    result: List[int] = []
+    for (start, end) in zip(polygon, polygon[1:] + polygon[:1]):
+        result.append(start)
+
+        direction = points[end] - points[start]
+        length = np.linalg.norm(direction)
+        direction /= length
+
+        relative = points[candidates] - points[start]
+        along = relative @ direction
+        off_edge = np.linalg.norm(relative - np.outer(along, direction), axis=1)
+        on_edge = (off_edge <= tolerance) & (along > tolerance) & (along < length - tolerance)
+
+        result.extend(int(candidates[index]) for index in np.flatnonzero(on_edge)[np.argsort(along[on_edge])])
+
+    return result
+
+
+@lru_cache
+def _triples(count: int) -> np.ndarray:
+    """Return every combination of three indices out of `count`, as an array of shape (N, 3).
+    """
+    return np.array(list(combinations(range(count), 3)))
+
+
+def _is_closed(faces: List[List[int]]) -> bool:
+    """Check that every edge of the given faces is shared by exactly one other face, in the opposite direction.
+    """
+    edges = [(a, b) for face in faces for (a, b) in zip(face, face[1:] + face[:1])]
+    edge_set = set(edges)
+    return len(edge_set) == len(edges) and all((b, a) in edge_set for (a, b) in edges)
+
+
+def convex_hull(points: np.ndarray, tolerance: float = 1e-9) -> Tuple[np.ndarray, List[List[int]]]:
+    """Compute the convex hull of a small set of 3D points.
+
+    This tests every candidate plane through three of the points, which is fast for the few dozen points making up a
+    web between keys, but scales poorly for large point sets.
+
+    Returns a tuple of `(vertices, faces)`, where each face is a list of indices into `vertices`, ordered clockwise
+    when viewed from outside the hull (as expected by OpenSCAD's `polyhedron()`).
+
+    Raises `ValueError` if the points are degenerate (e.g. all coplanar) or if the resulting hull isn't watertight.
+
+    :param points: an array of shape (N, 3)
+    :param tolerance: the distance below which points are considered to lie on the same plane
+    """
+    points = np.unique(np.asarray(points, dtype=float).reshape(-1, 3), axis=0)
+    if len(points) < 4:
+        raise ValueError(f"Need at least 4 distinct points to build a convex hull; got {len(points)}")
+
+    # Work relative to the centroid to keep rounding errors in the plane calculations small.
+    centered = points - points.mean(axis=0)
+
+    triples = _triples(len(points))
+    origins = centered[triples[:, 0]]
+    normals = np.cross(centered[triples[:, 1]] - origins, centered[triples[:, 2]] - origins)
+    lengths = np.linalg.norm(normals, axis=1)
+
+    # Skip (nearly) collinear triples, whose normals are too imprecise to classify the other points reliably.
+    usable = lengths > 1e-4
+    origins, normals = origins[usable], normals[usable] / lengths[usable, np.newaxis]
+
+    # Signed distance of every point from every candidate plane
+    distances = centered @ normals.T - np.einsum('ij,ij->i', origins, normals)
+
+    above = (distances > tolerance).any(axis=0)
+    below = (distances < -tolerance).any(axis=0)
+    supporting = above != below
+
+    # Orient each supporting plane's normal outward (so all points are on or below it)
+    normals[supporting & above] *= -1
+
+    # Many triples lie on the same face; keep one plane for each distinct set of points lying on it.
+    on_plane_masks = (np.abs(distances[:, supporting]) <= tolerance).T
+    _, unique_planes = np.unique(on_plane_masks, axis=0, return_index=True)
+
+    faces: List[List[int]] = []
+    for (on_plane_mask, normal) in zip(on_plane_masks[unique_planes], normals[supporting][unique_planes]):
+        on_plane = np.flatnonzero(on_plane_mask)
+
+        u = centered[on_plane[1]] - centered[on_plane[0]]
+        u /= np.linalg.norm(u)
+        v = np.cross(normal, u)
+
+        relative = centered[on_plane] - centered[on_plane[0]]
+        polygon = _convex_polygon_2d(np.column_stack((relative @ u, relative @ v)), tolerance)
+        if len(polygon) < 3:
+            continue
+
+        polygon = _insert_edge_points([int(on_plane[index]) for index in polygon], on_plane, centered, tolerance)
+
+        # The polygon is counter-clockwise when viewed from outside; OpenSCAD wants clockwise.
+        faces.append(polygon[::-1])
+
+    # Coplanar points have no supporting plane with all points on one side (and not all on it), so no faces at all.
+    if not faces or not _is_closed(faces):
+        raise ValueError("Unable to build a watertight convex hull from the given points")
+
+    used = sorted({index for face in faces for index in face})
+    remap = {old: new for (new, old) in enumerate(used)}
+
+    return points[used], [[remap[index] for index in face] for face in faces]
@@ -0,0 +1,105 @@
+"""Rendering repeated hardware features (nuts, magnet holes, screw holes, etc.) once to STL files, so the parts using
+them can `import()` the meshes instead of having OpenSCAD evaluate the same CSG (including BOSL2 threads) wherever the
+feature appears.
+"""
+import os
+from os.path import exists, join, relpath, sep
+from typing import Dict, Optional
+
+from solid2 import import_
+from solid2.core.object_base import OpenSCADObject
+
+from .build_cache import OpenSCADNotFoundError, bosl2_version, content_hash, openscad_version
+from .render import RenderJob, render_file, render_flags
+from .scad import scad_render_with_modules
+
+
+hardware_directory_name = 'hardware'
+"The name of the directory (next to the OpenSCAD files of the parts) the hardware meshes are written to by default"
+
+
+class HardwareMeshError(Exception):
+    """Raised when OpenSCAD fails to render a hardware feature.
+    """
+
+
+class HardwareMeshLibrary:
+    """A directory of hardware features rendered to STL files, each named after (a hash of) the OpenSCAD code of the
+    feature and the versions of OpenSCAD and BOSL2, so a feature is only rendered again when its parameters (including
+    its number of segments) or the tools rendering it change.
+    """
+    def __init__(self, directory: str, relative_to: Optional[str] = None, openscad: str = 'openscad'):
+        """Create a library which keeps its meshes in the given directory (creating it if needed).
+
+        :param directory: the directory to write the meshes (and the OpenSCAD files they're rendered from) to
+        :param relative_to: the directory of the OpenSCAD files which import the meshes (paths in `import()` are
+        relative to the importing file); if None, use the parent of `directory`
+        :param openscad: the OpenSCAD executable to run
+        """
+        self.directory = directory
+        "The directory the meshes are written to"
+        self.relative_to = relative_to if relative_to is not None else join(directory, os.pardir)
+        "The directory of the OpenSCAD files which import the meshes"
+        self.openscad = openscad
+        "The OpenSCAD executable to run"
+        self._meshes: Dict[str, OpenSCADObject] = {}
+
+    def mesh(self, name: str, shape: OpenSCADObject) -> OpenSCADObject:
+        """Return an `import()` of the given shape, rendered to an STL file in this library (unless the same shape was
+        rendered before).
+
+        Raises `HardwareMeshError` if OpenSCAD can't be found, or fails to render the shape.
+
+        :param name: a name describing the shape (the start of its file name)
+        :param shape: the shape to render
+        """
+        try:
+            version = openscad_version(self.openscad)
+        except OpenSCADNotFoundError as error:
+            raise HardwareMeshError(
+                f"Unable to render hardware mesh {name}: OpenSCAD (`{self.openscad}`) can't be found; install it, or "
+                "set $OPENSCAD to its path"
+            ) from error
+
+        flags = render_flags('stl')
+        code = scad_render_with_modules(shape)
+        key = f"{name}-{content_hash(code, version, bosl2_version(), *flags)[:16]}"
+
+        mesh = self._meshes.get(key)
+        if mesh is None:
+            stl_filepath = join(self.directory, f"{key}.stl")
+            if not exists(stl_filepath):
+                self._render(key, code)
+            mesh = import_(relpath(stl_filepath, self.relative_to).replace(sep, '/'))
+            self._meshes[key] = mesh
+        return mesh
+
+    def _render(self, key: str, code: str):
+        """Render the given OpenSCAD code to the STL file for the given key.
+        """
+        os.makedirs(self.directory, exist_ok=True)
+
+        # Other processes may be rendering the same mesh at the same time, so each renders to its own files, and the
+        # finished mesh is moved into place (which is atomic).
+        temporary_name = f"{key}.{os.getpid()}"
+        scad_filepath = join(self.directory, f"{temporary_name}.scad")
+        stl_filepath = join(self.directory, f"{temporary_name}.stl")
+        with open(scad_filepath, 'w', encoding='utf-8') as scad_file:
+            scad_file.write(code)
+
+        try:
+            result = render_file(
+                RenderJob(scad_filepath, stl_filepath, key),
+                openscad=self.openscad,
+                flags=render_flags('stl'),
+            )
+            if result.returncode != 0:
+                raise HardwareMeshError(
+                    f"Failed to render hardware mesh {key} (exit status {result.returncode}):\n{result.output}"
+                )
+            os.replace(stl_filepath, join(self.directory, f"{key}.stl"))
+            os.replace(scad_filepath, join(self.directory, f"{key}.scad"))
+        finally:
+            for filepath in (scad_filepath, stl_filepath):
+                if exists(filepath):
+                    os.remove(filepath)
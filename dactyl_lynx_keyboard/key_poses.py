@@ -0,0 +1,132 @@
+"""Exporting the pose of every key, so other tools (keymap visualizers, renderers, wiring planners) can use the
+positions of the keys without running the generator.
+"""
+import json
+from collections.abc import Callable, Sequence
+from typing import Dict, List, NamedTuple, Optional
+
+import numpy as np
+
+from .layouts.layout import Layout
+from .transforms import mirroring
+
+
+class KeyPose(NamedTuple):
+    """The position and orientation of a single key.
+    """
+    side: str
+    "The side of the keyboard the key is on (`right` or `left`)"
+    well: str
+    "The well the key is in (`finger` or `thumb`)"
+    column: float
+    "The key's column in its well's layout"
+    row: float
+    "The key's row in its well's layout"
+    matrix: np.ndarray
+    """The 4x4 matrix placing the key, in the coordinates of its side's part (the left side is mirrored across the YZ
+    plane); this maps the key's local coordinates (with the origin at the center of the top of the switch plate, and
+    the switch pointing up along Z) to the part's coordinates"""
+    center: np.ndarray
+    "The center of the top of the key's switch plate"
+    normal: np.ndarray
+    "The unit vector pointing up out of the key's switch"
+    matrix_coords: Optional[str]
+    "The key's wiring matrix coordinates (e.g. `1,4`), if known"
+    legend: Optional[str]
+    "The key's legend, if any"
+
+
+PoseLabelCallback = Callable[..., Optional[str]]
+"""A callback returning a label for the key at the given position (called with `left_side`, `thumb`, `column`, and `row`
+keyword arguments), like the keycap legend callbacks in `dactyl_lynx`"""
+
+
+def layout_poses(
+    layout: Layout,
+    left_side: bool,
+    thumb: bool,
+    matrix_coords: Optional[PoseLabelCallback] = None,
+    legend: Optional[PoseLabelCallback] = None,
+) -> List[KeyPose]:
+    """Return the pose of each key in the given layout, in the order the layout generates them.
+
+    :param layout: the layout of the keys
+    :param left_side: whether the keys are on the left side (which is mirrored across the YZ plane)
+    :param thumb: whether the layout is a thumb well (True) or a finger well (False)
+    :param matrix_coords: a callback returning the wiring matrix coordinates of each key
+    :param legend: a callback returning the legend of each key
+    """
+    side_matrix = mirroring((1, 0, 0)) if left_side else np.identity(4)
+
+    poses = []
+    for (column, row) in layout.generate_positions():
+        matrix = side_matrix @ layout.key_matrix(column, row)
+        normal = matrix[:3, :3] @ (0, 0, 1)
+        label_kwargs = dict(left_side=left_side, thumb=thumb, column=column, row=row)
+
+        poses.append(KeyPose(
+            side='left' if left_side else 'right',
+            well='thumb' if thumb else 'finger',
+            column=column,
+            row=row,
+            matrix=matrix,
+            center=matrix[:3, 3],
+            normal=normal / np.linalg.norm(normal),
+            matrix_coords=matrix_coords(**label_kwargs) if matrix_coords is not None else None,
+            legend=(legend(**label_kwargs) or None) if legend is not None else None,
+        ))
+
+    return poses
+
+
+def write_poses_json(poses: Sequence[KeyPose], filepath: str, metadata: Optional[Dict] = None):
+    """Write the given poses to a compact JSON file, as an object with a `keys` list (plus any given metadata).
+
+    :param poses: the poses to write
+    :param filepath: the path of the file to write
+    :param metadata: any other fields to include in the file (e.g. the build options used)
+    """
+    document = dict(metadata or {})
+    document['keys'] = [
+        {
+            **pose._asdict(),
+            'matrix': np.round(pose.matrix, 6).tolist(),
+            'center': np.round(pose.center, 6).tolist(),
+            'normal': np.round(pose.normal, 6).tolist(),
+        }
+        for pose in poses
+    ]
+
+    with open(filepath, 'w', encoding='utf-8') as json_file:
+        json.dump(document, json_file, ensure_ascii=False, separators=(',', ':'))
+        json_file.write('\n')
+
+
+def write_poses_npz(poses: Sequence[KeyPose], filepath: str, metadata: Optional[Dict] = None):
+    """Write the given poses to a compressed NumPy `.npz` file, with one array per field of `KeyPose` (indexed by key);
+    missing labels are stored as empty strings.
+
+    :param poses: the poses to write
+    :param filepath: the path of the file to write
+    :param metadata: any other fields to include in the file (stored as a JSON string in its `metadata` array)
+    """
+    np.savez_compressed(
+        filepath,
+        side=np.array([pose.side for pose in poses]),
+        well=np.array([pose.well for pose in poses]),
+        column=np.array([pose.column for pose in poses], dtype=float),
+        row=np.array([pose.row for pose in poses], dtype=float),
+        matrix=np.array([pose.matrix for pose in poses]).reshape(-1, 4, 4),
+        center=np.array([pose.center for pose in poses]).reshape(-1, 3),
+        normal=np.array([pose.normal for pose in poses]).reshape(-1, 3),
+        matrix_coords=np.array([pose.matrix_coords or '' for pose in poses]),
+        legend=np.array([pose.legend or '' for pose in poses]),
+        metadata=np.array(json.dumps(metadata or {})),
+    )
+
+
+pose_writers: Dict[str, Callable[[Sequence[KeyPose], str, Optional[Dict]], None]] = {
+    'json': write_poses_json,
+    'npz': write_poses_npz,
+}
+"The writer for each key pose file extension"
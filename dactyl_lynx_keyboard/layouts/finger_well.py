@@ -1,17 +1,17 @@
 """The layout of a finger well.
 """
 import math
-import operator
-from collections.abc import Iterable
-from functools import reduce
+from collections.abc import Iterable, Sequence
 from itertools import chain
-from typing import Optional, Tuple
+from typing import Tuple
 
+import numpy as np
 from solid2.core.object_base import OpenSCADObject
 
 from spkb.keyswitch import Keyswitch, MX
 
-from .layout import Layout, XYAdjustCallback
+from ..transforms import identity, rotation, translation
+from .layout import Layout, WebCorner
 
 
 class FingerWellLayout(Layout):
@@ -65,6 +65,19 @@ class FingerWellLayout(Layout):
         else:
             return shape
 
+    def placement_adjust_matrix(self, column: float, row: float) -> np.ndarray:
+        """Return the matrix equivalent of `placement_adjust` for the given key/location.
+
+        :param column: the column to place the key in
+        :param row: the row to place the key in
+        """
+        if column == 2:
+            return translation((0, 6.82, -4.0))
+        elif column >= 4:
+            return translation((0, -20.8, 7.64))
+        else:
+            return identity()
+
     def layout_place(self, shape: OpenSCADObject) -> OpenSCADObject:
         """Place the layout.
 
@@ -76,38 +89,33 @@ class FingerWellLayout(Layout):
             .rotate(math.degrees(math.pi / 10), (1, 0, 0)) \
             .translate(self.placement_transform)
 
-    def web_all(self, z_offset: float = 0, thickness: Optional[float] = None, size_adjust: Optional[XYAdjustCallback] = None, position_adjust: Optional[XYAdjustCallback] = None) -> OpenSCADObject:
-        """Return the complete "web" between all key positions in this layout.
+    def layout_matrix(self) -> np.ndarray:
+        """Return the matrix equivalent of `layout_place`.
+        """
+        return (
+            translation(self.placement_transform)
+            @ rotation(math.degrees(math.pi / 10), (1, 0, 0))
+            @ rotation(math.degrees(math.pi / 10), (0, 1, 0))
+            @ translation((0, 0, 3))
+        )
 
-        :param z_offset: the offset in the Z direction of the corner blocks (before placing at the key positions)
-        :param thickness: the thickness of the web; if None, default to self.web_thickness
-        :param size_adjust: a callback to adjust the size of the key at this column and row
-        :param position_adjust: a callback to adjust the position of the key at this column and row
+    def web_corner_groups(self) -> Iterable[Sequence[WebCorner]]:
+        """Return the groups of corners to hull together to build the complete "web" between all key positions.
         """
-        web_kwargs = {
-            'z_offset': z_offset,
-            'thickness': thickness,
-            'size_adjust': size_adjust,
-            'position_adjust': position_adjust,
-        }
-
-        return reduce(
-            operator.add,
-            chain(
-                (
-                    self.web_top_left_of(column, row, **web_kwargs)
-                    for (column, row) in self.generate_positions()
-                    if column > 0 and row > 0 and (column != 1 or row != 4)
-                ),
-                (
-                    self.web_left_of(column, row, **web_kwargs)
-                    for (column, row) in self.generate_positions()
-                    if column > 0 and (column != 1 or row != 4)
-                ),
-                (
-                    self.web_above(column, row, **web_kwargs)
-                    for (column, row) in self.generate_positions()
-                    if row > 0
-                ),
-            )
+        return chain(
+            (
+                self.web_top_left_of_corners(column, row)
+                for (column, row) in self.generate_positions()
+                if column > 0 and row > 0 and (column != 1 or row != 4)
+            ),
+            (
+                self.web_left_of_corners(column, row)
+                for (column, row) in self.generate_positions()
+                if column > 0 and (column != 1 or row != 4)
+            ),
+            (
+                self.web_above_corners(column, row)
+                for (column, row) in self.generate_positions()
+                if row > 0
+            ),
         )
@@ -1,18 +1,22 @@
 """Defines the base class for key layouts.
 """
 import math
-import operator
-from collections.abc import Iterable, Sequence
-from functools import reduce
+from collections.abc import Callable, Iterable, Sequence
 from itertools import chain
-from typing import Optional, Protocol, Tuple, Union
+from typing import Dict, List, NamedTuple, Optional, Protocol, Tuple, Union
 
-from solid2 import cube, hull
+import numpy as np
+from solid2 import cube, hull, polyhedron
 from solid2.core.object_base import OpenSCADObject
 
 from spkb.keyswitch import Keyswitch, MX
 from spkb.utils import nothing
 
+from ..geometry import convex_hull
+from ..mesh import TriangleMesh, UnsupportedShapeError, concatenate_meshes, polygon_mesh, transform_mesh
+from ..scad import union_all
+from ..transforms import identity, rotation, transform, translation
+
 
 class XYAdjustCallback(Protocol):
     """A callback for adjusting X and Y coordinates (usually either size or position adjustments)
@@ -34,6 +38,19 @@ class ShapeForLocationCallback(Protocol):
         return nothing
 
 
+class WebCorner(NamedTuple):
+    """A corner of a key position, used as one of the posts making up a "web" between keys.
+
+    The fields match the corresponding arguments of `Layout.web_corner`.
+    """
+    column: float
+    row: float
+    left: bool
+    top: bool
+    column_span: float = 1
+    row_span: float = 1
+
+
 class Layout:
     """The base implementation of a layout manager.
 
@@ -46,6 +63,8 @@ class Layout:
 
         :param rows: the number of rows in the layout
         """
+        self._key_matrix_cache: Dict[Tuple[float, float], np.ndarray] = {}
+        self._web_hull_cache: Dict[bytes, Optional[Tuple[np.ndarray, List[List[int]]]]] = {}
 
         self.rows = rows
         self.columns = columns
@@ -78,6 +97,30 @@ class Layout:
         self.positions_to_skip: Sequence[Tuple[float, float]] = ()
         "A sequence of positions in the layout to skip when generating positions."
 
+        self.use_matrix_placement = True
+        """Whether `key_place` should emit a single `multmatrix()` per placement (True), or a chain of
+        `translate()`/`rotate()` nodes (False). Subclasses overriding `placement_adjust` or `layout_place` must also
+        override `placement_adjust_matrix` and `layout_matrix` to match."""
+
+        self.use_polyhedron_webs = True
+        """Whether webs should be emitted as a `polyhedron()` of their precomputed convex hull (True), or as a
+        `hull()` of the corner posts for OpenSCAD to compute (False)."""
+
+    def __setattr__(self, name, value):
+        super().__setattr__(name, value)
+
+        # Any change to the layout's parameters may move keys, so forget all cached placements.
+        if not name.startswith('_'):
+            self.clear_placement_cache()
+
+    def clear_placement_cache(self):
+        """Forget all cached key placement matrices.
+
+        This happens automatically whenever an attribute of the layout is assigned; call it explicitly after mutating
+        an attribute in place. (e.g. modifying `keyswitch`)
+        """
+        self.__dict__.get('_key_matrix_cache', {}).clear()
+
     @property
     def row_radius(self) -> float:
         return (
@@ -129,6 +172,15 @@ class Layout:
         """
         return shape
 
+    def placement_adjust_matrix(self, column: float, row: float) -> np.ndarray:
+        """Override this method to return the matrix equivalent of `placement_adjust` for the given key/location.
+
+        :param column: the column to place the key in
+
+        :param row: the row to place the key in
+        """
+        return identity()
+
     def row_angle(self, row: float) -> float:
         """Calculate the X rotation angle for the given row.
 
@@ -143,6 +195,40 @@ class Layout:
         """
         return math.degrees(self.rad_per_col * -column)
 
+    def key_matrix(self, column: float, row: float) -> np.ndarray:
+        """Return the 4x4 matrix that places a key (or other shape) at the given position in the layout.
+
+        The matrix is computed once per position and cached until the layout changes; the returned array is read-only.
+
+        :param column: the column to place the key in
+
+        :param row: the row to place the key in
+        """
+        matrix = self._key_matrix_cache.get((column, row))
+        if matrix is None:
+            matrix = self._compute_key_matrix(column, row)
+            matrix.flags.writeable = False
+            self._key_matrix_cache[(column, row)] = matrix
+
+        return matrix
+
+    def _compute_key_matrix(self, column: float, row: float) -> np.ndarray:
+        row = self.row_adjust(row)
+        column = self.column_adjust(column)
+
+        row_matrix = (
+            translation((0, 0, self.row_radius))
+            @ rotation(self.row_angle(row), (1, 0, 0))
+            @ translation((0, 0, -self.row_radius))
+        )
+        column_matrix = (
+            translation((0, 0, self.column_radius))
+            @ rotation(self.column_angle(column), (0, 1, 0))
+            @ translation((0, 0, -self.column_radius))
+        )
+
+        return self.layout_matrix() @ self.placement_adjust_matrix(column, row) @ column_matrix @ row_matrix
+
     def key_place(self, column: float, row: float, shape: OpenSCADObject) -> OpenSCADObject:
         """Place a key (or other shape) in the layout.
 
@@ -152,6 +238,9 @@ class Layout:
 
         :param shape: the shape to place
         """
+        if self.use_matrix_placement:
+            return transform(shape, self.key_matrix(column, row))
+
         row = self.row_adjust(row)
         row_angle = self.row_angle(row)
 
@@ -181,6 +270,13 @@ class Layout:
         """
         return shape
 
+    def layout_matrix(self) -> np.ndarray:
+        """Return the matrix equivalent of `layout_place`.
+
+        Override to adjust the placement of the entire layout.
+        """
+        return identity()
+
     def place_all(self, shape_or_callback: Union[OpenSCADObject, ShapeForLocationCallback]) -> OpenSCADObject:
         """Place the given shape (or the shape returned by the given callback) at every location
         in the layout.
@@ -192,12 +288,60 @@ class Layout:
         else:
             shape_callback = shape_or_callback
 
-        return reduce(
-            operator.add,
-            (
-                self.key_place(column, row, shape_callback(column, row))
-                for (column, row) in self.generate_positions()
-            )
+        return union_all(
+            self.key_place(column, row, shape_callback(column, row))
+            for (column, row) in self.generate_positions()
+        )
+
+    def place_all_mesh(
+        self,
+        mesh_or_callback: Union[TriangleMesh, Callable[[float, float], TriangleMesh]],
+    ) -> TriangleMesh:
+        """Return the mesh equivalent of `place_all`: the given mesh (or the mesh returned by the given callback) placed
+        at every location in the layout.
+
+        :param mesh_or_callback: the mesh to place, or a callback that returns the mesh for a given column and row
+        """
+        def mesh_at(column: float, row: float) -> TriangleMesh:
+            if isinstance(mesh_or_callback, TriangleMesh):
+                return mesh_or_callback
+            return mesh_or_callback(column, row)
+
+        return concatenate_meshes([
+            transform_mesh(mesh_at(column, row), self.key_matrix(column, row))
+            for (column, row) in self.generate_positions()
+        ])
+
+    def _web_corner_offset(self, column: float, row: float, left: bool, top: bool, column_span: float = 1, row_span: float = 1, size_adjust: Optional[XYAdjustCallback] = None, position_adjust: Optional[XYAdjustCallback] = None) -> Tuple[float, float]:
+        """Return the X and Y offset of the given corner post from the center of its key position.
+        """
+        x_adjust = 0
+        y_adjust = 0
+        if size_adjust is not None:
+            x_size_adjust, y_size_adjust = size_adjust(column, row)
+            x_adjust += x_size_adjust / 2
+            y_adjust += y_size_adjust / 2
+        if position_adjust is not None:
+            x_pos_adjust, y_pos_adjust = position_adjust(column, row)
+            if left:
+                x_adjust -= x_pos_adjust
+            else:
+                x_adjust += x_pos_adjust
+            if top:
+                y_adjust += y_pos_adjust
+            else:
+                y_adjust -= y_pos_adjust
+
+        x_move_amount = (
+            self.keyswitch.keyswitch_width + ((column_span - 1) * 24) - self.web_post_size
+        ) / 2 + self.keyswitch.wall_thickness + x_adjust
+        y_move_amount = (
+            self.keyswitch.keyswitch_length + ((row_span - 1) * 24) - self.web_post_size
+        ) / 2 + self.keyswitch.wall_thickness + y_adjust
+
+        return (
+            -x_move_amount if left else x_move_amount,
+            y_move_amount if top else -y_move_amount,
         )
 
     def web_corner(self, column: float, row: float, left: bool, top: bool, column_span: float = 1, row_span: float = 1, z_offset: float = 0, thickness: Optional[float] = None, size_adjust: Optional[XYAdjustCallback] = None, position_adjust: Optional[XYAdjustCallback] = None) -> OpenSCADObject:
@@ -233,38 +377,135 @@ class Layout:
             center=True
         ).down(thickness / 2)
 
-        x_adjust = 0
-        y_adjust = 0
-        if size_adjust is not None:
-            x_size_adjust, y_size_adjust = size_adjust(column, row)
-            x_adjust += x_size_adjust / 2
-            y_adjust += y_size_adjust / 2
-        if position_adjust is not None:
-            x_pos_adjust, y_pos_adjust = position_adjust(column, row)
-            if left:
-                x_adjust -= x_pos_adjust
-            else:
-                x_adjust += x_pos_adjust
-            if top:
-                y_adjust += y_pos_adjust
+        x_offset, y_offset = self._web_corner_offset(
+            column, row, left, top,
+            column_span=column_span, row_span=row_span,
+            size_adjust=size_adjust, position_adjust=position_adjust,
+        )
+
+        return self.key_place(column, row, post.translate((x_offset, y_offset, z_offset)))
+
+    def web_corner_points(self, corners: Sequence[WebCorner], z_offset: float = 0, thickness: Optional[float] = None, size_adjust: Optional[XYAdjustCallback] = None, position_adjust: Optional[XYAdjustCallback] = None) -> np.ndarray:
+        """Return the vertices of the blocks that `web_corner` would create for each of the given corners.
+
+        All corners are placed in a single batch; the result is an array of shape (len(corners), 8, 3).
+
+        :param corners: the corners to compute the vertices of
+        :param z_offset: the offset in the Z direction of the corner blocks (before placing at the key positions)
+        :param thickness: the thickness of the web; if None, default to self.web_thickness
+        :param size_adjust: a callback to adjust the size of the key at this column and row
+        :param position_adjust: a callback to adjust the position of the key at this column and row
+        """
+        if thickness is None:
+            thickness = self.web_thickness
+
+        half_post = self.web_post_size / 2
+        post_vertices = np.array([
+            (x, y, z, 1)
+            for x in (-half_post, half_post)
+            for y in (-half_post, half_post)
+            for z in (-thickness, 0)
+        ])
+
+        offsets = np.array([
+            (
+                *self._web_corner_offset(
+                    corner.column, corner.row, corner.left, corner.top,
+                    column_span=corner.column_span, row_span=corner.row_span,
+                    size_adjust=size_adjust, position_adjust=position_adjust,
+                ),
+                z_offset,
+                0,
+            )
+            for corner in corners
+        ])
+        matrices = np.stack([self.key_matrix(corner.column, corner.row) for corner in corners])
+
+        local_vertices = post_vertices[np.newaxis, :, :] + offsets[:, np.newaxis, :]
+        return np.einsum('nij,nkj->nki', matrices, local_vertices)[..., :3]
+
+    def web_hulls(self, corner_groups: Iterable[Sequence[WebCorner]], z_offset: float = 0, thickness: Optional[float] = None, size_adjust: Optional[XYAdjustCallback] = None, position_adjust: Optional[XYAdjustCallback] = None) -> List[OpenSCADObject]:
+        """Return a "web" hulling together the corner blocks of each of the given groups of corners.
+
+        If `use_polyhedron_webs` is set, the vertices for all groups are computed in a single batch, and each web is
+        emitted as a `polyhedron()` of its convex hull. (falling back to `hull()` if the numeric hull fails)
+
+        :param corner_groups: the groups of corners to create webs between
+        :param z_offset: the offset in the Z direction of the corner blocks (before placing at the key positions)
+        :param thickness: the thickness of the web; if None, default to self.web_thickness
+        :param size_adjust: a callback to adjust the size of the key at this column and row
+        :param position_adjust: a callback to adjust the position of the key at this column and row
+        """
+        corner_groups = [tuple(group) for group in corner_groups]
+        web_kwargs = {
+            'z_offset': z_offset,
+            'thickness': thickness,
+            'size_adjust': size_adjust,
+            'position_adjust': position_adjust,
+        }
+
+        def hull_of_posts(group):
+            return hull()(*(self.web_corner(*corner, **web_kwargs) for corner in group))
+
+        if not self.use_polyhedron_webs:
+            return [hull_of_posts(group) for group in corner_groups]
+
+        all_points = self.web_corner_points([corner for group in corner_groups for corner in group], **web_kwargs)
+
+        webs = []
+        start = 0
+        for group in corner_groups:
+            points = all_points[start:start + len(group)]
+            start += len(group)
+
+            web_hull = self._cached_web_hull(points)
+            if web_hull is None:
+                webs.append(hull_of_posts(group))
             else:
-                y_adjust -= y_pos_adjust
+                vertices, faces = web_hull
+                webs.append(polyhedron(points=vertices.tolist(), faces=faces))
 
-        x_move_amount = (
-            self.keyswitch.keyswitch_width + ((column_span - 1) * 24) - self.web_post_size
-        ) / 2 + self.keyswitch.wall_thickness + x_adjust
-        y_move_amount = (
-            self.keyswitch.keyswitch_length + ((row_span - 1) * 24) - self.web_post_size
-        ) / 2 + self.keyswitch.wall_thickness + y_adjust
+        return webs
+
+    def _cached_web_hull(self, points: np.ndarray) -> Optional[Tuple[np.ndarray, List[List[int]]]]:
+        """Return the convex hull of the given web's points, or None if the numeric hull fails.
+        """
+        # The same webs are generated for several parts, so remember each hull by its (exact) input points.
+        key = points.tobytes()
+        if key not in self._web_hull_cache:
+            try:
+                self._web_hull_cache[key] = convex_hull(points)
+            except ValueError:
+                self._web_hull_cache[key] = None
 
-        return self.key_place(
-            column,
-            row,
-            post.translate((
-                -x_move_amount if left else x_move_amount,
-                y_move_amount if top else -y_move_amount,
-                z_offset
-            ))
+        return self._web_hull_cache[key]
+
+    def web_hull(self, *corners: WebCorner, z_offset: float = 0, thickness: Optional[float] = None, size_adjust: Optional[XYAdjustCallback] = None, position_adjust: Optional[XYAdjustCallback] = None) -> OpenSCADObject:
+        """Return a "web" hulling together the corner blocks of the given corners.
+
+        :param corners: the corners to create a web between
+        :param z_offset: the offset in the Z direction of the corner blocks (before placing at the key positions)
+        :param thickness: the thickness of the web; if None, default to self.web_thickness
+        :param size_adjust: a callback to adjust the size of the key at this column and row
+        :param position_adjust: a callback to adjust the position of the key at this column and row
+        """
+        return self.web_hulls(
+            [corners],
+            z_offset=z_offset, thickness=thickness, size_adjust=size_adjust, position_adjust=position_adjust,
+        )[0]
+
+    def web_left_of_corners(self, column: float, row: float) -> Tuple[WebCorner, ...]:
+        """Return the corners making up the "web" between the key at the given row/column and the neighboring one in
+        the column to the left. (see `web_left_of`)
+
+        :param column: the column of the key to create the web at
+        :param row: the row of the key to create the web at
+        """
+        return (
+            WebCorner(column, row, left=True, top=True),
+            WebCorner(column, row, left=True, top=False),
+            WebCorner(column - 1, row, left=False, top=False),
+            WebCorner(column - 1, row, left=False, top=True),
         )
 
     def web_left_of(self, column: float, row: float, z_offset: float = 0, thickness: Optional[float] = None, size_adjust: Optional[XYAdjustCallback] = None, position_adjust: Optional[XYAdjustCallback] = None) -> OpenSCADObject:
@@ -288,19 +529,23 @@ class Layout:
         │0,1│X┃1,1┃
         └───┘┄┗━━━┛
         """
-        return hull()(
-            self.web_corner(column, row, left=True, top=True,
-                            z_offset=z_offset, thickness=thickness,
-                            size_adjust=size_adjust, position_adjust=position_adjust),
-            self.web_corner(column, row, left=True, top=False,
-                            z_offset=z_offset, thickness=thickness,
-                            size_adjust=size_adjust, position_adjust=position_adjust),
-            self.web_corner(column - 1, row, left=False, top=False,
-                            z_offset=z_offset, thickness=thickness,
-                            size_adjust=size_adjust, position_adjust=position_adjust),
-            self.web_corner(column - 1, row, left=False, top=True,
-                            z_offset=z_offset, thickness=thickness,
-                            size_adjust=size_adjust, position_adjust=position_adjust),
+        return self.web_hull(
+            *self.web_left_of_corners(column, row),
+            z_offset=z_offset, thickness=thickness, size_adjust=size_adjust, position_adjust=position_adjust,
+        )
+
+    def web_above_corners(self, column: float, row: float) -> Tuple[WebCorner, ...]:
+        """Return the corners making up the "web" between the key at the given row/column and the neighboring one in
+        the row above. (see `web_above`)
+
+        :param column: the column of the key to create the web at
+        :param row: the row of the key to create the web at
+        """
+        return (
+            WebCorner(column, row, left=True, top=True),
+            WebCorner(column, row, left=False, top=True),
+            WebCorner(column, row - 1, left=False, top=False),
+            WebCorner(column, row - 1, left=True, top=False),
         )
 
     def web_above(self, column: float, row: float, z_offset: float = 0, thickness: Optional[float] = None, size_adjust: Optional[XYAdjustCallback] = None, position_adjust: Optional[XYAdjustCallback] = None) -> OpenSCADObject:
@@ -324,19 +569,23 @@ class Layout:
         │0,1│ ┃1,1┃
         └───┘ ┗━━━┛
         """
-        return hull()(
-            self.web_corner(column, row, left=True, top=True,
-                            z_offset=z_offset, thickness=thickness,
-                            size_adjust=size_adjust, position_adjust=position_adjust),
-            self.web_corner(column, row, left=False, top=True,
-                            z_offset=z_offset, thickness=thickness,
-                            size_adjust=size_adjust, position_adjust=position_adjust),
-            self.web_corner(column, row - 1, left=False, top=False,
-                            z_offset=z_offset, thickness=thickness,
-                            size_adjust=size_adjust, position_adjust=position_adjust),
-            self.web_corner(column, row - 1, left=True, top=False,
-                            z_offset=z_offset, thickness=thickness,
-                            size_adjust=size_adjust, position_adjust=position_adjust),
+        return self.web_hull(
+            *self.web_above_corners(column, row),
+            z_offset=z_offset, thickness=thickness, size_adjust=size_adjust, position_adjust=position_adjust,
+        )
+
+    def web_top_left_of_corners(self, column: float, row: float) -> Tuple[WebCorner, ...]:
+        """Return the corners making up the "web" between the key at the given row/column and the neighboring ones in
+        the column to the left and/or the row above. (see `web_top_left_of`)
+
+        :param column: the column of the key to create the web at
+        :param row: the row of the key to create the web at
+        """
+        return (
+            WebCorner(column, row, left=True, top=True),
+            WebCorner(column - 1, row, left=False, top=True),
+            WebCorner(column - 1, row - 1, left=False, top=False),
+            WebCorner(column, row - 1, left=True, top=False),
         )
 
     def web_top_left_of(self, column: float, row: float, z_offset: float = 0, thickness: Optional[float] = None, size_adjust: Optional[XYAdjustCallback] = None, position_adjust: Optional[XYAdjustCallback] = None) -> OpenSCADObject:
@@ -360,53 +609,74 @@ class Layout:
         │0,1│ ┃1,1┃
         └───┘ ┗━━━┛
         """
-        return hull()(
-            self.web_corner(column, row, left=True, top=True,
-                            z_offset=z_offset, thickness=thickness,
-                            size_adjust=size_adjust, position_adjust=position_adjust),
-            self.web_corner(column - 1, row, left=False, top=True,
-                            z_offset=z_offset, thickness=thickness,
-                            size_adjust=size_adjust, position_adjust=position_adjust),
-            self.web_corner(column - 1, row - 1, left=False, top=False,
-                            z_offset=z_offset, thickness=thickness,
-                            size_adjust=size_adjust, position_adjust=position_adjust),
-            self.web_corner(column, row - 1, left=True, top=False,
-                            z_offset=z_offset, thickness=thickness,
-                            size_adjust=size_adjust, position_adjust=position_adjust),
+        return self.web_hull(
+            *self.web_top_left_of_corners(column, row),
+            z_offset=z_offset, thickness=thickness, size_adjust=size_adjust, position_adjust=position_adjust,
+        )
+
+    def web_corner_groups(self) -> Iterable[Sequence[WebCorner]]:
+        """Return the groups of corners to hull together to build the complete "web" between all key positions.
+
+        Override this to change which webs `web_all` generates.
+        """
+        return chain(
+            (
+                self.web_top_left_of_corners(column, row)
+                for (column, row) in self.generate_positions()
+                if column > 0 and row > 0
+            ),
+            (
+                self.web_left_of_corners(column, row)
+                for (column, row) in self.generate_positions()
+                if column > 0
+            ),
+            (
+                self.web_above_corners(column, row)
+                for (column, row) in self.generate_positions()
+                if row > 0
+            ),
         )
 
     def web_all(self, z_offset: float = 0, thickness: Optional[float] = None, size_adjust: Optional[XYAdjustCallback] = None, position_adjust: Optional[XYAdjustCallback] = None) -> OpenSCADObject:
-        """Return the complete "web" between all key positions in this layout.thumb_place_all
+        """Return the complete "web" between all key positions in this layout.
 
         :param z_offset: the offset in the Z direction of the corner blocks (before placing at the key positions)
         :param thickness: the thickness of the web; if None, default to self.web_thickness
         :param size_adjust: a callback to adjust the size of the key at this column and row
         :param position_adjust: a callback to adjust the position of the key at this column and row
         """
-        web_kwargs = {
-            'z_offset': z_offset,
-            'thickness': thickness,
-            'size_adjust': size_adjust,
-            'position_adjust': position_adjust,
-        }
-
-        return reduce(
-            operator.add,
-            chain(
-                (
-                    self.web_top_left_of(column, row, **web_kwargs)
-                    for (column, row) in self.generate_positions()
-                    if column > 0 and row > 0
-                ),
-                (
-                    self.web_left_of(column, row, **web_kwargs)
-                    for (column, row) in self.generate_positions()
-                    if column > 0
-                ),
-                (
-                    self.web_above(column, row, **web_kwargs)
-                    for (column, row) in self.generate_positions()
-                    if row > 0
-                ),
+        return union_all(
+            self.web_hulls(
+                self.web_corner_groups(),
+                z_offset=z_offset, thickness=thickness, size_adjust=size_adjust, position_adjust=position_adjust,
             )
         )
+
+    def web_all_mesh(self, z_offset: float = 0, thickness: Optional[float] = None, size_adjust: Optional[XYAdjustCallback] = None, position_adjust: Optional[XYAdjustCallback] = None) -> TriangleMesh:
+        """Return the mesh equivalent of `web_all`, with each web as a separate convex shell.
+
+        Raises `UnsupportedShapeError` if the numeric hull of any web fails.
+
+        :param z_offset: the offset in the Z direction of the corner blocks (before placing at the key positions)
+        :param thickness: the thickness of the web; if None, default to self.web_thickness
+        :param size_adjust: a callback to adjust the size of the key at this column and row
+        :param position_adjust: a callback to adjust the position of the key at this column and row
+        """
+        corner_groups = [tuple(group) for group in self.web_corner_groups()]
+        all_points = self.web_corner_points(
+            [corner for group in corner_groups for corner in group],
+            z_offset=z_offset, thickness=thickness, size_adjust=size_adjust, position_adjust=position_adjust,
+        )
+
+        webs = []
+        start = 0
+        for group in corner_groups:
+            points = all_points[start:start + len(group)]
+            start += len(group)
+
+            web_hull = self._cached_web_hull(points)
+            if web_hull is None:
+                raise UnsupportedShapeError(f"Unable to build the web between {group} as a convex hull")
+            webs.append(polygon_mesh(*web_hull))
+
+        return concatenate_meshes(webs)
@@ -1,18 +1,17 @@
 """The layout of a thumb well.
 """
 import math
-import operator
-from collections.abc import Iterable
-from functools import reduce
+from collections.abc import Iterable, Sequence
 from itertools import chain
-from typing import Optional, Tuple
+from typing import Tuple
 
-from solid2 import hull
+import numpy as np
 from solid2.core.object_base import OpenSCADObject
 
 from spkb.keyswitch import Keyswitch, MX
 
-from .layout import Layout, XYAdjustCallback
+from ..transforms import identity, rotation, translation
+from .layout import Layout, WebCorner
 
 
 class ThumbWellLayout(Layout):
@@ -54,6 +53,17 @@ class ThumbWellLayout(Layout):
         else:
             return shape
 
+    def placement_adjust_matrix(self, column: float, row: float) -> np.ndarray:
+        """Return the matrix equivalent of `placement_adjust` for the given key/location.
+
+        :param column: the column to place the key in
+        :param row: the row to place the key in
+        """
+        if (isinstance(row, float) and not row.is_integer()) or (isinstance(column, float) and not column.is_integer()):
+            return translation((0, 0, 1))
+        else:
+            return identity()
+
     def layout_place(self, shape: OpenSCADObject) -> OpenSCADObject:
         """Place the layout.
 
@@ -69,77 +79,76 @@ class ThumbWellLayout(Layout):
             .rotate(15, (1, 1, 1)) \
             .translate(self.placement_transform)
 
-    def web_all(self, z_offset: float = 0, thickness: Optional[float] = None, size_adjust: Optional[XYAdjustCallback] = None, position_adjust: Optional[XYAdjustCallback] = None) -> OpenSCADObject:
-        """Return the complete "web" between all key positions in this layout.
+    def layout_matrix(self) -> np.ndarray:
+        """Return the matrix equivalent of `layout_place`.
+        """
+        return (
+            translation(self.placement_transform)
+            @ rotation(15, (1, 1, 1))
+            @ rotation(math.degrees(math.pi / -20), (0, 1, 0))
+            @ rotation(math.degrees(math.pi / (-11/6)), (-1, 1, 0))
+            @ rotation(math.degrees(math.pi / 14), (1, 1, 0))
+            @ rotation(math.degrees(math.pi * 9/32), (0, 0, 1))
+            @ rotation(math.degrees(math.pi / 2.8), (0, 1, 0))
+            @ translation((17, 0, 3))
+        )
 
-        :param z_offset: the offset in the Z direction of the corner blocks (before placing at the key positions)
-        :param thickness: the thickness of the web; if None, default to self.web_thickness
-        :param size_adjust: a callback to adjust the size of the key at this column and row
-        :param position_adjust: a callback to adjust the position of the key at this column and row
+    def web_corner_groups(self) -> Iterable[Sequence[WebCorner]]:
+        """Return the groups of corners to hull together to build the complete "web" between all key positions.
         """
-        web_kwargs = {
-            'z_offset': z_offset,
-            'thickness': thickness,
-            'size_adjust': size_adjust,
-            'position_adjust': position_adjust,
-        }
-
-        return reduce(
-            operator.add,
-            chain(
+        return chain(
+            (
+                self.web_top_left_of_corners(column, row)
+                for (column, row) in self.generate_positions()
+                if column > 0 and row > -1 and (column, row) not in (
+                    (1, 0),
+                    (1, 1),
+                )
+            ),
+            (
+                self.web_left_of_corners(column, row)
+                for (column, row) in self.generate_positions()
+                if column > 0 and (column, row) not in (
+                    (1, 0),
+                    (1, 1),
+                )
+            ),
+            (
+                self.web_above_corners(column, row)
+                for (column, row) in self.generate_positions()
+                if row > -1 and (column, row) not in (
+                    (0, 1/2),
+                    (0, -1),
+                )
+            ),
+            [
+                (
+                    WebCorner(0, 1/2, left=False, top=True, row_span=2),
+                    WebCorner(0, -1, left=False, top=False),
+                    WebCorner(1, -1, left=True, top=False),
+                    WebCorner(1, 0, left=True, top=True),
+                ),
+                (
+                    WebCorner(0, -1, left=True, top=False),
+                    WebCorner(0, -1, left=False, top=False),
+                    WebCorner(0, 1/2, left=False, top=True, row_span=2),
+                    WebCorner(0, 1/2, left=True, top=True, row_span=2),
+                ),
                 (
-                    self.web_top_left_of(column, row, **web_kwargs)
-                    for (column, row) in self.generate_positions()
-                    if column > 0 and row > -1 and (column, row) not in (
-                        (1, 0),
-                        (1, 1),
-                    )
+                    WebCorner(0, 1/2, left=False, top=False, row_span=2),
+                    WebCorner(1, 1, left=True, top=True),
+                    WebCorner(1, 1, left=True, top=False),
                 ),
                 (
-                    self.web_left_of(column, row, **web_kwargs)
-                    for (column, row) in self.generate_positions()
-                    if column > 0 and (column, row) not in (
-                        (1, 0),
-                        (1, 1),
-                    )
+                    WebCorner(0, 1/2, left=False, top=False, row_span=2),
+                    WebCorner(0, 1/2, left=False, top=True, row_span=2),
+                    WebCorner(1, 0, left=True, top=False),
+                    WebCorner(1, 1, left=True, top=True),
                 ),
                 (
-                    self.web_above(column, row, **web_kwargs)
-                    for (column, row) in self.generate_positions()
-                    if row > -1 and (column, row) not in (
-                        (0, 1/2),
-                        (0, -1),
-                    )
+                    WebCorner(0, 1/2, left=False, top=True, row_span=2),
+                    WebCorner(1, 0, left=True, top=False),
+                    WebCorner(1, 0, left=True, top=True),
                 ),
-                [
-                    hull()(
-                        self.web_corner(0, 1/2, left=False, top=True, row_span=2, **web_kwargs),
-                        self.web_corner(0, -1, left=False, top=False, **web_kwargs),
-                        self.web_corner(1, -1, left=True, top=False, **web_kwargs),
-                        self.web_corner(1, 0, left=True, top=True, **web_kwargs),
-                    ),
-                    hull()(
-                        self.web_corner(0, -1, left=True, top=False, **web_kwargs),
-                        self.web_corner(0, -1, left=False, top=False, **web_kwargs),
-                        self.web_corner(0, 1/2, left=False, top=True, row_span=2, **web_kwargs),
-                        self.web_corner(0, 1/2, left=True, top=True, row_span=2, **web_kwargs),
-                    ),
-                    hull()(
-                        self.web_corner(0, 1/2, left=False, top=False, row_span=2, **web_kwargs),
-                        self.web_corner(1, 1, left=True, top=True, **web_kwargs),
-                        self.web_corner(1, 1, left=True, top=False, **web_kwargs),
-                    ),
-                    hull()(
-                        self.web_corner(0, 1/2, left=False, top=False, row_span=2, **web_kwargs),
-                        self.web_corner(0, 1/2, left=False, top=True, row_span=2, **web_kwargs),
-                        self.web_corner(1, 0, left=True, top=False, **web_kwargs),
-                        self.web_corner(1, 1, left=True, top=True, **web_kwargs),
-                    ),
-                    hull()(
-                        self.web_corner(0, 1/2, left=False, top=True, row_span=2, **web_kwargs),
-                        self.web_corner(1, 0, left=True, top=False, **web_kwargs),
-                        self.web_corner(1, 0, left=True, top=True, **web_kwargs),
-                    ),
-                ],
-            )
+            ],
         )
@@ -1,12 +1,17 @@
+from typing import Optional
+
 from solid2 import cube, hull
 from solid2.core.object_base import OpenSCADObject
 from solid2.extensions.bosl2 import screws
 
+from .hardware_meshes import HardwareMeshLibrary
+
 
 class LCDMount:
     """A mount for an LCD screen.
     """
-    def __init__(self):
+    def __init__(self, hardware: Optional[HardwareMeshLibrary] = None):
+        self.hardware = hardware  # If given, the corners (with their screw holes) are imported from a pre-rendered mesh
         self.lcdSize = (27.8, 39.3, 1.2)          # (X, Y, Z)
         self.lcdMountingHoleCenters = (22.5, 34)  # (X, Y)
         self.marginWidth = (0.5, 1.1)             # (X, Y)
@@ -39,6 +44,8 @@ class LCDMount:
             - screws.screw_hole("M2x1", length=cornerBlockThickness + 0.01, thread=False,
                                 bevel=True, blunt_start=True, _fn=32)
         ).translate((0, 0, cornerBlockOffset[1]))
+        if self.hardware is not None:
+            corner = self.hardware.mesh('lcd-mount-corner', corner)
 
         return self.place(
             cube((
@@ -0,0 +1,366 @@
+"""Triangle meshes built directly with NumPy, for writing mesh files without evaluating any CSG in OpenSCAD.
+
+Only unions of convex pieces are supported. Each piece is written as its own closed shell, and overlapping shells are
+left for the slicer to merge (as slicers do when slicing), rather than being merged into a single surface here.
+"""
+from collections.abc import Sequence
+from typing import List, NamedTuple
+
+import numpy as np
+
+from spkb.keyswitch import Keyswitch
+from spkb.utils import fudge_radius
+
+from .geometry import convex_hull
+
+
+class UnsupportedShapeError(ValueError):
+    """Raised when a shape can't be built as a union of convex pieces.
+    """
+
+
+class TriangleMesh(NamedTuple):
+    """A set of triangles, each wound counter-clockwise when viewed from outside. (as expected by STL files)
+    """
+    vertices: np.ndarray
+    "The vertices of the mesh, as an array of shape (N, 3)"
+    triangles: np.ndarray
+    "The triangles of the mesh, as an array of shape (M, 3) of indices into `vertices`"
+
+
+def empty_mesh() -> TriangleMesh:
+    """Return a mesh with no triangles.
+    """
+    return TriangleMesh(np.empty((0, 3)), np.empty((0, 3), dtype=int))
+
+
+def convex_mesh(points: np.ndarray) -> TriangleMesh:
+    """Return the convex hull of the given points as a mesh.
+
+    Raises `UnsupportedShapeError` if the points are degenerate. (see `geometry.convex_hull`)
+
+    :param points: an array of shape (N, 3)
+    """
+    try:
+        vertices, faces = convex_hull(points)
+    except ValueError as error:
+        raise UnsupportedShapeError(str(error)) from error
+
+    return polygon_mesh(vertices, faces)
+
+
+def polygon_mesh(vertices: np.ndarray, faces: Sequence[Sequence[int]]) -> TriangleMesh:
+    """Return a mesh of the given convex polygons, each ordered clockwise when viewed from outside. (as expected by
+    OpenSCAD's `polyhedron()`)
+
+    :param vertices: an array of shape (N, 3)
+    :param faces: the polygons, as lists of indices into `vertices`
+    """
+    # Fan out from the first vertex of each face, reversing the winding to counter-clockwise.
+    triangles = [
+        (face[0], face[index + 1], face[index])
+        for face in faces
+        for index in range(1, len(face) - 1)
+    ]
+    return TriangleMesh(np.asarray(vertices, dtype=float), np.array(triangles, dtype=int).reshape(-1, 3))
+
+
+def hexahedron_mesh(corners: np.ndarray) -> TriangleMesh:
+    """Return a convex hexahedron (a box, possibly skewed or tapered) as a mesh.
+
+    :param corners: the 8 corners, as an array of shape (8, 3), ordered like those of an axis-aligned box: the corner
+    at the low (0) or high (1) end along each of the X, Y, and Z axes is at index `4x + 2y + z`
+    """
+    faces = [
+        (0, 2, 3, 1),  # -X
+        (4, 5, 7, 6),  # +X
+        (0, 1, 5, 4),  # -Y
+        (2, 6, 7, 3),  # +Y
+        (0, 4, 6, 2),  # -Z
+        (1, 3, 7, 5),  # +Z
+    ]
+    return polygon_mesh(corners, faces)
+
+
+def box_mesh(minimum: Sequence[float], maximum: Sequence[float]) -> TriangleMesh:
+    """Return an axis-aligned box as a mesh.
+
+    :param minimum: the X, Y, and Z coordinates of the box's lowest corner
+    :param maximum: the X, Y, and Z coordinates of the box's highest corner
+    """
+    corners = np.array([minimum, maximum], dtype=float)
+    return hexahedron_mesh(np.array([
+        (corners[x, 0], corners[y, 1], corners[z, 2])
+        for x in (0, 1)
+        for y in (0, 1)
+        for z in (0, 1)
+    ]))
+
+
+def box_minus_prisms_mesh(
+    minimum: Sequence[float],
+    maximum: Sequence[float],
+    polygons: Sequence[np.ndarray],
+    bottom: float,
+    top: float,
+) -> TriangleMesh:
+    """Return an axis-aligned box with vertical prisms subtracted from it, as a union of convex hexahedra.
+
+    Raises `UnsupportedShapeError` if any prism's cross-section crosses the edge of the box's, or if the cross-sections
+    of two prisms can't be separated by a line parallel to the X or Y axis.
+
+    :param minimum: the X, Y, and Z coordinates of the box's lowest corner
+    :param maximum: the X, Y, and Z coordinates of the box's highest corner
+    :param polygons: the prisms' cross-sections, each a convex polygon in counter-clockwise order (shape (N, 2))
+    :param bottom: the Z coordinate of the bottom of the prisms
+    :param top: the Z coordinate of the top of the prisms
+    """
+    (x_min, y_min, z_min), (x_max, y_max, z_max) = minimum, maximum
+    bottom, top = max(bottom, z_min), min(top, z_max)
+
+    polygons = [
+        polygon
+        for polygon in polygons
+        if (polygon.min(axis=0) < (x_max, y_max)).all() and (polygon.max(axis=0) > (x_min, y_min)).all()
+    ]
+    if bottom >= top or not polygons:
+        return box_mesh(minimum, maximum)
+
+    if len(polygons) > 1:
+        # Split the box between the first two prisms, and subtract the prisms from each half separately.
+        (first, second) = sorted(polygons[:2], key=lambda polygon: tuple(polygon.min(axis=0)))
+        for axis in (0, 1):
+            if first[:, axis].max() < second[:, axis].min():
+                split = (first[:, axis].max() + second[:, axis].min()) / 2
+                break
+            if second[:, axis].max() < first[:, axis].min():
+                split = (second[:, axis].max() + first[:, axis].min()) / 2
+                break
+        else:
+            raise UnsupportedShapeError("Overlapping holes can't be built as meshes")
+
+        low_maximum, high_minimum = list(maximum), list(minimum)
+        low_maximum[axis] = high_minimum[axis] = split
+        return concatenate_meshes([
+            box_minus_prisms_mesh(minimum, low_maximum, polygons, bottom, top),
+            box_minus_prisms_mesh(high_minimum, maximum, polygons, bottom, top),
+        ])
+
+    (polygon,) = polygons
+    polygon_min, polygon_max = polygon.min(axis=0), polygon.max(axis=0)
+    if polygon_min[0] <= x_min or polygon_max[0] >= x_max or polygon_min[1] <= y_min or polygon_max[1] >= y_max:
+        raise UnsupportedShapeError("Holes crossing the edge of a box can't be built as meshes")
+
+    # Split the box into layers below, around, and above the prism...
+    meshes = []
+    if bottom > z_min:
+        meshes.append(box_mesh((x_min, y_min, z_min), (x_max, y_max, bottom)))
+    if top < z_max:
+        meshes.append(box_mesh((x_min, y_min, top), (x_max, y_max, z_max)))
+
+    # ...and the layer around the prism into columns to its left and right, and below and above each of its edges.
+    columns = [
+        ((x_min, y_min), (x_min, y_max), (polygon_min[0], y_min), (polygon_min[0], y_max)),
+        ((polygon_max[0], y_min), (polygon_max[0], y_max), (x_max, y_min), (x_max, y_max)),
+    ]
+    leftmost, rightmost = int(np.argmin(polygon[:, 0])), int(np.argmax(polygon[:, 0]))
+    for index in range(len(polygon)):
+        start, end = polygon[index], polygon[(index + 1) % len(polygon)]
+        if np.isclose(start[0], end[0]):
+            continue
+
+        # Counter-clockwise, the edges from the leftmost to the rightmost point are along the bottom of the polygon.
+        if (index - leftmost) % len(polygon) < (rightmost - leftmost) % len(polygon):
+            columns.append(((start[0], y_min), tuple(start), (end[0], y_min), tuple(end)))
+        else:
+            columns.append((tuple(end), (end[0], y_max), tuple(start), (start[0], y_max)))
+
+    for column in columns:
+        meshes.append(hexahedron_mesh(np.array([(x, y, z) for (x, y) in column for z in (bottom, top)])))
+
+    return concatenate_meshes(meshes)
+
+
+def regular_polygon(center: Sequence[float], radius: float, segments: int) -> np.ndarray:
+    """Return the vertices of a regular polygon, in counter-clockwise order, like OpenSCAD's `circle(r, $fn=segments)`.
+
+    :param center: the X and Y coordinates of the polygon's center
+    :param radius: the distance from the center to each vertex
+    :param segments: the number of vertices
+    """
+    angles = np.linspace(0, 2 * np.pi, segments, endpoint=False)
+    return np.column_stack((np.cos(angles), np.sin(angles))) * radius + np.asarray(center, dtype=float)
+
+
+def transform_mesh(mesh: TriangleMesh, matrix: np.ndarray) -> TriangleMesh:
+    """Apply the given 4x4 matrix to the given mesh.
+
+    Mirroring transformations reverse the winding of each triangle, so the triangles still face outward.
+
+    :param mesh: the mesh to transform
+    :param matrix: the 4x4 matrix to apply
+    """
+    vertices = mesh.vertices @ matrix[:3, :3].T + matrix[:3, 3]
+    triangles = mesh.triangles
+    if np.linalg.det(matrix[:3, :3]) < 0:
+        triangles = triangles[:, ::-1]
+    return TriangleMesh(vertices, triangles)
+
+
+def concatenate_meshes(meshes: Sequence[TriangleMesh]) -> TriangleMesh:
+    """Combine the given meshes into a single mesh. (keeping each as a separate shell)
+
+    :param meshes: the meshes to combine
+    """
+    if not meshes:
+        return empty_mesh()
+
+    offsets = np.cumsum([0] + [len(mesh.vertices) for mesh in meshes[:-1]])
+    return TriangleMesh(
+        np.concatenate([mesh.vertices for mesh in meshes]),
+        np.concatenate([mesh.triangles + offset for (mesh, offset) in zip(meshes, offsets)]),
+    )
+
+
+def _crossings(start: float, end: float, values: Sequence[float], levels: Sequence[float]) -> List[float]:
+    """Return the positions strictly between `start` and `end` at which a linear function crosses any of the given
+    levels.
+
+    :param start: the start of the range
+    :param end: the end of the range
+    :param values: the values of the function at `start` and `end`
+    :param levels: the levels to find crossings of
+    """
+    (first, last) = values
+    return [
+        start + (end - start) * (level - first) / (last - first)
+        for level in levels
+        if (first - level) * (last - level) < 0
+    ]
+
+
+def _notch_wall_pieces(keyswitch: Keyswitch, hole_edge: float, thickness: float) -> List[np.ndarray]:
+    """Return the wall of a switch plate around a clip notch, between the edge of the mounting hole and the deepest
+    part of the notch, as arrays of points whose convex hulls make up the wall there.
+
+    The notch (see `Keyswitch.mounting_socket`) is a hull tapering from its outer size at the edge of the mounting hole
+    to its inner size `notch_depth` into the wall. The wall around it is split into convex pieces: beside the notch on
+    either side (through the whole plate), and above and below it.
+
+    :param keyswitch: the keyswitch to build the plate for
+    :param hole_edge: the Y coordinate of the edge of the mounting hole the notch is cut into
+    :param thickness: the thickness of the plate
+    """
+    edges = (hole_edge, hole_edge + keyswitch.notch_depth)
+    outer_half_width = keyswitch.notch_width_outer / 2
+    center = -keyswitch.notch_plate_thickness - keyswitch.notch_height / 2
+    tolerance = 1e-9
+
+    def half_width(y: float) -> float:
+        return float(np.interp(y, edges, (outer_half_width, keyswitch.notch_width / 2)))
+
+    def half_height(y: float) -> float:
+        return float(np.interp(y, edges, (keyswitch.notch_height_outer / 2, keyswitch.notch_height / 2)))
+
+    pieces = []
+    if keyswitch.notch_width < keyswitch.notch_width_outer:
+        for side in (-1, 1):
+            pieces.append(np.array([
+                (side * x, y, z)
+                for y in edges
+                for x in (half_width(y), outer_half_width)
+                for z in (-thickness, 0)
+            ]))
+
+    # Above the notch, its top slopes down from the edge of the hole; below it, its bottom slopes up.
+    for (direction, limit) in ((1, 0), (-1, -thickness)):
+        def surface(y: float) -> float:
+            return center + direction * half_height(y)
+
+        points = []
+        for y in sorted([*edges, *_crossings(*edges, [surface(y) for y in edges], (0, -thickness))]):
+            if direction * (surface(y) - limit) > tolerance:
+                # The notch cuts all the way through the plate here.
+                continue
+            z = min(max(surface(y), -thickness), 0)
+            points.extend((x, y, z) for x in (-half_width(y), half_width(y)))
+            points.extend((x, y, limit) for x in (-half_width(y), half_width(y)))
+
+        if any(abs(z - limit) > tolerance for (_, _, z) in points):
+            pieces.append(np.array(points))
+
+    return pieces
+
+
+def switch_plate_mesh(keyswitch: Keyswitch) -> TriangleMesh:
+    """Return the equivalent of `keyswitch.plate()` (with its default arguments) as a union of convex pieces.
+
+    :param keyswitch: the keyswitch to build the plate for
+    """
+    if (
+        keyswitch.notch_width > keyswitch.notch_width_outer
+        or keyswitch.notch_height > keyswitch.notch_height_outer
+    ):
+        raise UnsupportedShapeError("Switch clip notches must be widest at the edge of the mounting hole")
+
+    wall = keyswitch.wall_thickness
+    half_width = keyswitch.keyswitch_width / 2
+    half_length = keyswitch.keyswitch_length / 2
+    # Plates for switches with screws extend to the full depth of the switch. (see `Keyswitch.plate`)
+    thickness = keyswitch.plate_thickness if keyswitch.screws is None else keyswitch.keyswitch_depth
+
+    if keyswitch.notch_width_outer > keyswitch.keyswitch_width or keyswitch.notch_depth > wall:
+        raise UnsupportedShapeError("Switch clip notches must fit within the walls of the plate")
+    notch_half_width = keyswitch.notch_width_outer / 2
+    notch_depth = keyswitch.notch_depth
+
+    boxes = [
+        # The wall to the right of the mounting hole
+        ((half_width, -half_length - wall, -thickness), (half_width + wall, half_length + wall, 0)),
+        # The wall behind the mounting hole, on either side of the notch
+        ((-half_width, half_length, -thickness), (-notch_half_width, half_length + wall, 0)),
+        ((notch_half_width, half_length, -thickness), (half_width, half_length + wall, 0)),
+    ]
+    # The wall behind the notch
+    if notch_depth < wall:
+        boxes.append(
+            ((-notch_half_width, half_length + notch_depth, -thickness), (notch_half_width, half_length + wall, 0))
+        )
+    # The wall around the notch
+    pieces = _notch_wall_pieces(keyswitch, half_length, thickness)
+
+    # The left and front walls are the same, rotated 180 degrees.
+    boxes.extend([
+        ((-maximum[0], -maximum[1], minimum[2]), (-minimum[0], -minimum[1], maximum[2]))
+        for (minimum, maximum) in boxes
+    ])
+    pieces.extend([points * (-1, -1, 1) for points in pieces])
+
+    holes = [
+        # The equivalent of `Keyswitch.screw_hole`, which is a circumscribed 16-sided cylinder.
+        regular_polygon((screw.x, screw.y), fudge_radius(screw.radius), 16)
+        for screw in keyswitch.screws or ()
+    ]
+    hole_bottom = -keyswitch.keyswitch_depth - keyswitch.plate_thickness * 5 / 4
+    hole_top = -keyswitch.plate_thickness * 3 / 4
+
+    for points in pieces:
+        (minimum, maximum) = (points[:, :2].min(axis=0), points[:, :2].max(axis=0))
+        if any((hole.min(axis=0) < maximum).all() and (hole.max(axis=0) > minimum).all() for hole in holes):
+            raise UnsupportedShapeError("Screw holes next to switch clip notches can't be built as meshes")
+
+    return concatenate_meshes([
+        *(box_minus_prisms_mesh(minimum, maximum, holes, hole_bottom, hole_top) for (minimum, maximum) in boxes),
+        *(convex_mesh(points) for points in pieces),
+    ])
+
+
+def triangle_normals(mesh: TriangleMesh) -> np.ndarray:
+    """Return the unit normal of each triangle in the given mesh, as an array of shape (M, 3).
+
+    :param mesh: the mesh to compute normals for
+    """
+    corners = mesh.vertices[mesh.triangles]
+    normals = np.cross(corners[:, 1] - corners[:, 0], corners[:, 2] - corners[:, 0])
+    lengths = np.linalg.norm(normals, axis=1, keepdims=True)
+    return np.divide(normals, lengths, out=np.zeros_like(normals), where=lengths > 0)
@@ -0,0 +1,206 @@
+"""Writing triangle meshes to binary STL and 3MF files.
+
+Both writers stream: meshes are written as they're passed in (e.g. one piece of a part at a time), so the whole part
+never has to be held in memory at once.
+"""
+import struct
+import tempfile
+import zipfile
+from typing import BinaryIO, Dict, Optional, Type, Union
+
+import numpy as np
+
+from .mesh import TriangleMesh, triangle_normals
+
+
+stl_triangle_dtype = np.dtype([
+    ('normal', '<f4', (3,)),
+    ('vertices', '<f4', (3, 3)),
+    ('attribute_byte_count', '<u2'),
+])
+"The layout of a single triangle in a binary STL file"
+
+threemf_model_path = '3D/3dmodel.model'
+"The path of the model within a 3MF archive"
+
+threemf_content_types = '''<?xml version="1.0" encoding="UTF-8"?>
+<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">
+ <Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>
+ <Default Extension="model" ContentType="application/vnd.ms-package.3dmanufacturing-3dmodel+xml"/>
+</Types>
+'''
+"The `[Content_Types].xml` file of a 3MF archive"
+
+threemf_relationships = f'''<?xml version="1.0" encoding="UTF-8"?>
+<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">
+ <Relationship Target="/{threemf_model_path}" Id="rel0"
+  Type="http://schemas.microsoft.com/3dmanufacturing/2013/01/3dmodel"/>
+</Relationships>
+'''
+"The `_rels/.rels` file of a 3MF archive"
+
+
+class StlWriter:
+    """Writes triangles to a binary STL file as they're generated.
+
+    Use as a context manager (or call `close()`), which fills in the triangle count in the file's header.
+    """
+    def __init__(self, filepath: str, name: str = ''):
+        """Start writing the given file.
+
+        :param filepath: the path of the file to write
+        :param name: a name to write in the file's header
+        """
+        self.filepath = filepath
+        self.triangle_count = 0
+        "The number of triangles written so far"
+
+        self._file: BinaryIO = open(filepath, 'wb')
+        self._file.write(name.encode('utf-8')[:80].ljust(80, b'\0'))
+        self._file.write(struct.pack('<I', 0))
+
+    def write(self, mesh: TriangleMesh):
+        """Append the triangles of the given mesh to the file.
+
+        :param mesh: the mesh to write
+        """
+        records = np.zeros(len(mesh.triangles), dtype=stl_triangle_dtype)
+        records['normal'] = triangle_normals(mesh)
+        records['vertices'] = mesh.vertices[mesh.triangles]
+
+        self._file.write(records.tobytes())
+        self.triangle_count += len(records)
+
+    def close(self):
+        """Fill in the triangle count, and close the file.
+        """
+        if self._file.closed:
+            return
+
+        self._file.seek(80)
+        self._file.write(struct.pack('<I', self.triangle_count))
+        self._file.close()
+
+    def __enter__(self) -> 'StlWriter':
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class ThreeMFWriter:
+    """Writes triangles to a 3MF file (as a single object) as they're generated.
+
+    3MF lists all of an object's vertices before any of its triangles, so vertices are written straight into the
+    archive, while triangles are spooled to a temporary file until the writer is closed.
+
+    Use as a context manager (or call `close()`), which finishes the archive.
+    """
+    chunk_triangles = 65536
+    "The number of triangles copied from the temporary file at a time when finishing the archive"
+
+    def __init__(self, filepath: str, name: str = ''):
+        """Start writing the given file.
+
+        :param filepath: the path of the file to write
+        :param name: the name of the object in the file
+        """
+        self.filepath = filepath
+        self.triangle_count = 0
+        "The number of triangles written so far"
+        self.vertex_count = 0
+        "The number of vertices written so far"
+
+        self._archive = zipfile.ZipFile(filepath, 'w', compression=zipfile.ZIP_DEFLATED)
+        self._archive.writestr('[Content_Types].xml', threemf_content_types)
+        self._archive.writestr('_rels/.rels', threemf_relationships)
+
+        self._model: Optional[BinaryIO] = self._archive.open(threemf_model_path, 'w')
+        self._triangles = tempfile.TemporaryFile()
+
+        self._write_text(
+            '<?xml version="1.0" encoding="UTF-8"?>\n'
+            '<model unit="millimeter" xml:lang="en-US" '
+            'xmlns="http://schemas.microsoft.com/3dmanufacturing/core/2015/02">\n'
+            ' <resources>\n'
+            f'  <object id="1" name="{_xml_attribute(name)}" type="model">\n'
+            '   <mesh>\n'
+            '    <vertices>\n'
+        )
+
+    def _write_text(self, text: str):
+        assert self._model is not None
+        self._model.write(text.encode('utf-8'))
+
+    def write(self, mesh: TriangleMesh):
+        """Append the vertices and triangles of the given mesh to the file.
+
+        :param mesh: the mesh to write
+        """
+        self._write_text(''.join(
+            f'     <vertex x="{x:.6f}" y="{y:.6f}" z="{z:.6f}"/>\n'
+            for (x, y, z) in mesh.vertices.tolist()
+        ))
+        self._triangles.write((mesh.triangles + self.vertex_count).astype('<i8').tobytes())
+
+        self.vertex_count += len(mesh.vertices)
+        self.triangle_count += len(mesh.triangles)
+
+    def close(self):
+        """Write the spooled triangles, and finish the archive.
+        """
+        if self._model is None:
+            return
+
+        self._write_text('    </vertices>\n    <triangles>\n')
+
+        self._triangles.seek(0)
+        while chunk := self._triangles.read(self.chunk_triangles * 3 * 8):
+            self._write_text(''.join(
+                f'     <triangle v1="{v1}" v2="{v2}" v3="{v3}"/>\n'
+                for (v1, v2, v3) in np.frombuffer(chunk, dtype='<i8').reshape(-1, 3).tolist()
+            ))
+        self._triangles.close()
+
+        self._write_text(
+            '    </triangles>\n'
+            '   </mesh>\n'
+            '  </object>\n'
+            ' </resources>\n'
+            ' <build>\n'
+            '  <item objectid="1"/>\n'
+            ' </build>\n'
+            '</model>\n'
+        )
+        self._model.close()
+        self._model = None
+        self._archive.close()
+
+    def __enter__(self) -> 'ThreeMFWriter':
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def _xml_attribute(value: str) -> str:
+    return value.replace('&', '&amp;').replace('"', '&quot;').replace('<', '&lt;')
+
+
+mesh_writers: Dict[str, Type[Union[StlWriter, ThreeMFWriter]]] = {
+    'stl': StlWriter,
+    '3mf': ThreeMFWriter,
+}
+"The writer class for each mesh file extension"
+
+
+def write_mesh(mesh: TriangleMesh, filepath: str, name: str = '', output_format: str = 'stl'):
+    """Write the given mesh to a binary STL or 3MF file.
+
+    :param mesh: the mesh to write
+    :param filepath: the path of the file to write
+    :param name: the name to record in the file
+    :param output_format: the file format (one of `mesh_writers`)
+    """
+    with mesh_writers[output_format](filepath, name=name) as writer:
+        writer.write(mesh)
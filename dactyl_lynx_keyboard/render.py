@@ -0,0 +1,196 @@
+"""Rendering OpenSCAD files to STL (or 3MF) files, running several OpenSCAD processes at once.
+"""
+import math
+import os
+import subprocess
+import sys
+import time
+from collections.abc import Sequence
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from os.path import basename, dirname, exists, splitext
+from typing import Dict, List, NamedTuple, Optional
+
+from .build_cache import BuildManifest, OpenSCADNotFoundError, bosl2_version, content_hash, file_hash, openscad_version
+
+
+openscad_flags = ('--enable', 'lazy-union', '--enable', 'predictible-output', '--backend', 'Manifold')
+"The flags passed to OpenSCAD when rendering files"
+
+export_formats: Dict[str, str] = {
+    'stl': 'binstl',
+    '3mf': '3mf',
+}
+"""The OpenSCAD `--export-format` for each output file extension. (STL files are always written in the much smaller
+binary format, rather than whichever format OpenSCAD defaults to)"""
+
+
+class RenderJob(NamedTuple):
+    """A single OpenSCAD file to render to an STL (or 3MF) file.
+    """
+    scad_filepath: str
+    "The path of the OpenSCAD file to render"
+    output_filepath: str
+    "The path of the STL (or 3MF) file to write"
+    input_hash: str
+    """A hash of everything the output file depends on: the OpenSCAD code, the OpenSCAD version, its flags, and the
+    version of the bundled BOSL2 library (which the code includes by path, so it can change without the code
+    changing)"""
+
+
+class RenderResult(NamedTuple):
+    """The result of rendering a single file.
+    """
+    job: RenderJob
+    "The job which was run"
+    returncode: int
+    "The exit status of OpenSCAD"
+    seconds: float
+    "The time taken to render the file, in seconds"
+    output: str
+    "The combined standard output and standard error of OpenSCAD"
+    peak_rss_bytes: Optional[int]
+    "The peak resident set size of the OpenSCAD process, in bytes (if the platform can report it)"
+
+
+def output_filepath_for(scad_filepath: str, output_format: str = 'stl') -> str:
+    """Return the path of the file to render the given OpenSCAD file to.
+
+    :param scad_filepath: the path of the OpenSCAD file
+    :param output_format: the output file extension (one of `export_formats`)
+    """
+    return f"{splitext(scad_filepath)[0]}.{output_format}"
+
+
+def render_flags(output_format: str = 'stl') -> Sequence[str]:
+    """Return the flags to pass to OpenSCAD when rendering files in the given format.
+
+    :param output_format: the output file extension (one of `export_formats`)
+    """
+    return (*openscad_flags, '--export-format', export_formats[output_format])
+
+
+def render_file(job: RenderJob, openscad: str = 'openscad', flags: Sequence[str] = openscad_flags) -> RenderResult:
+    """Run OpenSCAD to render the given job's output file.
+
+    Raises `OpenSCADNotFoundError` if the OpenSCAD executable can't be found.
+
+    :param job: the job to run
+    :param openscad: the OpenSCAD executable to run
+    :param flags: the flags to pass to OpenSCAD (see `render_flags`)
+    """
+    start = time.perf_counter()
+    try:
+        process = subprocess.Popen(
+            [openscad, *flags, '-o', job.output_filepath, job.scad_filepath],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            text=True,
+        )
+    except FileNotFoundError as error:
+        raise OpenSCADNotFoundError(openscad) from error
+    with process:
+        output = process.stdout.read() if process.stdout else ''
+
+        peak_rss_bytes = None
+        if hasattr(os, 'wait4'):
+            # Reap the process ourselves, so we get its resource usage.
+            _, status, usage = os.wait4(process.pid, 0)
+            process.returncode = os.waitstatus_to_exitcode(status)
+
+            # `ru_maxrss` is in kilobytes on Linux, but bytes on macOS.
+            peak_rss_bytes = usage.ru_maxrss if sys.platform == 'darwin' else usage.ru_maxrss * 1024
+        else:
+            process.wait()
+
+    return RenderResult(job, process.returncode, time.perf_counter() - start, output, peak_rss_bytes)
+
+
+def render_files(
+    scad_filepaths: Sequence[str],
+    jobs: Optional[int] = None,
+    force: bool = False,
+    openscad: str = 'openscad',
+    output_format: str = 'stl',
+) -> List[RenderResult]:
+    """Render each of the given OpenSCAD files to an STL (or 3MF) file next to it, printing progress as each file
+    finishes.
+
+    Files whose output file was already rendered from the same OpenSCAD code and BOSL2 version, by the same OpenSCAD
+    version with the same flags (according to the manifest in each file's directory), are skipped unless `force` is
+    set. The remaining files are rendered longest-first (according to the durations recorded in the manifest, with
+    files that have no recorded duration first), so the slowest renders aren't left until the end.
+
+    Returns the results in the order the files finished. Raises `OpenSCADNotFoundError` (before rendering anything) if
+    the OpenSCAD executable can't be found.
+
+    :param scad_filepaths: the OpenSCAD files to render
+    :param jobs: the maximum number of OpenSCAD processes to run at once; if None, use the number of CPUs
+    :param force: whether to render files even if their output file is up to date
+    :param openscad: the OpenSCAD executable to run
+    :param output_format: the output file extension (one of `export_formats`)
+    """
+    version = openscad_version(openscad)
+    bosl2 = bosl2_version()
+    flags = render_flags(output_format)
+    render_jobs = [
+        RenderJob(
+            scad_filepath,
+            output_filepath_for(scad_filepath, output_format),
+            content_hash(file_hash(scad_filepath) or '', version, bosl2, *flags),
+        )
+        for scad_filepath in scad_filepaths
+    ]
+
+    manifests: Dict[str, BuildManifest] = {
+        directory: BuildManifest(directory)
+        for directory in {dirname(job.scad_filepath) for job in render_jobs}
+    }
+
+    def manifest_for(job: RenderJob) -> BuildManifest:
+        return manifests[dirname(job.scad_filepath)]
+
+    def is_up_to_date(job: RenderJob) -> bool:
+        return (
+            exists(job.output_filepath)
+            and manifest_for(job).output_hash(basename(job.output_filepath)) == job.input_hash
+        )
+
+    if not force:
+        for job in render_jobs:
+            if is_up_to_date(job):
+                print(f"Skipping {job.scad_filepath}; {job.output_filepath} is up to date")
+        render_jobs = [job for job in render_jobs if not is_up_to_date(job)]
+
+    def recorded_duration(job: RenderJob) -> float:
+        seconds = manifest_for(job).render_seconds(basename(job.output_filepath))
+        return math.inf if seconds is None else seconds
+
+    render_jobs.sort(key=recorded_duration, reverse=True)
+
+    results: List[RenderResult] = []
+    with ThreadPoolExecutor(max_workers=jobs or os.cpu_count()) as executor:
+        futures = [executor.submit(render_file, job, openscad, flags) for job in render_jobs]
+
+        for future in as_completed(futures):
+            result = future.result()
+            results.append(result)
+
+            progress = f"[{len(results)}/{len(render_jobs)}]"
+            if result.returncode == 0:
+                print(f"{progress} Rendered {result.job.output_filepath} ({result.seconds:.2f}s)", flush=True)
+                manifest_for(result.job).record_render(
+                    basename(result.job.output_filepath),
+                    result.job.input_hash,
+                    result.seconds,
+                )
+
+                # Save after every render, so an interrupted run doesn't lose track of what's already been done.
+                manifest_for(result.job).save()
+            else:
+                print(
+                    f"{progress} Failed to render {result.job.scad_filepath} (exit status {result.returncode}):\n"
+                    f"{result.output.rstrip()}",
+                    flush=True,
+                )
+
+    return results
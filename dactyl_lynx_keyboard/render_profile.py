@@ -0,0 +1,137 @@
+"""Reports on how expensive each file was to render, to show which parts are worth optimizing.
+"""
+import csv
+import json
+import re
+import struct
+import zipfile
+from collections.abc import Sequence
+from os.path import exists, getsize, join
+from typing import List, NamedTuple, Optional
+
+from .mesh_files import threemf_model_path
+from .render import RenderResult
+
+
+csg_operations: Sequence[str] = ('union', 'difference', 'intersection', 'hull', 'minkowski', 'polyhedron')
+"The CSG operations counted in each OpenSCAD file"
+
+report_basename = 'render-profile'
+"The base name of the report files (in the output directory)"
+
+
+class RenderProfile(NamedTuple):
+    """The measurements for rendering a single file.
+    """
+    file: str
+    "The path of the OpenSCAD file"
+    seconds: float
+    "The wall time OpenSCAD took to render the file, in seconds"
+    peak_rss_bytes: Optional[int]
+    "The peak resident set size of the OpenSCAD process, in bytes"
+    triangles: Optional[int]
+    "The number of triangles in the rendered STL (or 3MF) file"
+    output_bytes: Optional[int]
+    "The size of the rendered STL (or 3MF) file, in bytes"
+    scad_bytes: int
+    "The size of the OpenSCAD file, in bytes"
+    operations: str
+    "The number of times each of `csg_operations` appears in the OpenSCAD file (e.g. `hull=12 difference=3`)"
+
+
+def stl_triangle_count(stl_filepath: str) -> Optional[int]:
+    """Return the number of triangles in the given STL file (either ASCII or binary), or None if it doesn't exist.
+
+    :param stl_filepath: the path of the STL file
+    """
+    if not exists(stl_filepath):
+        return None
+
+    with open(stl_filepath, 'rb') as stl_file:
+        header = stl_file.read(84)
+        if len(header) == 84:
+            (binary_count,) = struct.unpack('<I', header[80:])
+            # A binary STL file is exactly 84 bytes of header plus 50 bytes per triangle.
+            if 84 + 50 * binary_count == getsize(stl_filepath):
+                return binary_count
+
+        stl_file.seek(0)
+        return sum(line.lstrip().startswith(b'facet') for line in stl_file)
+
+
+def threemf_triangle_count(threemf_filepath: str) -> Optional[int]:
+    """Return the number of triangles in the given 3MF file, or None if it doesn't exist.
+
+    :param threemf_filepath: the path of the 3MF file
+    """
+    if not exists(threemf_filepath):
+        return None
+
+    with zipfile.ZipFile(threemf_filepath) as archive, archive.open(threemf_model_path) as model:
+        return sum(line.count(b'<triangle ') for line in model)
+
+
+def triangle_count(filepath: str) -> Optional[int]:
+    """Return the number of triangles in the given STL or 3MF file, or None if it doesn't exist.
+
+    :param filepath: the path of the file
+    """
+    if filepath.endswith('.3mf'):
+        return threemf_triangle_count(filepath)
+    return stl_triangle_count(filepath)
+
+
+def count_operations(scad_filepath: str) -> str:
+    """Return the number of times each of `csg_operations` is used in the given OpenSCAD file.
+
+    :param scad_filepath: the path of the OpenSCAD file
+    """
+    with open(scad_filepath, encoding='utf-8') as scad_file:
+        scad = scad_file.read()
+
+    counts = {operation: len(re.findall(rf'\b{operation}\s*\(', scad)) for operation in csg_operations}
+    return ' '.join(f"{operation}={count}" for (operation, count) in counts.items() if count)
+
+
+def profile_results(results: Sequence[RenderResult]) -> List[RenderProfile]:
+    """Collect the measurements for each successful render, most expensive (by wall time) first.
+
+    :param results: the results of rendering
+    """
+    profiles = [
+        RenderProfile(
+            file=result.job.scad_filepath,
+            seconds=result.seconds,
+            peak_rss_bytes=result.peak_rss_bytes,
+            triangles=triangle_count(result.job.output_filepath),
+            output_bytes=getsize(result.job.output_filepath) if exists(result.job.output_filepath) else None,
+            scad_bytes=getsize(result.job.scad_filepath),
+            operations=count_operations(result.job.scad_filepath),
+        )
+        for result in results
+        if result.returncode == 0
+    ]
+    profiles.sort(key=lambda profile: profile.seconds, reverse=True)
+    return profiles
+
+
+def write_report(profiles: Sequence[RenderProfile], directory: str) -> List[str]:
+    """Write the given measurements as both CSV and JSON files in the given directory.
+
+    Returns the paths of the files written.
+
+    :param profiles: the measurements to write
+    :param directory: the directory to write the report to
+    """
+    csv_filepath = join(directory, f"{report_basename}.csv")
+    with open(csv_filepath, 'w', newline='') as csv_file:
+        writer = csv.writer(csv_file)
+        writer.writerow(RenderProfile._fields)
+        writer.writerows(profiles)
+
+    json_filepath = join(directory, f"{report_basename}.json")
+    with open(json_filepath, 'w') as json_file:
+        json.dump([profile._asdict() for profile in profiles], json_file, indent=2)
+        json_file.write('\n')
+
+    return [csv_filepath, json_filepath]
@@ -0,0 +1,231 @@
+"""Combining shapes, and rendering them to OpenSCAD code, hoisting repeated subtrees into modules.
+"""
+import io
+import textwrap
+from collections.abc import Iterable
+from typing import Dict, List, TextIO, Tuple
+
+from solid2 import union
+from solid2.core.extension_manager import default_extension_manager
+from solid2.core.object_base import BareOpenSCADObject, OpenSCADObject
+from solid2.core.scad_render import get_include_string
+
+
+def union_all(shapes: Iterable[OpenSCADObject]) -> OpenSCADObject:
+    """Return the union of the given shapes as a single flat `union()`, equivalent to `a + b + c + ...`.
+
+    Like `+`, the children of any shapes which are themselves unions are added directly, so the result is never
+    nested. Unlike `reduce(operator.add, shapes)`, this doesn't copy the whole union for each shape added (which is
+    quadratic in the number of shapes). A single shape is returned as-is.
+
+    :param shapes: the shapes to combine
+    """
+    result = union()
+    for shape in shapes:
+        if isinstance(shape, union):
+            result.add(shape._children)
+        else:
+            result.add(shape)
+    return result._children[0] if len(result._children) == 1 else result
+
+
+def _renders_like_bare_object(node) -> bool:
+    """Check whether the given node is rendered purely from its name, parameters, and children.
+    """
+    return isinstance(node, BareOpenSCADObject) and type(node)._render is BareOpenSCADObject._render
+
+
+class _ModuleHoister:
+    """Renders a tree of shapes, emitting each sufficiently large subtree that appears more than once as a module.
+
+    Subtrees are compared structurally (by their rendered code), so separately-constructed but identical shapes are
+    shared just like shapes reused by reference.
+    """
+    def __init__(self, min_size: int, module_prefix: str):
+        self.min_size = min_size
+        self.module_prefix = module_prefix
+
+        self.keys_by_structure: Dict[Tuple[bool, str, Tuple[int, ...]], int] = {}
+        "A unique key for each distinct subtree, keyed by its structure"
+        self.opaque: List[bool] = []
+        "Whether each distinct subtree has custom rendering (modifiers, inline code, etc.), and is treated as a leaf"
+        self.heads: List[str] = []
+        "The rendered head of each distinct subtree (or the entire rendered code of opaque subtrees)"
+        self.children: List[Tuple[int, ...]] = []
+        "The keys of the children of each distinct subtree"
+        self.sizes: List[int] = []
+        "The approximate size of the inlined code for each distinct subtree"
+
+        self.node_keys: Dict[int, int] = {}
+        "The key of each node visited so far, keyed by `id(node)`"
+
+        self.uses: Dict[int, int] = {}
+        "How many times each subtree is referenced (see `count_uses`)"
+        self.module_names: Dict[int, str] = {}
+        "The name of the module for each hoisted subtree, keyed by the subtree's key"
+        self.module_order: List[int] = []
+        "The keys of the hoisted subtrees, in the order their module definitions are written"
+
+    def key(self, node) -> int:
+        """Return the key identifying the structure of the given node.
+        """
+        node_key = self.node_keys.get(id(node))
+        if node_key is not None:
+            return node_key
+
+        if _renders_like_bare_object(node):
+            structure = (False, node._generate_scad_head(), tuple(self.key(child) for child in node._children))
+            size = len(structure[1]) + sum(self.sizes[child] for child in structure[2]) + 4
+        else:
+            structure = (True, node._render(), ())
+            size = len(structure[1])
+
+        node_key = self.keys_by_structure.get(structure)
+        if node_key is None:
+            node_key = len(self.heads)
+            self.keys_by_structure[structure] = node_key
+            self.opaque.append(structure[0])
+            self.heads.append(structure[1])
+            self.children.append(structure[2])
+            self.sizes.append(size)
+
+        self.node_keys[id(node)] = node_key
+        return node_key
+
+    def is_candidate(self, key: int) -> bool:
+        """Check whether the given subtree is large enough to be worth hoisting into a module.
+        """
+        return self.sizes[key] >= self.min_size
+
+    def count_uses(self, root_key: int) -> Dict[int, int]:
+        """Count how many times each subtree would be referenced if repeated subtrees were hoisted into modules.
+
+        Repeated subtrees are only descended into once, since their contents are only rendered once (in the module
+        definition); this keeps subtrees which only ever appear inside one module from being hoisted separately.
+        """
+        total_uses: Dict[int, int] = {}
+
+        def count_total(key: int):
+            total_uses[key] = total_uses.get(key, 0) + 1
+            for child in self.children[key]:
+                count_total(child)
+
+        count_total(root_key)
+
+        uses: Dict[int, int] = {}
+
+        def count_effective(key: int):
+            uses[key] = uses.get(key, 0) + 1
+            if uses[key] == 1 or total_uses[key] < 2 or not self.is_candidate(key):
+                for child in self.children[key]:
+                    count_effective(child)
+
+        count_effective(root_key)
+        return uses
+
+    def is_hoisted(self, key: int) -> bool:
+        """Check whether the given subtree is written as a module (rather than inlined wherever it's used).
+        """
+        return self.uses[key] >= 2 and self.is_candidate(key)
+
+    def assign_modules(self, root_key: int):
+        """Name each hoisted subtree, in the order it's first used, and decide the order of the module definitions.
+
+        Modules are numbered in the order they're first referenced (including from within other modules), and each
+        module's definition follows the definitions of any modules first referenced inside it.
+        """
+        visited = set()
+
+        def visit_reference(key: int):
+            if not self.is_hoisted(key):
+                visit_inline(key)
+            elif key not in self.module_names:
+                self.module_names[key] = f"{self.module_prefix}{len(self.module_names)}"
+                visit_inline(key)
+                self.module_order.append(key)
+
+        def visit_inline(key: int):
+            if key not in visited:
+                visited.add(key)
+                for child in self.children[key]:
+                    visit_reference(child)
+
+        visit_reference(root_key)
+
+    def write_inline(self, key: int, output: TextIO, indent: str = ''):
+        """Write the code of the given subtree, with each line indented by the given prefix.
+        """
+        if self.opaque[key]:
+            output.write(textwrap.indent(self.heads[key], indent))
+        elif self.children[key]:
+            output.write(textwrap.indent(f"{self.heads[key]} {{\n", indent))
+            for child in self.children[key]:
+                self.write_reference(child, output, indent + '\t')
+            output.write(f"{indent}}}\n")
+        else:
+            output.write(textwrap.indent(f"{self.heads[key]};\n", indent))
+
+    def write_reference(self, key: int, output: TextIO, indent: str = ''):
+        """Write a use of the given subtree: a call of its module if it's hoisted, or its code otherwise.
+        """
+        if self.is_hoisted(key):
+            output.write(f"{indent}{self.module_names[key]}();\n")
+        else:
+            self.write_inline(key, output, indent)
+
+    def write(self, root: OpenSCADObject, output: TextIO):
+        """Write the code of the given tree to the given file, followed by any module definitions.
+
+        The code is written as it's generated, so (unlike `solid2.scad_render()`) the code of the whole tree is never
+        held in memory at once.
+        """
+        root_key = self.key(root)
+        self.uses = self.count_uses(root_key)
+        self.assign_modules(root_key)
+
+        self.write_inline(root_key, output)
+        for key in self.module_order:
+            output.write(f"\nmodule {self.module_names[key]}() {{\n")
+            self.write_inline(key, output, '\t')
+            output.write("}\n")
+
+
+def scad_render_with_modules(root: OpenSCADObject, min_size: int = 200, module_prefix: str = 'shape_') -> str:
+    """Render the given shape to OpenSCAD code, like `solid2.scad_render()`, but hoisting each subtree which appears
+    more than once (either by reference, or as separately-built but identical shapes) into a module.
+
+    This keeps parts built from many copies of the same shape (switch plates, magnet holes, nuts, etc.) small, and
+    lets OpenSCAD evaluate each repeated shape once.
+
+    :param root: the shape to render
+    :param min_size: the minimum size (in characters of inlined code) of a subtree for it to be hoisted into a module
+    :param module_prefix: the prefix for the names of generated modules
+    """
+    output = io.StringIO()
+    scad_write_with_modules(root, output, min_size=min_size, module_prefix=module_prefix)
+    return output.getvalue()
+
+
+def scad_write_with_modules(root: OpenSCADObject, output: TextIO, min_size: int = 200, module_prefix: str = 'shape_'):
+    """Write the given shape to the given file as OpenSCAD code, exactly as `scad_render_with_modules` renders it, but
+    writing the code as it's generated rather than building it as a single string.
+
+    :param root: the shape to write
+    :param output: the (text) file to write to
+    :param min_size: the minimum size (in characters of inlined code) of a subtree for it to be hoisted into a module
+    :param module_prefix: the prefix for the names of generated modules
+    """
+    # This mirrors `solid2.core.scad_render.scad_render()`, so any extensions (BOSL2, etc.) still work.
+    includes = get_include_string()
+
+    extensions_header = default_extension_manager.call_pre_render(root)
+    extensions_header += "\n\n" if extensions_header else ''
+
+    root = default_extension_manager.wrap_root_node(root)
+
+    output.write(includes + extensions_header)
+    _ModuleHoister(min_size, module_prefix).write(root, output)
+
+    extensions_footer = default_extension_manager.call_post_render(root)
+    extensions_footer += "\n" if extensions_footer else ''
+    output.write(extensions_footer)
@@ -0,0 +1,234 @@
+"""Building many variants of the keyboard (e.g. different layout sizes or keyswitch types) in a single batch.
+
+A sweep file (TOML or JSON) describes the variants to build:
+
+    # Settings shared by all variants (optional)
+    [base]
+    legends = "none"
+
+    # Build every combination of these settings (optional)
+    [grid]
+    columns = [5, 6]
+    keyswitch = ["mx", "choc"]
+
+    # Also build each of these variants (optional); `name` is optional
+    [[variants]]
+    name = "big-choc"
+    columns = 7
+    rows = 6
+    keyswitch = "choc"
+
+Each variant is built into its own directory (named after the variant), and `write_index` writes a summary of the whole
+sweep.
+"""
+import csv
+import itertools
+import json
+import tomllib
+from collections.abc import Callable, Mapping, Sequence
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from os.path import join
+from typing import Any, Dict, List, NamedTuple, Optional
+
+
+sweep_sections: Sequence[str] = ('base', 'grid', 'variants')
+"The sections of a sweep file"
+
+index_basename = 'index'
+"The base name of the summary index files (in the sweep's output directory)"
+
+
+class SweepVariant(NamedTuple):
+    """A single variant of the keyboard to build as part of a sweep.
+    """
+    name: str
+    "The name of this variant (also the name of its output directory)"
+    settings: Dict[str, Any]
+    "The settings of this variant (including the sweep's base settings)"
+
+
+class VariantResult(NamedTuple):
+    """The result of building a single variant.
+    """
+    variant: SweepVariant
+    "The variant which was built"
+    settings: Dict[str, Any]
+    "All settings the variant was built with (including defaults for any settings the sweep didn't specify)"
+    output_dir: str
+    "The directory the variant's files were written to"
+    files: Sequence[str]
+    "The paths of the files written"
+    seconds: float
+    "The time taken to build the variant, in seconds"
+    error: Optional[str]
+    "A description of the error which stopped the variant from being built, or None if it was built successfully"
+
+
+def read_sweep_file(filepath: str) -> Dict[str, Any]:
+    """Read the given sweep file; files ending in `.json` are read as JSON, and all others as TOML.
+
+    :param filepath: the path of the sweep file
+    """
+    if filepath.endswith('.json'):
+        with open(filepath, encoding='utf-8') as sweep_file:
+            return json.load(sweep_file)
+
+    with open(filepath, 'rb') as sweep_file:
+        return tomllib.load(sweep_file)
+
+
+def variant_name(settings: Mapping[str, Any]) -> str:
+    """Return a name describing the given settings (e.g. `columns-5-keyswitch-choc`).
+
+    :param settings: the settings which distinguish the variant from the others in its sweep
+    """
+    words = []
+    for (key, value) in settings.items():
+        key = key.replace('_', '-')
+        if isinstance(value, bool):
+            words.append(key if value else f"no-{key}")
+        elif isinstance(value, float):
+            words += [key, f"{value:g}"]
+        else:
+            words += [key, str(value)]
+    return '-'.join(words) or 'base'
+
+
+def expand_sweep(sweep: Mapping[str, Any], fields: Sequence[str]) -> List[SweepVariant]:
+    """Return the variants described by the given sweep: every combination of the settings in its `grid`, followed by
+    each of its `variants` (or just its `base` settings, if it has neither).
+
+    Raises `ValueError` if the sweep is malformed, uses a setting that isn't one of `fields`, or has two variants with
+    the same name.
+
+    :param sweep: the contents of a sweep file (see `read_sweep_file`)
+    :param fields: the names of the settings a variant may have
+    """
+    unknown_sections = [section for section in sweep if section not in sweep_sections]
+    if unknown_sections:
+        raise ValueError(
+            f"Unknown sweep sections: {', '.join(unknown_sections)} (expected: {', '.join(sweep_sections)})"
+        )
+
+    grid = sweep.get('grid', {})
+    not_lists = [key for (key, values) in grid.items() if not isinstance(values, list)]
+    if not_lists:
+        raise ValueError(f"Grid settings must be lists of values: {', '.join(not_lists)}")
+
+    entries = [dict(zip(grid, values)) for values in itertools.product(*grid.values())] if grid else []
+    entries += [dict(entry) for entry in sweep.get('variants', [])]
+
+    base = dict(sweep.get('base', {}))
+    variants = []
+    for entry in entries or [{}]:
+        name = str(entry.pop('name', None) or variant_name(entry))
+        if '/' in name or '\\' in name or name in ('.', '..'):
+            raise ValueError(f"Invalid variant name {name!r}")
+
+        settings = {**base, **entry}
+        unknown = [key for key in settings if key not in fields]
+        if unknown:
+            raise ValueError(
+                f"Unknown settings in variant {name!r}: {', '.join(unknown)} (expected: {', '.join(fields)})"
+            )
+
+        variants.append(SweepVariant(name, settings))
+
+    names = [variant.name for variant in variants]
+    duplicates = sorted({name for name in names if names.count(name) > 1})
+    if duplicates:
+        raise ValueError(f"Duplicate variant names: {', '.join(duplicates)}")
+
+    return variants
+
+
+def build_variants(
+    variants: Sequence[SweepVariant],
+    build: Callable[[SweepVariant], VariantResult],
+    jobs: Optional[int] = None,
+) -> List[VariantResult]:
+    """Build each of the given variants, printing the result of each as it finishes.
+
+    Variants are built in a pool of `jobs` worker processes (each variant building all of its parts in a single process,
+    so shapes shared between its parts are only built once). If `jobs` is 1 (or there's only one variant), all variants
+    are built serially in the current process instead.
+
+    Returns the results in the order the variants finished.
+
+    :param variants: the variants to build
+    :param build: a function which builds a single variant; this must be picklable (e.g. a module-level function, or a
+    `functools.partial` of one) so it can be called in a worker process
+    :param jobs: the maximum number of worker processes; if None, use the number of CPUs
+    """
+    results: List[VariantResult] = []
+
+    def report(result: VariantResult):
+        if result.error is None:
+            print(
+                f"Built variant {result.variant.name} ({len(result.files)} files) in {result.output_dir} "
+                f"({result.seconds:.2f}s)"
+            )
+        else:
+            print(f"Failed to build variant {result.variant.name}: {result.error}")
+        results.append(result)
+
+    if jobs == 1 or len(variants) == 1:
+        for variant in variants:
+            report(build(variant))
+        return results
+
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        futures = [executor.submit(build, variant) for variant in variants]
+        for future in as_completed(futures):
+            report(future.result())
+
+    return results
+
+
+def write_index(results: Sequence[VariantResult], directory: str, fields: Sequence[str]) -> List[str]:
+    """Write a summary of the given results as both CSV and JSON files in the given directory.
+
+    Returns the paths of the files written.
+
+    :param results: the results of building each variant
+    :param directory: the directory to write the index to
+    :param fields: the names of the settings to include as columns in the CSV file
+    """
+    results = sorted(results, key=lambda result: result.variant.name)
+
+    csv_filepath = join(directory, f"{index_basename}.csv")
+    with open(csv_filepath, 'w', newline='') as csv_file:
+        writer = csv.writer(csv_file)
+        writer.writerow(['name', *fields, 'output_dir', 'files', 'seconds', 'error'])
+        writer.writerows(
+            [
+                result.variant.name,
+                *(result.settings.get(field, '') for field in fields),
+                result.output_dir,
+                len(result.files),
+                f"{result.seconds:.2f}",
+                result.error or '',
+            ]
+            for result in results
+        )
+
+    json_filepath = join(directory, f"{index_basename}.json")
+    with open(json_filepath, 'w') as json_file:
+        json.dump(
+            [
+                {
+                    'name': result.variant.name,
+                    'settings': result.settings,
+                    'output_dir': result.output_dir,
+                    'files': list(result.files),
+                    'seconds': result.seconds,
+                    'error': result.error,
+                }
+                for result in results
+            ],
+            json_file,
+            indent=2,
+        )
+        json_file.write('\n')
+
+    return [csv_filepath, json_filepath]
@@ -0,0 +1,102 @@
+"""Numeric 4x4 affine transformation matrices.
+
+These mirror the semantics of OpenSCAD's `translate()`, `rotate()`, `mirror()` and `scale()` modules, so a chain of
+transformations can be composed in Python and emitted as a single `multmatrix()`.
+"""
+import math
+from collections.abc import Sequence
+from typing import Optional, Union
+
+import numpy as np
+from solid2 import multmatrix
+from solid2.core.object_base import OpenSCADObject
+
+
+Vector3 = Sequence[float]
+
+
+def identity() -> np.ndarray:
+    """Return the 4x4 identity matrix.
+    """
+    return np.identity(4)
+
+
+def translation(v: Vector3) -> np.ndarray:
+    """Return a matrix equivalent to OpenSCAD's `translate(v)`.
+
+    :param v: the X, Y, and Z translation
+    """
+    matrix = np.identity(4)
+    matrix[:3, 3] = v
+    return matrix
+
+
+def _axis_rotation(angle: float, axis: Vector3) -> np.ndarray:
+    """Return a matrix rotating `angle` degrees around the given axis. (using Rodrigues' rotation formula)
+    """
+    u = np.asarray(axis, dtype=float)
+    norm = np.linalg.norm(u)
+    if norm == 0:
+        return np.identity(4)
+    u = u / norm
+
+    theta = math.radians(angle)
+    cos_theta = math.cos(theta)
+    sin_theta = math.sin(theta)
+
+    cross = np.array((
+        (0, -u[2], u[1]),
+        (u[2], 0, -u[0]),
+        (-u[1], u[0], 0),
+    ))
+
+    matrix = np.identity(4)
+    matrix[:3, :3] = cos_theta * np.identity(3) + sin_theta * cross + (1 - cos_theta) * np.outer(u, u)
+    return matrix
+
+
+def rotation(a: Union[float, Vector3], v: Optional[Vector3] = None) -> np.ndarray:
+    """Return a matrix equivalent to OpenSCAD's `rotate(a, v)`.
+
+    :param a: the angle of rotation in degrees, or a sequence of X, Y, and Z angles (applied in that order)
+    :param v: the axis to rotate around, if `a` is a single angle; defaults to the Z axis
+    """
+    if isinstance(a, Sequence):
+        x_angle, y_angle, z_angle = a
+        return (
+            _axis_rotation(z_angle, (0, 0, 1))
+            @ _axis_rotation(y_angle, (0, 1, 0))
+            @ _axis_rotation(x_angle, (1, 0, 0))
+        )
+
+    return _axis_rotation(a, v if v is not None else (0, 0, 1))
+
+
+def mirroring(v: Vector3) -> np.ndarray:
+    """Return a matrix equivalent to OpenSCAD's `mirror(v)`.
+
+    :param v: the normal vector of the plane (through the origin) to mirror across
+    """
+    n = np.asarray(v, dtype=float)
+    matrix = np.identity(4)
+    matrix[:3, :3] -= 2 * np.outer(n, n) / n.dot(n)
+    return matrix
+
+
+def scaling(v: Vector3) -> np.ndarray:
+    """Return a matrix equivalent to OpenSCAD's `scale(v)`.
+
+    :param v: the X, Y, and Z scale factors
+    """
+    matrix = np.identity(4)
+    matrix[:3, :3] = np.diag(v)
+    return matrix
+
+
+def transform(shape: OpenSCADObject, matrix: np.ndarray) -> OpenSCADObject:
+    """Apply the given matrix to the given shape as a single `multmatrix()`.
+
+    :param shape: the shape to transform
+    :param matrix: the 4x4 matrix to apply
+    """
+    return multmatrix(matrix.tolist())(shape)
@@ -0,0 +1,160 @@
+"""Watching the package's sources for changes, and reloading only the modules affected by them.
+"""
+import ast
+import importlib
+import sys
+import time
+from os.path import relpath, sep, splitext
+from pathlib import Path
+from types import ModuleType
+from typing import Dict, Iterable, List, Set
+
+
+class SourceWatcher:
+    """Polls a directory tree for changes to its Python sources.
+    """
+    def __init__(self, directory: str):
+        """Start watching the given directory.
+
+        :param directory: the directory to watch
+        """
+        self.directory = directory
+        self.mtimes: Dict[str, float] = self.scan()
+        "The last known modification time of each source file, keyed by path"
+
+    def scan(self) -> Dict[str, float]:
+        """Return the current modification time of each source file, keyed by path.
+        """
+        mtimes = {}
+        for path in Path(self.directory).rglob('*.py'):
+            if '__pycache__' in path.parts:
+                continue
+            try:
+                mtimes[str(path)] = path.stat().st_mtime
+            except FileNotFoundError:
+                # Deleted since it was listed (e.g. an editor replacing the file)
+                pass
+        return mtimes
+
+    def changes(self) -> List[str]:
+        """Return the paths of the source files which were added, modified, or removed since the last call (or since
+        the watcher was created).
+        """
+        mtimes = self.scan()
+        changed = sorted(
+            path
+            for path in mtimes.keys() | self.mtimes.keys()
+            if mtimes.get(path) != self.mtimes.get(path)
+        )
+        self.mtimes = mtimes
+        return changed
+
+    def wait(self, interval: float = 0.5) -> List[str]:
+        """Block until any source files change, and return their paths.
+
+        Once a change is seen, this keeps waiting until the sources have been quiet for `interval`, so a save that
+        touches several files (or an editor that writes a file in several steps) is returned as a single change.
+
+        :param interval: the time to wait between polls, in seconds
+        """
+        changed: Set[str] = set()
+        while True:
+            time.sleep(interval)
+            new_changes = self.changes()
+            if new_changes:
+                changed.update(new_changes)
+            elif changed:
+                return sorted(changed)
+
+
+def module_name(package_dir: str, package_name: str, path: str) -> str:
+    """Return the name of the module (within the given package) for the given source file.
+
+    :param package_dir: the directory of the package
+    :param package_name: the name of the package
+    :param path: the path of the source file
+    """
+    parts = splitext(relpath(path, package_dir))[0].split(sep)
+    if parts[-1] == '__init__':
+        parts.pop()
+    return '.'.join([package_name, *parts])
+
+
+def package_imports(package_dir: str, package_name: str) -> Dict[str, Set[str]]:
+    """Return the modules of the given package imported by each of its modules, found by parsing their sources.
+
+    :param package_dir: the directory of the package
+    :param package_name: the name of the package
+    """
+    sources = {
+        module_name(package_dir, package_name, str(path)): path
+        for path in Path(package_dir).rglob('*.py')
+        if '__pycache__' not in path.parts
+    }
+
+    imports: Dict[str, Set[str]] = {}
+    for (name, path) in sources.items():
+        is_package = path.name == '__init__.py'
+        try:
+            tree = ast.parse(path.read_text(encoding='utf-8'), str(path))
+        except SyntaxError:
+            # Reloading it will report the error; until it's fixed, it can't import anything.
+            imports[name] = set()
+            continue
+
+        imported = set()
+        for node in ast.walk(tree):
+            if isinstance(node, ast.Import):
+                imported.update(alias.name for alias in node.names)
+            elif isinstance(node, ast.ImportFrom):
+                if node.level:
+                    base = name.split('.')
+                    base = base[:len(base) - node.level + (1 if is_package else 0)]
+                    target = '.'.join(base + ([node.module] if node.module else []))
+                else:
+                    target = node.module or ''
+                imported.add(target)
+                # `from package import module` imports a module, rather than a name from the package.
+                imported.update(f"{target}.{alias.name}" for alias in node.names)
+
+        imports[name] = {module for module in imported if module in sources and module != name}
+
+    return imports
+
+
+def affected_modules(imports: Dict[str, Set[str]], changed: Iterable[str]) -> Set[str]:
+    """Return the given changed modules, along with every module which imports any of them (directly or indirectly).
+
+    :param imports: the modules imported by each module (see `package_imports`)
+    :param changed: the names of the changed modules
+    """
+    affected = set(changed)
+    while True:
+        importers = {module for (module, imported) in imports.items() if imported & affected} - affected
+        if not importers:
+            return affected
+        affected |= importers
+
+
+def reload_changed_modules(package_dir: str, package_name: str, changed_paths: Iterable[str], root: str) -> ModuleType:
+    """Unload the modules affected by the given changed source files, then (re-)import the given root module.
+
+    Only the changed modules and the modules which depend on them are executed again; everything else, including all
+    third-party libraries, stays loaded.
+
+    :param package_dir: the directory of the package
+    :param package_name: the name of the package
+    :param changed_paths: the paths of the changed source files
+    :param root: the name of the module to import
+    """
+    changed = [
+        module_name(package_dir, package_name, path)
+        for path in changed_paths
+        if path.endswith('.py')
+    ]
+    for name in affected_modules(package_imports(package_dir, package_name), changed):
+        if name != package_name:
+            sys.modules.pop(name, None)
+
+    importlib.invalidate_caches()
+    return importlib.import_module(root)
@@ -0,0 +1,70 @@
+import math
+import unittest
+
+import numpy as np
+from solid2 import cube, cylinder, import_, sphere, text
+
+from dactyl_lynx_keyboard.bounds import Bounds, UnknownBoundsError, openscad_camera, shape_bounds
+
+
+def camera_distance(camera):
+    return float(camera.removeprefix('--camera=').split(',')[-1])
+
+
+class ShapeBoundsTest(unittest.TestCase):
+    def assert_bounds(self, bounds, minimum, maximum):
+        np.testing.assert_allclose(bounds.minimum, minimum, atol=1e-9)
+        np.testing.assert_allclose(bounds.maximum, maximum, atol=1e-9)
+
+    def test_primitives_and_transforms(self):
+        self.assert_bounds(shape_bounds(cube((1, 2, 3))), (0, 0, 0), (1, 2, 3))
+        self.assert_bounds(shape_bounds(cube(2, center=True).translate(5, 0, 1)), (4, -1, 0), (6, 1, 2))
+        self.assert_bounds(shape_bounds(cube((2, 1, 1)).rotate(0, 0, 90)), (-1, 0, 0), (0, 2, 1))
+        self.assert_bounds(shape_bounds(cylinder(r=2, h=3).mirror(0, 0, 1)), (-2, -2, -3), (2, 2, 0))
+
+    def test_operations(self):
+        self.assert_bounds(shape_bounds(cube(1) + sphere(1).up(5)), (-1, -1, 0), (1, 1, 6))
+        # Differences are measured conservatively, by the shape being subtracted from.
+        self.assert_bounds(shape_bounds(cube(4) - cube(2)), (0, 0, 0), (4, 4, 4))
+        self.assert_bounds(shape_bounds(cube(4) * cube(2).translate(1, 1, 1)), (1, 1, 1), (3, 3, 3))
+
+    def test_empty_shapes(self):
+        # A cube subtracted from within a larger cube (like `spkb.utils.nothing`) leaves nothing.
+        self.assertIsNone(shape_bounds(cube(1, center=True) - cube(2, center=True)))
+        self.assert_bounds(
+            shape_bounds(cube(1) + (cube(1, center=True) - cube(2, center=True)).up(10)),
+            (0, 0, 0),
+            (1, 1, 1),
+        )
+
+    def test_unknown_shapes(self):
+        for shape in (import_('part.stl'), text('A'), cube(1) + import_('part.stl').up(1)):
+            with self.subTest(shape):
+                with self.assertRaises(UnknownBoundsError):
+                    shape_bounds(shape)
+
+
+class OpenSCADCameraTest(unittest.TestCase):
+    # A box which is long in Y, centered on the origin
+    bounds = Bounds(np.array([-1.0, -10, -1]), np.array([1.0, 10, 1]))
+    tangent = math.tan(math.radians(22.5 / 2))
+
+    def test_top_view(self):
+        # Looking straight down, the box's length fills the image vertically, and its top is closest to the camera.
+        camera = openscad_camera(self.bounds, (0, 0, 0), margin=1)
+        self.assertTrue(camera.startswith('--camera=0,0,0,0,0,0,'))
+        self.assertAlmostEqual(camera_distance(camera), 10 / self.tangent + 1, places=3)
+
+    def test_front_view(self):
+        # Looking at the front, the box's length points away from the camera.
+        camera = openscad_camera(self.bounds, (90, 0, 0), margin=1)
+        self.assertAlmostEqual(camera_distance(camera), 1 / self.tangent + 10, places=3)
+
+    def test_turned_view(self):
+        # Turning the camera 90 degrees around Z lays the box's length across a wide image.
+        camera = openscad_camera(self.bounds, (0, 0, 90), aspect_ratio=2, margin=1)
+        self.assertAlmostEqual(camera_distance(camera), max(10 / (2 * self.tangent), 1 / self.tangent) + 1, places=3)
+
+
+if __name__ == '__main__':
+    unittest.main()
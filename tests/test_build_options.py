@@ -0,0 +1,39 @@
+import unittest
+
+from dactyl_lynx_keyboard.dactyl_lynx import BuildOptions, check_build_options
+from dactyl_lynx_keyboard.sweep import expand_sweep
+
+
+class CheckBuildOptionsTest(unittest.TestCase):
+    def test_valid_options(self):
+        check_build_options(BuildOptions())
+        check_build_options(BuildOptions(columns=7, rad_per_row=0, rad_per_col=0.25, keyswitch='choc', legends='none'))
+
+    def test_wrong_types(self):
+        for settings in (
+            {'use_1_5u_keys': 'false'},
+            {'rows': 'six'},
+            {'rows': 5.5},
+            {'columns': True},
+            {'rad_per_row': '0.2'},
+            {'threads': 1},
+            {'output_dir': 3},
+        ):
+            with self.subTest(settings):
+                with self.assertRaisesRegex(ValueError, f"Invalid {next(iter(settings))} "):
+                    check_build_options(BuildOptions(**settings))
+
+    def test_unknown_choices(self):
+        with self.assertRaisesRegex(ValueError, "Unknown keyswitch 'alps'"):
+            check_build_options(BuildOptions(keyswitch='alps'))
+
+    def test_sweep_variants(self):
+        fields = [field for field in BuildOptions._fields if field != 'output_dir']
+        variants = expand_sweep({'grid': {'rows': [4, 'five']}}, fields)
+        with self.assertRaisesRegex(ValueError, "Invalid rows 'five'"):
+            for variant in variants:
+                check_build_options(BuildOptions(**variant.settings))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,76 @@
+import itertools
+import unittest
+
+import numpy as np
+
+from dactyl_lynx_keyboard.geometry import convex_hull
+
+
+def hull_volume(vertices, faces):
+    """Return the volume enclosed by faces ordered clockwise when viewed from outside (negative if they're not).
+    """
+    volume = 0.0
+    for face in faces:
+        for index in range(1, len(face) - 1):
+            (a, b, c) = vertices[[face[0], face[index + 1], face[index]]]
+            volume += np.dot(a, np.cross(b, c)) / 6
+    return volume
+
+
+class ConvexHullTest(unittest.TestCase):
+    def assert_closed(self, faces):
+        edges = [(a, b) for face in faces for (a, b) in zip(face, face[1:] + face[:1])]
+        self.assertEqual(len(set(edges)), len(edges))
+        for (a, b) in edges:
+            self.assertIn((b, a), edges)
+
+    def test_cube(self):
+        corners = np.array(list(itertools.product((0, 2), repeat=3)), dtype=float)
+        # Interior points, and points in the middle of faces and edges, aren't part of the hull's corners.
+        extra = np.array([[1, 1, 1], [1, 1, 0], [0.5, 0.5, 1.5]])
+        vertices, faces = convex_hull(np.concatenate((corners, extra)))
+
+        self.assertEqual(len(faces), 6)
+        self.assertEqual(sorted(map(tuple, vertices.tolist())), sorted(map(tuple, corners.tolist())))
+        self.assert_closed(faces)
+        self.assertAlmostEqual(hull_volume(vertices, faces), 8)
+
+    def test_tetrahedron(self):
+        points = np.array([[0, 0, 0], [3, 0, 0], [0, 3, 0], [0, 0, 3]], dtype=float)
+        vertices, faces = convex_hull(points + [10, -5, 2])
+
+        self.assertEqual(len(vertices), 4)
+        self.assertEqual(sorted(map(len, faces)), [3, 3, 3, 3])
+        self.assert_closed(faces)
+        self.assertAlmostEqual(hull_volume(vertices, faces), 4.5)
+
+    def test_points_on_shared_edges(self):
+        # A point in the middle of an edge of a triangular prism becomes a vertex of both faces sharing that edge, so
+        # the hull stays watertight.
+        triangle = [[0, 0], [4, 0], [0, 4]]
+        points = np.array([[x, y, z] for (x, y) in triangle for z in (0, 2)] + [[2, 0, 0]], dtype=float)
+        vertices, faces = convex_hull(points)
+
+        self.assertEqual(len(vertices), 7)
+        self.assert_closed(faces)
+        self.assertAlmostEqual(hull_volume(vertices, faces), 16)
+
+    def test_rotated_box(self):
+        angle = np.radians(30)
+        rotation = np.array([[np.cos(angle), -np.sin(angle), 0], [np.sin(angle), np.cos(angle), 0], [0, 0, 1]])
+        corners = np.array(list(itertools.product((0, 1), (0, 2), (0, 3))), dtype=float) @ rotation.T
+        vertices, faces = convex_hull(corners + [100, 200, 300])
+
+        self.assertEqual(len(vertices), 8)
+        self.assert_closed(faces)
+        self.assertAlmostEqual(hull_volume(vertices, faces), 6)
+
+    def test_degenerate_points(self):
+        with self.assertRaises(ValueError):
+            convex_hull(np.array([[0, 0, 0], [1, 0, 0], [0, 1, 0]]))
+        with self.assertRaises(ValueError):
+            convex_hull(np.array([[0, 0, 0], [1, 0, 0], [0, 1, 0], [1, 1, 0]]))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,67 @@
+import math
+import unittest
+
+import numpy as np
+from solid2 import cube
+
+from dactyl_lynx_keyboard.bounds import shape_bounds
+from dactyl_lynx_keyboard.layouts.finger_well import FingerWellLayout
+from dactyl_lynx_keyboard.layouts.thumb_well import ThumbWellLayout
+
+
+def chained_placement(layout, column, row, point):
+    """Return where `key_place` puts the given point when it builds the chain of `down`/`rotate`/`up` nodes (and the
+    layout's `placement_adjust` and `layout_place`), rather than a single matrix.
+    """
+    layout.use_matrix_placement = False
+    try:
+        # A cube with no size is a single point, so its bounds are exactly where the point is placed.
+        return shape_bounds(layout.key_place(column, row, cube(0).translate(point))).minimum
+    finally:
+        layout.use_matrix_placement = True
+
+
+class KeyMatrixTest(unittest.TestCase):
+    # The origin and the unit axes pin down the whole affine transform.
+    points = [(0, 0, 0), (1, 0, 0), (0, 1, 0), (0, 0, 1)]
+
+    def assert_matches_chained_placement(self, layout, positions):
+        for (column, row) in positions:
+            with self.subTest(column=column, row=row):
+                matrix = layout.key_matrix(column, row)
+                for point in self.points:
+                    np.testing.assert_allclose(
+                        (matrix @ (*point, 1))[:3],
+                        chained_placement(layout, column, row, point),
+                        atol=1e-9,
+                    )
+
+    def test_finger_well(self):
+        # Columns 2 and 4+ are shifted by `placement_adjust`, and columns 5+ are widened for 1.5u keys.
+        self.assert_matches_chained_placement(
+            FingerWellLayout(use_1_5u_keys=True),
+            [(0, 0), (1, 3), (2, 1), (2.5, 2), (3, 1.5), (4, 4), (5, 2), (5.5, 0.5)],
+        )
+
+    def test_thumb_well(self):
+        # The 2u key (in a half row) and keys in half columns are raised by `placement_adjust`.
+        self.assert_matches_chained_placement(
+            ThumbWellLayout(),
+            [*ThumbWellLayout().generate_positions(), (0.5, 0), (1.5, -0.5)],
+        )
+
+    def test_assigning_attributes_clears_cache(self):
+        layout = FingerWellLayout()
+        before = layout.key_matrix(1, 3)
+        self.assertIs(layout.key_matrix(1, 3), before)
+        self.assertFalse(before.flags.writeable)
+
+        layout.rad_per_row = math.pi / 9
+        after = layout.key_matrix(1, 3)
+
+        self.assertFalse(np.allclose(after, before))
+        self.assert_matches_chained_placement(layout, [(1, 3)])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,81 @@
+import unittest
+
+import numpy as np
+
+from spkb.keyswitch import MX, Choc
+from spkb.types import HoleDef, Offset2D
+from spkb.utils import fudge_radius
+
+from dactyl_lynx_keyboard.bounds import shape_bounds
+from dactyl_lynx_keyboard.mesh import box_mesh, switch_plate_mesh, transform_mesh
+
+
+def mesh_volume(mesh):
+    """Return the volume enclosed by a mesh's triangles (the sum of its shells' volumes).
+    """
+    corners = mesh.vertices[mesh.triangles]
+    return np.einsum('ij,ij->i', corners[:, 0], np.cross(corners[:, 1], corners[:, 2])).sum() / 6
+
+
+def notch_volume(keyswitch, thickness):
+    """Return the volume of the wall of a switch plate cut away by one of the clip notches of
+    `Keyswitch.mounting_socket`, by integrating the area of its cross-section.
+    """
+    depth = np.linspace(0, keyswitch.notch_depth, 100001)
+    fraction = depth / keyswitch.notch_depth
+    width = keyswitch.notch_width_outer + (keyswitch.notch_width - keyswitch.notch_width_outer) * fraction
+    height = keyswitch.notch_height_outer + (keyswitch.notch_height - keyswitch.notch_height_outer) * fraction
+    center = -keyswitch.notch_plate_thickness - keyswitch.notch_height / 2
+    top = np.clip(center + height / 2, -thickness, 0)
+    bottom = np.clip(center - height / 2, -thickness, 0)
+    return np.trapezoid(width * (top - bottom), depth)
+
+
+def plate_volume(keyswitch):
+    """Return the volume of `keyswitch.plate()`.
+    """
+    thickness = keyswitch.plate_thickness if keyswitch.screws is None else keyswitch.keyswitch_depth
+    (width, length) = keyswitch.plate_size()
+    volume = (width * length - keyswitch.keyswitch_width * keyswitch.keyswitch_length) * thickness
+    volume -= 2 * notch_volume(keyswitch, thickness)
+
+    for screw in keyswitch.screws or ():
+        # A circumscribed 16-sided cylinder, from below the plate to 3/4 of the plate thickness below its top
+        radius = fudge_radius(screw.radius)
+        volume -= 8 * radius ** 2 * np.sin(2 * np.pi / 16) * (thickness - keyswitch.plate_thickness * 3 / 4)
+    return volume
+
+
+class SwitchPlateMeshTest(unittest.TestCase):
+    keyswitches = {
+        'MX': MX(),
+        'Choc': Choc(),
+        'MX on a board': MX.with_board(Offset2D(19.15, 19.15), *(HoleDef(x, y, 0.5) for x in (8, -8) for y in (8, -8))),
+    }
+
+    def test_volume_matches_plate(self):
+        for (name, keyswitch) in self.keyswitches.items():
+            with self.subTest(name):
+                self.assertAlmostEqual(mesh_volume(switch_plate_mesh(keyswitch)), plate_volume(keyswitch), places=4)
+
+    def test_bounds_match_plate(self):
+        for (name, keyswitch) in self.keyswitches.items():
+            with self.subTest(name):
+                mesh = switch_plate_mesh(keyswitch)
+                bounds = shape_bounds(keyswitch.plate())
+                np.testing.assert_allclose(mesh.vertices.min(axis=0), bounds.minimum, atol=1e-9)
+                np.testing.assert_allclose(mesh.vertices.max(axis=0), bounds.maximum, atol=1e-9)
+
+
+class TransformMeshTest(unittest.TestCase):
+    def test_mirroring_keeps_triangles_facing_outward(self):
+        box = box_mesh((0, 0, 0), (1, 2, 3))
+        mirrored = transform_mesh(box, np.diag([-1.0, 1, 1, 1]))
+
+        self.assertAlmostEqual(mesh_volume(box), 6)
+        self.assertAlmostEqual(mesh_volume(mirrored), 6)
+        np.testing.assert_allclose(mirrored.vertices.min(axis=0), (-1, 0, 0))
+
+
+if __name__ == '__main__':
+    unittest.main()
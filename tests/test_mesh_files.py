@@ -0,0 +1,97 @@
+import os
+import struct
+import tempfile
+import unittest
+import zipfile
+from xml.etree import ElementTree
+
+import numpy as np
+
+from dactyl_lynx_keyboard.mesh import box_mesh, concatenate_meshes, triangle_normals
+from dactyl_lynx_keyboard.mesh_files import (
+    StlWriter,
+    ThreeMFWriter,
+    stl_triangle_dtype,
+    threemf_model_path,
+    write_mesh,
+)
+
+
+threemf_namespace = {'m': 'http://schemas.microsoft.com/3dmanufacturing/core/2015/02'}
+
+
+class MeshFilesTest(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+
+        self.meshes = [box_mesh((0, 0, 0), (1, 2, 3)), box_mesh((5, 5, 5), (6.5, 7, 8))]
+        self.combined = concatenate_meshes(self.meshes)
+
+    def test_stl_round_trip(self):
+        filepath = os.path.join(self.directory, 'part.stl')
+        with StlWriter(filepath, name='part') as writer:
+            for mesh in self.meshes:
+                writer.write(mesh)
+
+        with open(filepath, 'rb') as stl_file:
+            header = stl_file.read(80)
+            (count,) = struct.unpack('<I', stl_file.read(4))
+            records = np.frombuffer(stl_file.read(), dtype=stl_triangle_dtype)
+
+        self.assertEqual(header.rstrip(b'\0'), b'part')
+        self.assertEqual(count, len(self.combined.triangles))
+        self.assertEqual(len(records), count)
+        np.testing.assert_allclose(records['vertices'], self.combined.vertices[self.combined.triangles])
+        np.testing.assert_allclose(records['normal'], triangle_normals(self.combined), atol=1e-7)
+
+    def test_3mf_round_trip(self):
+        filepath = os.path.join(self.directory, 'part.3mf')
+        with ThreeMFWriter(filepath, name='a "part" & <more>') as writer:
+            for mesh in self.meshes:
+                writer.write(mesh)
+
+        with zipfile.ZipFile(filepath) as archive:
+            self.assertIn('[Content_Types].xml', archive.namelist())
+            relationships = ElementTree.fromstring(archive.read('_rels/.rels'))
+            model = ElementTree.fromstring(archive.read(threemf_model_path))
+
+        (relationship,) = relationships
+        self.assertEqual(relationship.get('Target'), f"/{threemf_model_path}")
+
+        (mesh_object,) = model.iterfind('m:resources/m:object', threemf_namespace)
+        self.assertEqual(mesh_object.get('name'), 'a "part" & <more>')
+
+        vertices = np.array([
+            [float(vertex.get(axis)) for axis in 'xyz']
+            for vertex in mesh_object.iterfind('m:mesh/m:vertices/m:vertex', threemf_namespace)
+        ])
+        triangles = np.array([
+            [int(triangle.get(corner)) for corner in ('v1', 'v2', 'v3')]
+            for triangle in mesh_object.iterfind('m:mesh/m:triangles/m:triangle', threemf_namespace)
+        ])
+        np.testing.assert_allclose(vertices, self.combined.vertices)
+        np.testing.assert_array_equal(triangles, self.combined.triangles)
+
+    def test_3mf_spools_triangles_in_chunks(self):
+        filepath = os.path.join(self.directory, 'part.3mf')
+        with ThreeMFWriter(filepath) as writer:
+            writer.chunk_triangles = 5
+            writer.write(self.combined)
+
+        with zipfile.ZipFile(filepath) as archive:
+            model = ElementTree.fromstring(archive.read(threemf_model_path))
+        triangles = model.findall('m:resources/m:object/m:mesh/m:triangles/m:triangle', threemf_namespace)
+        self.assertEqual(len(triangles), len(self.combined.triangles))
+
+    def test_write_mesh_format(self):
+        for output_format in ('stl', '3mf'):
+            with self.subTest(output_format):
+                filepath = os.path.join(self.directory, f"part.{output_format}")
+                write_mesh(self.combined, filepath, output_format=output_format)
+                self.assertEqual(zipfile.is_zipfile(filepath), output_format == '3mf')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,78 @@
+import io
+import re
+import textwrap
+import unittest
+
+from solid2 import cube, scad_render, sphere, union
+
+from dactyl_lynx_keyboard.scad import scad_render_with_modules, scad_write_with_modules
+
+
+def expand_modules(code):
+    """Replace each call of a generated module with the module's body, and drop the module definitions.
+    """
+    (main, *definitions) = re.split(r'\nmodule (\w+)\(\) \{\n', code)
+    bodies = {
+        name: textwrap.dedent(body.removesuffix('}\n'))
+        for (name, body) in zip(definitions[0::2], definitions[1::2])
+    }
+
+    def expand(text):
+        return re.sub(
+            r'^(\t*)(\w+)\(\);\n',
+            lambda match: textwrap.indent(expand(bodies[match[2]]), match[1]) if match[2] in bodies else match[0],
+            text,
+            flags=re.MULTILINE,
+        )
+
+    return expand(main)
+
+
+def bolt():
+    """A shape built afresh on each call, so copies are identical without being the same object.
+    """
+    return (cube(5) - sphere(r=3, _fn=24)).translate(1, 2, 3).rotate(10, 20, 30)
+
+
+class ModuleHoistingTest(unittest.TestCase):
+    def setUp(self):
+        shared = bolt().up(10)
+        self.root = union()(
+            bolt().right(5),
+            bolt().left(5),
+            shared.forward(5),
+            shared.back(5),
+            # Modifiers are rendered as-is, rather than hoisted.
+            (bolt() + cube(2)).debug(),
+            sphere(1),
+        )
+
+    def test_without_hoisting_matches_scad_render(self):
+        self.assertEqual(scad_render_with_modules(self.root, min_size=10**9), scad_render(self.root))
+
+    def test_hoisted_code_expands_to_scad_render(self):
+        code = scad_render_with_modules(self.root, min_size=50)
+
+        self.assertIn('module shape_0() {', code)
+        self.assertEqual(expand_modules(code), scad_render(self.root))
+
+    def test_repeated_subtrees_are_hoisted_once(self):
+        code = scad_render_with_modules(self.root, min_size=50)
+
+        # The bolt is used twice on its own, and inside the shifted copy (which is used twice by reference).
+        self.assertEqual(re.findall(r'^module (\w+)', code, flags=re.MULTILINE), ['shape_0', 'shape_1'])
+        self.assertEqual(code.count('\tshape_0();'), 3)
+        self.assertEqual(code.count('\tshape_1();'), 2)
+
+    def test_small_subtrees_are_inlined(self):
+        root = union()(cube(1).right(2), cube(1).left(2))
+        self.assertEqual(scad_render_with_modules(root), scad_render(root))
+
+    def test_streamed_output_matches_rendered(self):
+        output = io.StringIO()
+        scad_write_with_modules(self.root, output, min_size=50, module_prefix='part_')
+        self.assertEqual(output.getvalue(), scad_render_with_modules(self.root, min_size=50, module_prefix='part_'))
+
+
+if __name__ == '__main__':
+    unittest.main()